@@ -4,6 +4,7 @@ from .logger import info, success, warning, error, target_info
 from .menu import main_menu, show_help
 from .file_ops import create_target_dirs
 from .runtime import execute_modules
+from .batch import BatchExecutor
 from .report import generate_report
 from .dependencies import check_dependencies, install_dependencies
 from .input_utils import get_input, clear_input_buffer
@@ -15,6 +16,7 @@ __all__ = [
     'main_menu', 'show_help',
     'create_target_dirs',
     'execute_modules',
+    'BatchExecutor',
     'generate_report',
     'check_dependencies', 'install_dependencies',
     'get_input', 'clear_input_buffer',
@@ -0,0 +1,129 @@
+# KESTREL/Engine/alive.py
+# Description: Single-pass reader of httpx's alive.json that writes alive.txt and the per-service records.
+
+import json
+import os
+from urllib.parse import urlparse
+from .cdn import get_index
+from .clusters import ClusterIndex
+from config import SCREENSHOT_CLUSTERS
+
+# orjson parses httpx's lines several times faster; the standard library is the fallback
+try:
+    import orjson
+    _loads = orjson.loads
+    _JSON_ERRORS = (orjson.JSONDecodeError, ValueError)
+except ImportError:
+    _loads = json.loads
+    _JSON_ERRORS = (ValueError,)
+
+ALIVE_JSON = "alive.json"
+ALIVE_TXT = "alive.txt"
+SERVICES_FILE = "services.jsonl"   # one record per probed URL, read by final.json
+
+# Server names looked for in httpx's 'tech' list when it reports no Server header
+COMMON_SERVERS = ["nginx", "apache", "iis", "caddy", "gunicorn", "uvicorn", "tomcat", "jetty"]
+
+
+def hostname_of(url):
+    """'https://www.example.com:8443/login' -> 'www.example.com:8443' (what alive.txt lists)."""
+    if "://" in url:
+        url = url.split("://", 1)[1]
+    return url.split("/", 1)[0]
+
+def service_record(probe, cdn=None, cluster=None):
+    """The fields final.json keeps for one httpx result: url, host, port, webserver, CDN provider (and cluster)."""
+    url = probe.get('url', 'N/A')
+    port = probe.get('port', 'N/A')
+
+    # Host: prefer explicit 'host' key, otherwise parse from URL
+    host = probe.get('host')
+    if not host:
+        try:
+            parsed = urlparse(url)
+            host = parsed.hostname if parsed and parsed.hostname else "N/A"
+        except ValueError:
+            host = "N/A"
+
+    # Webserver: prefer well-known keys, otherwise try to infer from 'tech' list
+    webserver = probe.get('server') or probe.get('webserver') or None
+    if not webserver:
+        tech_list = probe.get('tech', []) or []
+        webserver = next((t for t in tech_list if any(s in t.lower() for s in COMMON_SERVERS)), None) or "N/A"
+
+    # httpx reports the address it connected to as 'host' (and all of them in 'a')
+    cdn = cdn or get_index()
+    addresses = [host] + (probe.get('a') or [])
+    provider = next((p for p in map(cdn.provider, addresses) if p), None)
+    record = {"url": url, "host": host, "port": port, "webserver": webserver, "provider": provider}
+    if cluster is not None:
+        record.update(cluster=cluster, status_code=probe.get('status_code'), title=probe.get('title'))
+    return record
+
+
+class AliveDigest:
+    """
+    Reads Logs/alive.json once, incrementally: every update() picks up the
+    lines httpx appended since the last call, appends their service records
+    to Logs/services.jsonl, rewrites Logs/alive.txt (unique hostnames,
+    sorted) and the response clusters (Engine/clusters.py). Streaming mode
+    calls it after each batch without re-reading what was already digested.
+    """
+    def __init__(self, logs_dir):
+        self.json_path = os.path.join(logs_dir, ALIVE_JSON)
+        self.txt_path = os.path.join(logs_dir, ALIVE_TXT)
+        self.services_path = os.path.join(logs_dir, SERVICES_FILE)
+        self.offset = 0
+        self.hostnames = set()
+        self.services = 0
+        self.cdn = get_index()
+        self.clusters = ClusterIndex()
+        self.logs_dir = logs_dir
+        open(self.services_path, 'w').close()
+
+    def update(self, final=False):
+        """
+        Digests the new complete lines of alive.json (with final, also an
+        unterminated last line); returns the number of unique hostnames.
+        """
+        if os.path.exists(self.json_path):
+            with open(self.json_path, 'rb') as src, open(self.services_path, 'a') as services:
+                src.seek(self.offset)
+                for line in src:
+                    if not line.endswith(b"\n") and not final:
+                        break          # httpx is still writing it
+                    self.offset += len(line)
+                    try:
+                        probe = _loads(line)
+                    except _JSON_ERRORS:
+                        continue       # skip malformed lines
+                    if not isinstance(probe, dict):
+                        continue
+                    url = probe.get('url')
+                    if url:
+                        self.hostnames.add(hostname_of(url))
+                    cluster = self.clusters.add(probe)
+                    services.write(json.dumps(service_record(probe, self.cdn, cluster)) + "\n")
+                    self.services += 1
+        tmp_path = f"{self.txt_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.writelines(f"{name}\n" for name in sorted(self.hostnames))
+        os.replace(tmp_path, self.txt_path)
+        self.clusters.write(self.logs_dir, screenshot_targets=SCREENSHOT_CLUSTERS)
+        return len(self.hostnames)
+
+def digest_alive(logs_dir):
+    """Digests a complete alive.json in one pass; returns the number of unique hostnames."""
+    return AliveDigest(logs_dir).update(final=True)
+
+def iter_services(json_path):
+    """Service records straight from an alive.json (runs digested before services.jsonl existed)."""
+    cdn = get_index()
+    with open(json_path, 'rb') as f:
+        for line in f:
+            try:
+                probe = _loads(line)
+            except _JSON_ERRORS:
+                continue
+            if isinstance(probe, dict):
+                yield service_record(probe, cdn)
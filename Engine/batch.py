@@ -0,0 +1,178 @@
+# KESTREL/Engine/batch.py
+# Description: Runs an @targets.txt batch with several targets in flight and a compact progress view.
+
+import os
+import queue
+import threading
+import time
+from .logger import info, success, warning, error, target_info, set_log_file
+from .file_ops import create_target_dirs
+from .runtime import RuntimeControl, execute_modules
+from .scheduler import ToolLimiter
+from config import MAX_PARALLEL_TARGETS, TOOL_CONCURRENCY
+
+
+def _format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m{seconds:02d}s"
+    return f"{minutes}m{seconds:02d}s"
+
+
+class BatchExecutor:
+    """
+    Processes a list of targets with a pool of workers. Each target gets its
+    own directory from create_target_dirs and its module output is written to
+    <target_dir>/Logs/kestrel.log; the console only shows one progress line
+    per event and a summary table at the end.
+
+    With a RunJournal, targets that finished in an earlier attempt are skipped
+    and interrupted ones continue in their existing directory.
+    """
+    def __init__(self, targets, module_choices, report_enabled, results_dir,
+                 file_name=None, module_options=None, max_targets=None, tool_limits=None,
+                 journal=None):
+        self.targets = targets
+        self.module_choices = module_choices
+        self.report_enabled = report_enabled
+        self.results_dir = results_dir
+        self.file_name = file_name
+        self.module_options = module_options or {}
+        self.max_targets = max(1, int(max_targets or MAX_PARALLEL_TARGETS))
+        self.limiter = ToolLimiter(TOOL_CONCURRENCY if tool_limits is None else tool_limits)
+        self.runtime_controller = RuntimeControl()
+        self.journal = journal
+        self.events = queue.Queue()
+        # index -> {'dir', 'status', 'modules': {name: state}, 'start', 'end'}
+        self.results = {}
+
+    def _run_target(self, index, target):
+        clean_target = "".join(c for c in target if c.isalnum() or c in ['.', '-', '_'])
+        state = self.results[index]
+        if self.runtime_controller.should_quit():
+            state['status'] = 'cancelled'
+            return
+        target_dir = self.journal.target_dir(index) if self.journal else None
+        if target_dir and self.journal.target_done(index):
+            state['dir'] = target_dir
+            state['status'] = 'done'
+            self.events.put(('target_resumed', index, target, target_dir))
+            return
+        if not target_dir:
+            target_dir = create_target_dirs(self.results_dir, clean_target, True, self.file_name)
+            if target_dir and self.journal:
+                self.journal.set_target_dir(index, target, target_dir)
+        if not target_dir:
+            state['status'] = 'failed'
+            self.events.put(('target_failed', index, target, "could not create output directories"))
+            return
+        state['dir'] = target_dir
+        state['start'] = time.time()
+        state['status'] = 'running'
+        self.events.put(('target_start', index, target, target_dir))
+
+        def on_event(event, module_name):
+            if event != 'start':
+                state['modules'][module_name] = event
+            self.events.put((event, index, target, module_name))
+
+        log_file = os.path.join(target_dir, "Logs", "kestrel.log")
+        set_log_file(log_file)
+        try:
+            target_info(f"Target set to: {target}")
+            completed = execute_modules(self.module_choices, target, target_dir, self.report_enabled,
+                                        runtime_controller=self.runtime_controller,
+                                        limiter=self.limiter,
+                                        module_options=self.module_options,
+                                        log_file=log_file,
+                                        on_event=on_event,
+                                        journal=self.journal.for_target(index, target) if self.journal else None)
+            state['status'] = 'done' if completed else 'cancelled'
+        except Exception as e:
+            error(f"Batch worker error: {e}")
+            state['status'] = 'failed'
+        finally:
+            set_log_file(None)
+            state['end'] = time.time()
+            if self.journal:
+                self.journal.finish_target(index, target, state['status'])
+            self.events.put(('target_end', index, target, state['status']))
+
+    def _worker(self, work):
+        while True:
+            try:
+                index, target = work.get_nowait()
+            except queue.Empty:
+                return
+            self._run_target(index, target)
+
+    def _print_event(self, event):
+        kind, index, target, detail = event
+        prefix = f"[{index}/{len(self.targets)}] {target}"
+        if kind == 'target_start':
+            target_info(f"{prefix}: started -> {detail}")
+        elif kind == 'target_end':
+            state = self.results[index]
+            elapsed = _format_duration(state['end'] - state['start']) if state.get('start') else "-"
+            if detail == 'done':
+                success(f"{prefix}: finished in {elapsed}")
+            else:
+                warning(f"{prefix}: {detail} after {elapsed}")
+        elif kind == 'target_resumed':
+            info(f"{prefix}: already finished in this run -> {detail}")
+        elif kind == 'target_failed':
+            error(f"{prefix}: {detail}")
+        elif kind == 'start':
+            info(f"{prefix}: {detail} running")
+        elif kind == 'done':
+            info(f"{prefix}: {detail} done")
+        elif kind == 'cached':
+            info(f"{prefix}: {detail} restored from cache")
+        elif kind == 'resumed':
+            info(f"{prefix}: {detail} already done")
+        elif kind == 'skipped':
+            warning(f"{prefix}: {detail} skipped")
+        elif kind == 'failed':
+            error(f"{prefix}: {detail} failed (see Logs/kestrel.log)")
+
+    def print_summary(self):
+        info("Batch summary:")
+        width = max([len(t) for t in self.targets] + [6])
+        print(f"    {'Target'.ljust(width)}  {'Status':<10} {'Done':>4} {'Fail':>4} {'Skip':>4}  {'Time':>9}  Output")
+        for index, target in enumerate(self.targets, 1):
+            state = self.results[index]
+            modules = list(state['modules'].values())
+            elapsed = _format_duration(state['end'] - state['start']) if state.get('start') and state.get('end') else "-"
+            print(f"    {target.ljust(width)}  {state['status']:<10} {modules.count('done') + modules.count('cached') + modules.count('resumed'):>4} "
+                  f"{modules.count('failed'):>4} {modules.count('skipped'):>4}  {elapsed:>9}  {state.get('dir') or '-'}")
+
+    def run(self):
+        for index in range(1, len(self.targets) + 1):
+            self.results[index] = {'dir': None, 'status': 'pending', 'modules': {}}
+        info(f"Processing {len(self.targets)} targets, {self.max_targets} at a time. "
+             f"Module output goes to each target's Logs/kestrel.log.")
+        self.runtime_controller.start()
+        # Daemon threads rather than a ThreadPoolExecutor, whose atexit hook would
+        # wait on a worker still inside a module after a quit.
+        work = queue.Queue()
+        for item in enumerate(self.targets, 1):
+            work.put(item)
+        workers = [threading.Thread(target=self._worker, args=(work,), daemon=True)
+                   for _ in range(min(self.max_targets, len(self.targets)))]
+        for worker in workers:
+            worker.start()
+        try:
+            # Only this thread prints, so progress lines never interleave
+            while any(w.is_alive() for w in workers) or not self.events.empty():
+                try:
+                    self._print_event(self.events.get(timeout=0.5))
+                except queue.Empty:
+                    continue
+        finally:
+            self.runtime_controller.stop()
+        self.print_summary()
+        if self.runtime_controller.should_quit():
+            info("KESTREL terminated by user.")
+            return False
+        return True
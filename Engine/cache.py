@@ -0,0 +1,203 @@
+# KESTREL/Engine/cache.py
+# Description: On-disk TTL cache of passive module results, shared safely between KESTREL runs.
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from config import CACHE_ENABLED, CACHE_DIR, CACHE_MAX_BYTES, CACHE_TTL
+
+META_FILE = "meta.json"
+
+
+def normalise_target(target):
+    return target.strip().lower().rstrip('.')
+
+def cache_key(tool, target, args=None):
+    """sha256 over the tool, the normalised target and the (JSON-encoded) arguments."""
+    material = json.dumps([tool, normalise_target(target), args or {}], sort_keys=True)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Stores the Logs/ artifacts of a module run under
+    <cache_dir>/entries/<key>/ with a meta.json holding the expiry time.
+
+    Entries are built in <cache_dir>/tmp and renamed into place, so readers
+    never see half-written files; an flock on <cache_dir>/.lock serialises
+    writers and eviction between processes. The meta.json mtime is bumped on
+    every hit and is what least-recently-used eviction orders by.
+    """
+    def __init__(self, cache_dir, ttls, max_bytes, enabled=True, refresh=False):
+        self.cache_dir = cache_dir
+        self.entries_dir = os.path.join(cache_dir, "entries")
+        self.tmp_dir = os.path.join(cache_dir, "tmp")
+        self.ttls = ttls
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        # refresh: ignore existing entries but still store the new results
+        self.refresh = refresh
+
+    def cacheable(self, tool):
+        return self.enabled and self.ttls.get(tool, 0) > 0
+
+    @contextmanager
+    def _locked(self, exclusive):
+        os.makedirs(self.entries_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, ".lock"), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_meta(self, entry):
+        try:
+            with open(os.path.join(entry, META_FILE), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def restore(self, tool, target, args, dest_dir):
+        """
+        Copies a fresh cached result into dest_dir. Returns the restored file
+        names, or None on a miss (or when the cache is off or refreshing).
+        """
+        if not self.cacheable(tool) or self.refresh:
+            return None
+        entry = os.path.join(self.entries_dir, cache_key(tool, target, args))
+        if not os.path.isdir(entry):
+            return None
+        try:
+            with self._locked(exclusive=False):
+                meta = self._read_meta(entry)
+                if not meta or meta.get('expires', 0) <= time.time():
+                    return None
+                os.makedirs(dest_dir, exist_ok=True)
+                for name in meta['files']:
+                    tmp_path = os.path.join(dest_dir, f".{name}.cache")
+                    shutil.copyfile(os.path.join(entry, name), tmp_path)
+                    os.replace(tmp_path, os.path.join(dest_dir, name))
+                os.utime(os.path.join(entry, META_FILE))
+                return meta['files']
+        except OSError:
+            return None
+
+    def load_text(self, tool, target, args):
+        """Like restore, but returns a fresh entry's files as {name: text} instead of copying them."""
+        if not self.cacheable(tool) or self.refresh:
+            return None
+        entry = os.path.join(self.entries_dir, cache_key(tool, target, args))
+        if not os.path.isdir(entry):
+            return None
+        try:
+            with self._locked(exclusive=False):
+                meta = self._read_meta(entry)
+                if not meta or meta.get('expires', 0) <= time.time():
+                    return None
+                files = {}
+                for name in meta['files']:
+                    with open(os.path.join(entry, name), 'r', encoding='utf-8') as f:
+                        files[name] = f.read()
+                os.utime(os.path.join(entry, META_FILE))
+                return files
+        except (OSError, ValueError):
+            return None
+
+    def store(self, tool, target, args, paths, evict=True):
+        """Caches the given result files for tool/target/args; returns True when stored."""
+        def _fill(staging):
+            for path in paths:
+                shutil.copyfile(path, os.path.join(staging, os.path.basename(path)))
+        return self._store(tool, target, args, [os.path.basename(p) for p in paths], _fill, evict)
+
+    def store_text(self, tool, target, args, files, evict=True):
+        """
+        Caches in-memory results ({file name: text}). Callers storing many
+        entries at once pass evict=False and call evict() once at the end.
+        """
+        def _fill(staging):
+            for name, text in files.items():
+                with open(os.path.join(staging, name), 'w', encoding='utf-8') as f:
+                    f.write(text)
+        return self._store(tool, target, args, list(files), _fill, evict)
+
+    def _store(self, tool, target, args, names, fill, evict):
+        if not self.cacheable(tool):
+            return False
+        staging = None
+        try:
+            os.makedirs(self.tmp_dir, exist_ok=True)
+            staging = tempfile.mkdtemp(prefix="entry_", dir=self.tmp_dir)
+            fill(staging)
+            size = sum(os.path.getsize(os.path.join(staging, name)) for name in names)
+            now = time.time()
+            meta = {
+                'tool': tool, 'target': normalise_target(target), 'args': args or {},
+                'files': names,
+                'created': now, 'expires': now + self.ttls[tool], 'size': size,
+            }
+            with open(os.path.join(staging, META_FILE), 'w') as f:
+                json.dump(meta, f, indent=4)
+
+            entry = os.path.join(self.entries_dir, cache_key(tool, target, args))
+            stale = None
+            with self._locked(exclusive=True):
+                if os.path.exists(entry):
+                    stale = staging + ".old"
+                    os.rename(entry, stale)
+                os.rename(staging, entry)
+            if stale:
+                shutil.rmtree(stale, ignore_errors=True)
+            if evict:
+                self.evict()
+            return True
+        except OSError:
+            if staging:
+                shutil.rmtree(staging, ignore_errors=True)
+            return False
+
+    def evict(self):
+        """Drops expired entries, then the least recently used ones above max_bytes."""
+        if not os.path.isdir(self.entries_dir):
+            return 0
+        removed = 0
+        with self._locked(exclusive=True):
+            now = time.time()
+            live = []
+            for key in os.listdir(self.entries_dir):
+                entry = os.path.join(self.entries_dir, key)
+                meta = self._read_meta(entry)
+                if not meta or meta.get('expires', 0) <= now:
+                    shutil.rmtree(entry, ignore_errors=True)
+                    removed += 1
+                    continue
+                last_used = os.path.getmtime(os.path.join(entry, META_FILE))
+                live.append((last_used, meta.get('size', 0), entry))
+            total = sum(size for _, size, _ in live)
+            for _, size, entry in sorted(live):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+                removed += 1
+        return removed
+
+
+_cache = None
+
+def configure_cache(enabled=True, refresh=False):
+    """Applies the --no-cache / --refresh command line overrides."""
+    global _cache
+    _cache = ResultCache(CACHE_DIR, CACHE_TTL, CACHE_MAX_BYTES,
+                         enabled=CACHE_ENABLED and enabled, refresh=refresh)
+    return _cache
+
+def get_cache():
+    return _cache or configure_cache()
@@ -0,0 +1,165 @@
+# KESTREL/Engine/capture.py
+# Description: Line-by-line capture of tool output: rotating log files, a bounded tail and console progress.
+
+import collections
+import os
+import re
+import threading
+import time
+from .logger import info, set_log_file
+from config import (TOOL_LOG_MAX_BYTES, TOOL_LOG_BACKUPS, TOOL_OUTPUT_TAIL,
+                    TOOL_PROGRESS_PATTERNS, TOOL_PROGRESS_INTERVAL)
+
+# A "line" longer than this (a tool printing without newlines) is cut into pieces
+MAX_LINE = 64 * 1024
+
+_PROGRESS_RE = {tool: re.compile(pattern) for tool, pattern in TOOL_PROGRESS_PATTERNS.items()}
+
+
+class RotatingLog:
+    """
+    Append-only text log that is rotated once it grows past max_bytes:
+    path -> path.1 -> ... -> path.<backups>, the oldest being dropped.
+    Use open_log() for tool logs: concurrent runs of one module then share
+    a single instance, so their size count and rotation stay consistent.
+    """
+    def __init__(self, path, max_bytes=TOOL_LOG_MAX_BYTES, backups=TOOL_LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.lock = threading.Lock()
+        self.users = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, 'a', encoding='utf-8', errors='replace')
+        self.size = self.file.tell()
+
+    def write(self, text):
+        # The cap is in bytes: non-ASCII output takes more than one per character
+        size = len(text.encode('utf-8', 'replace'))
+        with self.lock:
+            if self.max_bytes and self.size + size > self.max_bytes and self.size:
+                self._rotate()
+            self.file.write(text)
+            self.size += size
+
+    def _rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        self.file = open(self.path, 'w', encoding='utf-8', errors='replace')
+        self.size = 0
+
+    def close(self):
+        """Releases one open_log() user; the file is closed once the last one is done."""
+        with _logs_lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+            if _logs.get(os.path.abspath(self.path)) is self:
+                del _logs[os.path.abspath(self.path)]
+        with self.lock:
+            self.file.close()
+
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+def open_log(path):
+    """The RotatingLog for path, shared by every run writing to it until each has closed it."""
+    key = os.path.abspath(path)
+    with _logs_lock:
+        log = _logs.get(key)
+        if log is None:
+            log = _logs[key] = RotatingLog(path)
+        log.users += 1
+        return log
+
+
+class OutputCapture:
+    """
+    Receives a tool's stdout/stderr as raw chunks and splits them into lines.
+    Each line is teed to the module's rotating log (when there is one),
+    handed to on_line, kept in a tail of the last TOOL_OUTPUT_TAIL lines per
+    stream and, when it matches the tool's TOOL_PROGRESS_PATTERNS entry,
+    echoed as progress (at most once per TOOL_PROGRESS_INTERVAL seconds).
+    Only keep_stdout makes it hold a tool's whole stdout, for the few tools
+    whose output is small and parsed afterwards (dig); everything else uses
+    constant memory however long the tool runs.
+    """
+    def __init__(self, argv, log_path=None, on_line=None, keep_stdout=False, log_file=None):
+        self.tool = os.path.basename(str(argv[0]))
+        self.on_line = on_line
+        self.keep_stdout = keep_stdout
+        # The caller's log sink: progress lines go where its own messages go
+        self.log_file = log_file
+        self.stdout = [] if keep_stdout else collections.deque(maxlen=TOOL_OUTPUT_TAIL)
+        self.stderr = collections.deque(maxlen=TOOL_OUTPUT_TAIL)
+        self.partial = {'stdout': b"", 'stderr': b""}
+        self.progress_re = _PROGRESS_RE.get(self.tool)
+        self.last_progress = 0.0
+        self.log = None
+        if log_path:
+            try:
+                self.log = open_log(log_path)
+                self.log.write(f"\n$ {' '.join(str(a) for a in argv)}    # {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+            except OSError:
+                if self.log:
+                    self.log.close()
+                self.log = None
+
+    def feed(self, stream, data):
+        lines = (self.partial[stream] + data).split(b"\n")
+        partial = lines.pop()
+        while len(partial) > MAX_LINE:
+            lines.append(partial[:MAX_LINE])
+            partial = partial[MAX_LINE:]
+        self.partial[stream] = partial
+        for line in lines:
+            self._line(stream, line.decode('utf-8', errors='replace').rstrip("\r"))
+
+    def _line(self, stream, line):
+        (self.stdout if stream == 'stdout' else self.stderr).append(line)
+        if self.log:
+            try:
+                self.log.write(line + "\n" if stream == 'stdout' else f"[stderr] {line}\n")
+            except OSError:
+                pass
+        if stream == 'stdout' and self.on_line:
+            try:
+                self.on_line(line)
+            except Exception:
+                pass
+        if self.progress_re and line and self.progress_re.search(line):
+            now = time.monotonic()
+            if now - self.last_progress >= TOOL_PROGRESS_INTERVAL:
+                self.last_progress = now
+                # Runs on the supervisor thread: borrow the caller's log sink for the message
+                set_log_file(self.log_file)
+                try:
+                    info(f"[{self.tool}] {line.strip()}")
+                finally:
+                    set_log_file(None)
+
+    def close(self, returncode):
+        for stream, partial in self.partial.items():
+            if partial:
+                self._line(stream, partial.decode('utf-8', errors='replace'))
+        self.partial = {'stdout': b"", 'stderr': b""}
+        if self.log:
+            try:
+                self.log.write(f"# exit code {returncode}\n")
+                self.log.close()
+            except OSError:
+                pass
+            self.log = None
+
+    def stdout_text(self):
+        """The whole stdout with keep_stdout, otherwise its last lines."""
+        return "\n".join(self.stdout) + ("\n" if self.stdout else "")
+
+    def stderr_text(self):
+        """The last lines of stderr (enough for an error message)."""
+        return "\n".join(self.stderr) + ("\n" if self.stderr else "")
@@ -0,0 +1,153 @@
+# KESTREL/Engine/cdn.py
+# Description: CIDR index of CDN / cloud edge ranges that tags IP addresses with their provider.
+
+import bisect
+import ipaddress
+import json
+import os
+import threading
+import time
+import urllib.request
+
+CDN_RANGES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               "Resources", "cdn_ranges.json")
+
+
+def _text_cidrs(body):
+    return [line.strip() for line in body.splitlines() if line.strip() and not line.startswith('#')]
+
+def _fastly_cidrs(body):
+    data = json.loads(body)
+    return data.get('addresses', []) + data.get('ipv6_addresses', [])
+
+def _cloudfront_cidrs(body):
+    data = json.loads(body)
+    return ([p['ip_prefix'] for p in data.get('prefixes', []) if p.get('service') == 'CLOUDFRONT'] +
+            [p['ipv6_prefix'] for p in data.get('ipv6_prefixes', []) if p.get('service') == 'CLOUDFRONT'])
+
+# Providers that publish their ranges: provider -> [(feed URL, parser returning CIDRs)].
+# Providers without a feed keep the ranges bundled in Resources/cdn_ranges.json.
+FEEDS = {
+    'cloudflare': [("https://www.cloudflare.com/ips-v4", _text_cidrs),
+                   ("https://www.cloudflare.com/ips-v6", _text_cidrs)],
+    'fastly': [("https://api.fastly.com/public-ip-list", _fastly_cidrs)],
+    'cloudfront': [("https://ip-ranges.amazonaws.com/ip-ranges.json", _cloudfront_cidrs)],
+}
+
+
+class CdnIndex:
+    """
+    Provider ranges as sorted, non-overlapping [start, end] intervals per
+    address family, so a lookup is one bisect: O(log n) in the number of
+    ranges. Where two providers' ranges overlap, the one starting first wins.
+    """
+    def __init__(self, path=CDN_RANGES_FILE):
+        data = {}
+        if path:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        self.updated = data.get('updated')
+        intervals = {4: [], 6: []}
+        for provider, cidrs in data.get('providers', {}).items():
+            for cidr in cidrs:
+                try:
+                    network = ipaddress.ip_network(cidr, strict=False)
+                except ValueError:
+                    continue
+                intervals[network.version].append(
+                    (int(network.network_address), int(network.broadcast_address), provider))
+        self.tables = {version: self._build(items) for version, items in intervals.items()}
+
+    @staticmethod
+    def _build(items):
+        starts, ends, providers = [], [], []
+        for start, end, provider in sorted(items):
+            if ends and start <= ends[-1]:
+                if end <= ends[-1]:
+                    continue              # inside the previous range
+                if provider == providers[-1]:
+                    ends[-1] = end        # same provider: extend
+                    continue
+                start = ends[-1] + 1      # another provider: keep only the part past it
+            elif ends and start == ends[-1] + 1 and provider == providers[-1]:
+                ends[-1] = end            # adjacent ranges of one provider
+                continue
+            starts.append(start)
+            ends.append(end)
+            providers.append(provider)
+        return starts, ends, providers
+
+    def provider(self, address):
+        """The provider whose ranges contain address, or None (also for anything that isn't an IP)."""
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return None
+        starts, ends, providers = self.tables[ip.version]
+        i = bisect.bisect_right(starts, int(ip)) - 1
+        if i >= 0 and int(ip) <= ends[i]:
+            return providers[i]
+        return None
+
+    def classify(self, addresses):
+        """{address: provider} for the addresses that belong to a CDN / cloud edge."""
+        tagged = {}
+        for address in addresses:
+            provider = self.provider(address)
+            if provider:
+                tagged[address] = provider
+        return tagged
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """The process-wide index of the bundled ranges (an empty one when the file is missing)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = CdnIndex()
+            except (OSError, ValueError):
+                _index = CdnIndex(None)
+        return _index
+
+def update_ranges(path=CDN_RANGES_FILE, timeout=30):
+    """
+    Refreshes the providers that publish their ranges (FEEDS) in the ranges
+    file; the others keep their bundled ranges, and so does a provider whose
+    feed fails. Returns {provider: number of ranges or the error}.
+    """
+    global _index
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    results = {}
+    for provider, feeds in FEEDS.items():
+        cidrs = []
+        try:
+            for url, parse in feeds:
+                request = urllib.request.Request(url, headers={'User-Agent': 'KESTREL'})
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    body = response.read().decode('utf-8', errors='replace')
+                cidrs.extend(str(ipaddress.ip_network(c.strip(), strict=False)) for c in parse(body))
+        except (OSError, ValueError, KeyError) as e:
+            results[provider] = str(e)
+            continue
+        if not cidrs:
+            results[provider] = "feed returned no ranges"
+            continue
+        networks = sorted({ipaddress.ip_network(c) for c in cidrs}, key=lambda n: (n.version, n))
+        data['providers'][provider] = [str(network) for network in networks]
+        results[provider] = len(networks)
+    if not any(isinstance(result, int) for result in results.values()):
+        return results
+    data['updated'] = time.strftime('%Y-%m-%d')
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+    with _index_lock:
+        _index = None
+    return results
@@ -0,0 +1,93 @@
+# KESTREL/Engine/clusters.py
+# Description: Groups httpx results by response fingerprint so each distinct page is screenshotted and reported once.
+
+import json
+import os
+import re
+from urllib.parse import urlsplit
+
+CLUSTERS_FILE = "clusters.json"             # under Logs/
+SCREENSHOT_TARGETS = "screenshot_targets.txt"  # under Logs/; one representative URL per cluster
+
+
+def _normal_title(title, host):
+    """Title with the host name and numbers masked, so 'Welcome to a.example.com' pages match."""
+    title = " ".join((title or "").lower().split())
+    if host:
+        title = title.replace(host.lower(), "{host}")
+    return re.sub(r"\d+", "0", title)
+
+def fingerprint(probe):
+    """
+    (status, normalised title, body hash, favicon hash) of an httpx record.
+    Without a body hash (httpx run without -hash) the page's word, line and
+    byte counts stand in for it.
+    """
+    try:
+        host = urlsplit(probe.get('url', '')).hostname
+    except ValueError:
+        host = None
+    hashes = probe.get('hash') or {}
+    body = hashes.get('body_md5') or hashes.get('body_mmh3') or hashes.get('body_sha256')
+    if not body:
+        body = f"{probe.get('words', '')}w/{probe.get('lines', '')}l/{probe.get('content_length', '')}b"
+    favicon = probe.get('favicon') or probe.get('favicon_mmh3') or ""
+    return (probe.get('status_code'), _normal_title(probe.get('title'), host), body, str(favicon))
+
+def _rank(url):
+    """Representative preference: https, then the shortest URL (apex-like names), then alphabetical."""
+    return (not url.startswith("https://"), len(url), url)
+
+
+class ClusterIndex:
+    """
+    Clusters of httpx records with the same fingerprint. Only one
+    representative URL and a count are kept per cluster; the records
+    themselves carry their cluster id (services.jsonl).
+    """
+    def __init__(self):
+        self.ids = {}
+        self.clusters = []
+
+    def add(self, probe):
+        """Files a record under its cluster; returns the cluster id (None for a record without a URL)."""
+        url = probe.get('url')
+        if not url:
+            return None
+        key = fingerprint(probe)
+        cluster_id = self.ids.get(key)
+        if cluster_id is None:
+            cluster_id = self.ids[key] = len(self.clusters)
+            self.clusters.append({'id': cluster_id, 'status_code': key[0], 'title': probe.get('title'),
+                                  'body_hash': key[2], 'favicon': key[3] or None,
+                                  'representative': url, 'size': 0})
+        cluster = self.clusters[cluster_id]
+        cluster['size'] += 1
+        if _rank(url) < _rank(cluster['representative']):
+            cluster['representative'] = url
+            cluster['title'] = probe.get('title')
+        return cluster_id
+
+    def write(self, logs_dir, screenshot_targets=True):
+        """Writes Logs/clusters.json (largest first) and, optionally, the representatives to screenshot."""
+        ordered = sorted(self.clusters, key=lambda c: (-c['size'], c['id']))
+        path = os.path.join(logs_dir, CLUSTERS_FILE)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(ordered, f, indent=4)
+        os.replace(f"{path}.tmp", path)
+        if screenshot_targets:
+            path = os.path.join(logs_dir, SCREENSHOT_TARGETS)
+            with open(f"{path}.tmp", 'w') as f:
+                f.writelines(f"{cluster['representative']}\n" for cluster in ordered)
+            os.replace(f"{path}.tmp", path)
+
+def load_clusters(logs_dir):
+    """The clusters of the last HTTPX run, or None."""
+    path = os.path.join(logs_dir, CLUSTERS_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
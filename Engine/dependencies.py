@@ -2,6 +2,7 @@
 import subprocess
 import sys
 from .logger import info, success, warning, error
+from config import WHOIS_ENGINE, HTTP_ENGINE
 
 # List of required tools
 REQUIRED_TOOLS = {
@@ -11,9 +12,14 @@ REQUIRED_TOOLS = {
     'amass': 'amass',
     'httpx': 'httpx-toolkit',
     'nmap': 'nmap',
-    'eyewitness': 'eyewitness',
-    'jq': 'jq'  # Added for JSON processing in HTTPX module
+    'eyewitness': 'eyewitness'
 }
+# The built-in whois client needs no external tool
+if WHOIS_ENGINE == 'native':
+    del REQUIRED_TOOLS['whois']
+# Neither does the built-in HTTP prober
+if HTTP_ENGINE == 'native':
+    del REQUIRED_TOOLS['httpx']
 
 def check_tool_installed(tool_name):
     """Check if a specific tool is installed and available in PATH."""
@@ -86,9 +92,6 @@ def install_dependencies(missing_tools):
                         package_name = 'httpx-toolkit'
                     elif tool == 'httpx-toolkit' and pm in ['pacman', 'dnf', 'yum']:
                         package_name = 'httpx'  # May have different name in other distros
-                    
-                    if tool == 'jq':
-                        package_name = 'jq'  # jq is consistent across package managers
 
                     # Build installation command based on package manager
                     if pm == 'apt':
@@ -0,0 +1,371 @@
+# KESTREL/Engine/dns_resolver.py
+# Description: In-process asyncio DNS client (UDP with TCP fallback) with a rate-limited resolver pool.
+
+import asyncio
+import ipaddress
+import random
+import struct
+from .supervisor import cancelled
+from config import DNS_RESOLVERS, DNS_TIMEOUT, DNS_RETRIES, DNS_RATE_LIMIT, DNS_MAX_IN_FLIGHT
+
+RECORD_TYPES = {
+    'A': 1, 'NS': 2, 'CNAME': 5, 'SOA': 6, 'PTR': 12, 'MX': 15, 'TXT': 16, 'AAAA': 28,
+}
+TYPE_NAMES = {v: k for k, v in RECORD_TYPES.items()}
+
+RCODE_NOERROR = 0
+RCODE_SERVFAIL = 2
+RCODE_NXDOMAIN = 3
+RCODE_REFUSED = 5
+
+DEFAULT_RESOLVERS = ['1.1.1.1', '8.8.8.8']
+
+
+class DNSError(Exception):
+    """Raised for malformed messages or when every resolver attempt failed."""
+
+
+# --- Wire format ---
+
+def _encode_name(name):
+    name = name.rstrip('.')
+    out = bytearray()
+    if name:
+        for label in name.split('.'):
+            try:
+                raw = label.encode('ascii')
+            except UnicodeEncodeError:
+                raw = label.encode('idna')
+            if not raw or len(raw) > 63:
+                raise DNSError(f"Invalid label in name: {name}")
+            out.append(len(raw))
+            out += raw
+    out.append(0)
+    return bytes(out)
+
+def build_query(qid, name, rtype, edns_size=1232):
+    """Builds a recursive query; an EDNS0 OPT record allows larger UDP answers."""
+    qtype = RECORD_TYPES[rtype] if isinstance(rtype, str) else rtype
+    header = struct.pack("!HHHHHH", qid, 0x0100, 1, 0, 0, 1 if edns_size else 0)
+    question = _encode_name(name) + struct.pack("!HH", qtype, 1)
+    opt = b""
+    if edns_size:
+        opt = b"\x00" + struct.pack("!HHIH", 41, edns_size, 0, 0)
+    return header + question + opt
+
+def _read_name(data, offset):
+    """Reads a (possibly compressed) name; returns (name, offset after it)."""
+    labels = []
+    jumped = False
+    end_offset = offset
+    hops = 0
+    while True:
+        if offset >= len(data):
+            raise DNSError("Truncated name")
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if offset + 1 >= len(data):
+                raise DNSError("Truncated pointer")
+            pointer = ((length & 0x3F) << 8) | data[offset + 1]
+            if not jumped:
+                end_offset = offset + 2
+            jumped = True
+            hops += 1
+            if hops > 64:
+                raise DNSError("Compression loop")
+            offset = pointer
+            continue
+        if length == 0:
+            if not jumped:
+                end_offset = offset + 1
+            break
+        offset += 1
+        labels.append(data[offset:offset + length].decode('ascii', errors='replace'))
+        offset += length
+    return ".".join(labels) + ".", end_offset
+
+def _txt_string(raw):
+    """Quotes one character-string the way dig prints it."""
+    out = []
+    for byte in raw:
+        ch = chr(byte)
+        if ch in '"\\':
+            out.append('\\' + ch)
+        elif 32 <= byte < 127:
+            out.append(ch)
+        else:
+            out.append(f"\\{byte:03d}")
+    return '"' + "".join(out) + '"'
+
+def _format_rdata(data, rtype, offset, length):
+    """Formats rdata in dig's presentation format."""
+    end = offset + length
+    if rtype == 1 and length == 4:
+        return str(ipaddress.IPv4Address(data[offset:end]))
+    if rtype == 28 and length == 16:
+        return str(ipaddress.IPv6Address(data[offset:end]))
+    if rtype in (2, 5, 12):
+        return _read_name(data, offset)[0]
+    if rtype == 15:
+        if length < 3:
+            raise DNSError("Truncated MX record")
+        preference = struct.unpack("!H", data[offset:offset + 2])[0]
+        return f"{preference} {_read_name(data, offset + 2)[0]}"
+    if rtype == 16:
+        parts = []
+        pos = offset
+        while pos < end:
+            size = data[pos]
+            if pos + 1 + size > end:
+                raise DNSError("Truncated TXT record")
+            parts.append(_txt_string(data[pos + 1:pos + 1 + size]))
+            pos += 1 + size
+        return " ".join(parts)
+    if rtype == 6:
+        mname, pos = _read_name(data, offset)
+        rname, pos = _read_name(data, pos)
+        if pos + 20 > len(data):
+            raise DNSError("Truncated SOA record")
+        serial, refresh, retry, expire, minimum = struct.unpack("!IIIII", data[pos:pos + 20])
+        return f"{mname} {rname} {serial} {refresh} {retry} {expire} {minimum}"
+    return "\\# {} {}".format(length, data[offset:end].hex())
+
+def parse_response(data):
+    """
+    Parses a DNS response into a dict with id, rcode, truncated flag, the
+    question and the answer records as (name, ttl, type_name, rdata) tuples.
+    """
+    if len(data) < 12:
+        raise DNSError("Short DNS message")
+    qid, flags, qdcount, ancount, _nscount, _arcount = struct.unpack("!HHHHHH", data[:12])
+    offset = 12
+    question = None
+    for _ in range(qdcount):
+        qname, offset = _read_name(data, offset)
+        if offset + 4 > len(data):
+            raise DNSError("Truncated question")
+        qtype, _qclass = struct.unpack("!HH", data[offset:offset + 4])
+        offset += 4
+        question = (qname.lower(), qtype)
+    answers = []
+    for _ in range(ancount):
+        name, offset = _read_name(data, offset)
+        if offset + 10 > len(data):
+            raise DNSError("Truncated record")
+        rtype, _rclass, ttl, rdlength = struct.unpack("!HHIH", data[offset:offset + 10])
+        offset += 10
+        if offset + rdlength > len(data):
+            raise DNSError("Truncated rdata")
+        try:
+            rdata = _format_rdata(data, rtype, offset, rdlength)
+        except (struct.error, IndexError, ValueError) as e:
+            # Malformed rdata fails this answer only, never the caller's whole run
+            raise DNSError(f"Malformed {TYPE_NAMES.get(rtype, f'TYPE{rtype}')} record: {e}") from e
+        answers.append((name, ttl, TYPE_NAMES.get(rtype, f"TYPE{rtype}"), rdata))
+        offset += rdlength
+    return {
+        'id': qid,
+        'rcode': flags & 0x000F,
+        'truncated': bool(flags & 0x0200),
+        'question': question,
+        'answers': answers,
+    }
+
+
+# --- Transport ---
+
+def parse_resolver(spec):
+    """'1.1.1.1', '127.0.0.1:5353' or '[::1]:53' -> (host, port)."""
+    spec = spec.strip()
+    if spec.startswith('['):
+        host, _, port = spec[1:].partition(']')
+        return host, int(port.lstrip(':') or 53)
+    if spec.count(':') == 1:
+        host, port = spec.split(':')
+        return host, int(port)
+    return spec, 53
+
+def system_resolvers(path="/etc/resolv.conf"):
+    """Nameservers from resolv.conf, or DEFAULT_RESOLVERS when none are listed."""
+    servers = []
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == 'nameserver':
+                    servers.append(parts[1].split('%')[0])
+    except OSError:
+        pass
+    return servers or list(DEFAULT_RESOLVERS)
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    """One socket per resolver; replies are matched to waiting queries by ID."""
+    def __init__(self):
+        self.transport = None
+        self.pending = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) < 2:
+            return
+        qid = struct.unpack("!H", data[:2])[0]
+        future = self.pending.pop(qid, None)
+        if future and not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc):
+        pass
+
+    def connection_lost(self, exc):
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(DNSError("Resolver socket closed"))
+        self.pending.clear()
+
+
+class _Nameserver:
+    """A resolver endpoint with its own UDP socket and query rate limit."""
+    def __init__(self, host, port, rate_limit):
+        self.host = host
+        self.port = port
+        self.interval = 1.0 / rate_limit if rate_limit else 0.0
+        self.next_slot = 0.0
+        self.protocol = None
+        # Created on first use, like AsyncResolver.semaphore; one endpoint however many queries start at once
+        self.lock = None
+        self.failures = 0
+
+    async def throttle(self):
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def _usable(self):
+        return self.protocol is not None and self.protocol.transport is not None \
+            and not self.protocol.transport.is_closing()
+
+    async def udp(self):
+        if self._usable():
+            return self.protocol
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            # Another query may have opened it while this one waited
+            if not self._usable():
+                loop = asyncio.get_running_loop()
+                _, self.protocol = await loop.create_datagram_endpoint(
+                    _UdpProtocol, remote_addr=(self.host, self.port))
+        return self.protocol
+
+    def close(self):
+        if self.protocol and self.protocol.transport:
+            self.protocol.transport.close()
+
+
+class AsyncResolver:
+    """
+    Pipelines many queries over a pool of resolvers. Each resolver has its own
+    rate limit; a query that times out, is refused or fails is retried on the
+    next resolver, and truncated UDP answers are repeated over TCP.
+    """
+    def __init__(self, nameservers=None, timeout=2.0, retries=2, rate_limit=100, max_in_flight=500):
+        specs = nameservers or system_resolvers()
+        self.nameservers = [_Nameserver(*parse_resolver(s), rate_limit) for s in specs]
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.max_in_flight = max_in_flight
+        # Created on first use so it belongs to the loop running the queries
+        self.semaphore = None
+        self._next = 0
+
+    def _pick(self):
+        server = self.nameservers[self._next % len(self.nameservers)]
+        self._next += 1
+        return server
+
+    async def _query_udp(self, server, name, rtype):
+        protocol = await server.udp()
+        qid = random.randint(0, 0xFFFF)
+        while qid in protocol.pending:
+            qid = random.randint(0, 0xFFFF)
+        future = asyncio.get_running_loop().create_future()
+        protocol.pending[qid] = future
+        try:
+            protocol.transport.sendto(build_query(qid, name, rtype))
+            data = await asyncio.wait_for(future, self.timeout)
+        finally:
+            protocol.pending.pop(qid, None)
+        return parse_response(data)
+
+    async def _query_tcp(self, server, name, rtype):
+        async def exchange():
+            reader, writer = await asyncio.open_connection(server.host, server.port)
+            try:
+                query = build_query(random.randint(0, 0xFFFF), name, rtype, edns_size=0)
+                writer.write(struct.pack("!H", len(query)) + query)
+                await writer.drain()
+                size = struct.unpack("!H", await reader.readexactly(2))[0]
+                return parse_response(await reader.readexactly(size))
+            finally:
+                writer.close()
+        return await asyncio.wait_for(exchange(), self.timeout)
+
+    async def query(self, name, rtype):
+        """
+        Resolves one name/type. Returns the parsed response dict (answers may
+        be empty, e.g. NXDOMAIN) or raises DNSError after all retries.
+        """
+        qtype = RECORD_TYPES[rtype]
+        last_error = None
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        async with self.semaphore:
+            for _ in range(self.retries + 1):
+                if cancelled():
+                    # Skipped or quit: no more attempts for the module that asked
+                    last_error = last_error or "cancelled"
+                    break
+                server = self._pick()
+                await server.throttle()
+                try:
+                    response = await self._query_udp(server, name, rtype)
+                    if response['question'] and response['question'] != (name.rstrip('.').lower() + '.', qtype):
+                        raise DNSError("Answer does not match the question")
+                    if response['truncated']:
+                        response = await self._query_tcp(server, name, rtype)
+                    if response['rcode'] in (RCODE_SERVFAIL, RCODE_REFUSED):
+                        raise DNSError(f"{server.host} returned rcode {response['rcode']}")
+                    server.failures = 0
+                    return response
+                except (asyncio.TimeoutError, OSError, EOFError, asyncio.IncompleteReadError, DNSError) as e:
+                    server.failures += 1
+                    last_error = e
+        raise DNSError(f"{name} {rtype}: {last_error or 'no resolvers'}")
+
+    async def resolve(self, name, rtypes):
+        """Queries several record types for one name concurrently -> {rtype: response or None}."""
+        async def one(rtype):
+            try:
+                return rtype, await self.query(name, rtype)
+            except DNSError:
+                return rtype, None
+        return dict(await asyncio.gather(*(one(t) for t in rtypes)))
+
+    def close(self):
+        for server in self.nameservers:
+            server.close()
+
+
+def make_resolver():
+    """AsyncResolver configured from config.py (call it inside the event loop)."""
+    return AsyncResolver(nameservers=DNS_RESOLVERS or None, timeout=DNS_TIMEOUT,
+                         retries=DNS_RETRIES, rate_limit=DNS_RATE_LIMIT,
+                         max_in_flight=DNS_MAX_IN_FLIGHT)
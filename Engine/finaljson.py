@@ -4,9 +4,86 @@
 import os
 import json
 import re
+import tempfile
 import xml.etree.ElementTree as ET
 from .logger import info, error
-from urllib.parse import urlparse  # added to parse host from URL
+from .resolution import iter_resolved, iter_pruned
+from .scan_plan import load_plan
+from .cdn import get_index
+from .alive import iter_services, ALIVE_JSON, SERVICES_FILE
+from .clusters import load_clusters
+
+class RecordSpool:
+    """
+    A list of records kept in a temporary JSON-lines file instead of memory.
+    Iterating reads the records back one at a time; write_json streams them
+    into the output as a JSON array. Given a path, it is a read-only view of
+    an existing JSON-lines file (which discard() leaves alone).
+    """
+    def __init__(self, directory, path=None):
+        self.owned = path is None
+        self.file = None
+        if self.owned:
+            os.makedirs(directory, exist_ok=True)
+            fd, path = tempfile.mkstemp(prefix=".spool_", suffix=".jsonl", dir=directory)
+            self.file = os.fdopen(fd, 'w')
+        self.path = path
+        self.count = 0
+        if not self.owned:
+            with open(path, 'rb') as f:
+                self.count = sum(1 for line in f if line.strip())
+
+    def append(self, record):
+        self.file.write(json.dumps(record) + "\n")
+        self.count += 1
+
+    def close(self):
+        if self.file and not self.file.closed:
+            self.file.close()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        self.close()
+        with open(self.path, 'r') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def discard(self):
+        self.close()
+        if self.owned and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __del__(self):
+        try:
+            self.discard()
+        except Exception:
+            pass
+
+
+def _contains_spool(value):
+    return isinstance(value, RecordSpool) or (isinstance(value, dict) and any(map(_contains_spool, value.values())))
+
+def write_json(f, value, level=0):
+    """json.dump(value, f, indent=4), except that RecordSpools are written record by record."""
+    pad = "    " * level
+    if isinstance(value, RecordSpool):
+        f.write("[")
+        empty = True
+        for record in value:
+            f.write(("" if empty else ",") + f"\n{pad}    " + json.dumps(record, indent=4).replace("\n", f"\n{pad}    "))
+            empty = False
+        f.write("]" if empty else f"\n{pad}]")
+    elif isinstance(value, dict) and value and _contains_spool(value):
+        f.write("{")
+        for i, (key, item) in enumerate(value.items()):
+            f.write(("," if i else "") + f"\n{pad}    {json.dumps(key)}: ")
+            write_json(f, item, level + 1)
+        f.write(f"\n{pad}}}")
+    else:
+        f.write(json.dumps(value, indent=4).replace("\n", f"\n{pad}"))
+
 
 class FinalJsonGenerator:
     """
@@ -24,6 +101,7 @@ class FinalJsonGenerator:
                 "risk_level": "N/A" # Placeholder for future logic
             }
         }
+        self._spools = []
 
     def parse_whois(self):
         """Parses the whois.txt log file."""
@@ -77,110 +155,157 @@ class FinalJsonGenerator:
             error(f"Could not parse alive.txt: {e}")
             return None
 
+    def parse_resolution(self):
+        """Parses the host->IP mapping written by the mass resolution stage (resolved.jsonl)."""
+        if not self._check_log('resolved.jsonl'):
+            return None
+
+        info("Parsing mass resolution data...")
+        hosts = []
+        for record in iter_resolved(self.log_dir):
+            hosts.append({
+                "host": record.get('host', 'N/A'),
+                "ips": record.get('a', []) + record.get('aaaa', []),
+                "cname": record.get('cname', [])
+            })
+        if not hosts:
+            return None
+        return {"total_resolved": len(hosts), "hosts": hosts}
+
+    def parse_wildcards(self):
+        """Parses the wildcard zones (wildcards.json) and the names pruned because of them."""
+        if not self._check_log('wildcards.json'):
+            return None
+
+        info("Parsing wildcard DNS data...")
+        summary = self._parse_json_log('wildcards.json') or {}
+        pruned = [{"host": host, "zone": zone} for host, zone in iter_pruned(self.log_dir)]
+        if not summary.get('zones') and not pruned:
+            return None
+        return {"zones": summary.get('zones', {}), "total_pruned": len(pruned), "pruned": pruned}
+
     def parse_services(self):
-        """Parses alive.json for web service details.
+        """Web service details (url, host, port, webserver, CDN provider) of every httpx result.
 
-        Modified to extract only: url, host, port, webserver.
+        The HTTPX module digests alive.json into Logs/services.jsonl as it
+        goes; those records are streamed into final.json as they are. Runs
+        older than services.jsonl are read from alive.json instead.
         """
-        services_file = os.path.join(self.log_dir, "alive.json")
-        if not os.path.exists(services_file):
-            return None
+        services_file = os.path.join(self.log_dir, SERVICES_FILE)
+        if os.path.exists(services_file):
+            if not os.path.getsize(services_file):
+                return None
+            info("Parsing HTTPX service data...")
+            return RecordSpool(None, path=services_file)
 
+        alive_file = os.path.join(self.log_dir, ALIVE_JSON)
+        if not os.path.exists(alive_file):
+            return None
         info("Parsing HTTPX service data...")
-        services_data = []
+        spool = RecordSpool(self.json_dir)
+        self._spools.append(spool)
         try:
-            with open(services_file, 'r') as f:
-                for line in f:
-                    try:
-                        service = json.loads(line)
-
-                        # Raw values
-                        url = service.get('url', 'N/A')
-                        port = service.get('port', 'N/A')
-
-                        # Host: prefer explicit 'host' key, otherwise parse from URL
-                        host = service.get('host')
-                        if not host or host == "":
-                            try:
-                                parsed = urlparse(url)
-                                host = parsed.hostname if parsed and parsed.hostname else "N/A"
-                            except Exception:
-                                host = "N/A"
-
-                        # Webserver: prefer well-known keys, otherwise try to infer from 'tech' list
-                        webserver = service.get('server') or service.get('webserver') or None
-                        if not webserver:
-                            tech_list = service.get('tech', []) or []
-                            # Common server names to look for in tech list
-                            common_servers = ["nginx", "apache", "iis", "caddy", "gunicorn", "uvicorn", "tomcat", "jetty"]
-                            inferred = next((t for t in tech_list if any(s in t.lower() for s in common_servers)), None)
-                            webserver = inferred if inferred else "N/A"
-
-                        services_data.append({
-                            "url": url,
-                            "host": host,
-                            "port": port,
-                            "webserver": webserver
-                        })
-                    except json.JSONDecodeError:
-                        # Skip malformed lines
-                        continue
-            return services_data if services_data else None
+            for record in iter_services(alive_file):
+                spool.append(record)
         except Exception as e:
             error(f"Could not parse alive.json: {e}")
             return None
+        spool.close()
+        return spool if len(spool) else None
 
     def parse_nmap(self):
-        """Parses an Nmap XML file (e.g., nmap_top1000.xml)."""
-        nmap_file = self._find_nmap_xml()
-        if not nmap_file:
+        """
+        Parses every Nmap XML file in Logs/ (nmap_top1000.xml, nmap_udp.xml, ...).
+
+        The files are read with iterparse and each <host> is cleared once its
+        records are spooled to disk, so memory stays flat however large the
+        scan; generate() streams the spooled hosts into final.json.
+        """
+        nmap_files = self._find_nmap_xmls()
+        if not nmap_files:
             return None
 
-        info(f"Parsing Nmap data from {os.path.basename(nmap_file)}...")
-        try:
-            tree = ET.parse(nmap_file)
-            root = tree.getroot()
-            
-            nmap_data = {
-                "scan_summary": {
-                    "scan_type": root.find('scaninfo').get('type').upper() if root.find('scaninfo') is not None else "N/A",
-                    "duration": root.find('runstats/finished').get('timestr') if root.find('runstats/finished') is not None else "N/A",
-                    "total_open_ports": 0 # Will be calculated
-                },
-                "hosts": []
-            }
+        # With a scan plan nmap scanned each IP once; every hostname behind the IP gets its ports
+        plan = load_plan(self.log_dir)
+        names_by_ip = plan.get('addresses', {}) if plan else {}
+        cdn = get_index()
+        spool = RecordSpool(self.json_dir)
+        self._spools.append(spool)
+        scan_types = []
+        durations = []
+        addresses = set()
+        total_open_ports = 0
 
-            total_open_ports = 0
-            for host in root.findall('host'):
-                host_info = {
-                    "hostname": self._get_hostname(host),
-                    "ip_address": host.find('address').get('addr') if host.find('address') is not None else "N/A",
-                    "open_ports": []
-                }
-                
-                ports = host.find('ports')
-                if ports:
-                    for port in ports.findall('port'):
-                        if port.find('state').get('state') == 'open':
-                            total_open_ports += 1
-                            service = port.find('service')
-                            port_info = {
-                                "port_id": port.get('portid'),
-                                "protocol": port.get('protocol'),
-                                "service_name": service.get('name', 'N/A') if service is not None else 'N/A',
-                                "service_version": self._get_service_version(service),
-                                "recommendation": self._get_recommendation(port.get('portid'), service.get('name', 'N/A') if service is not None else 'N/A')
-                            }
-                            host_info["open_ports"].append(port_info)
-                
-                if host_info["open_ports"]:
-                    nmap_data["hosts"].append(host_info)
-
-            nmap_data["scan_summary"]["total_open_ports"] = total_open_ports
-            return nmap_data if nmap_data["hosts"] else None
-        except ET.ParseError as e:
-            error(f"Could not parse Nmap XML file: {e}")
-            return None
+        for nmap_file in nmap_files:
+            name = os.path.basename(nmap_file)
+            scan = name[len("nmap_"):-len(".xml")]
+            info(f"Parsing Nmap data from {name}...")
+            try:
+                root = None
+                for event, elem in ET.iterparse(nmap_file, events=('start', 'end')):
+                    if event == 'start':
+                        if root is None:
+                            root = elem
+                        continue
+                    if elem.tag == 'scaninfo' and elem.get('type'):
+                        scan_types.append(elem.get('type').upper())
+                    elif elem.tag == 'finished' and elem.get('timestr'):
+                        durations.append(elem.get('timestr'))
+                    elif elem.tag == 'host':
+                        total_open_ports += self._spool_host(elem, scan, names_by_ip, cdn, spool, addresses)
+                        # Drop the finished host (and anything before it) from the partial tree
+                        root.clear()
+            except ET.ParseError as e:
+                error(f"Could not parse Nmap XML file {name}: {e}")
+        spool.close()
+
+        nmap_data = {
+            "scan_summary": {
+                "scan_type": "/".join(dict.fromkeys(scan_types)) or "N/A",
+                "duration": durations[-1] if durations else "N/A",
+                "total_open_ports": total_open_ports,
+                "files": [os.path.basename(path) for path in nmap_files]
+            },
+            "hosts": spool
+        }
+        if names_by_ip:
+            nmap_data["scan_summary"]["unique_ips_scanned"] = len(addresses)
+        # CDN addresses the scan plan left out entirely
+        skipped = plan.get('skipped', []) if plan else []
+        if skipped:
+            nmap_data["cdn_skipped"] = [{"ip_address": ip, "provider": cdn.provider(ip),
+                                         "hostnames": names_by_ip.get(ip, [])} for ip in skipped]
+        return nmap_data if len(spool) or skipped else None
+
+    def _spool_host(self, host, scan, names_by_ip, cdn, spool, addresses):
+        """Spools the records of one <host> element; returns its number of open ports."""
+        address = host.find('address')
+        host_info = {
+            "hostname": self._get_hostname(host),
+            "ip_address": address.get('addr') if address is not None else "N/A",
+            "open_ports": [],
+            "scan": scan
+        }
+        host_info["provider"] = cdn.provider(host_info["ip_address"])
+        addresses.add(host_info["ip_address"])
+
+        for port in host.findall('ports/port'):
+            state = port.find('state')
+            if state is not None and state.get('state') == 'open':
+                service = port.find('service')
+                service_name = service.get('name', 'N/A') if service is not None else 'N/A'
+                host_info["open_ports"].append({
+                    "port_id": port.get('portid'),
+                    "protocol": port.get('protocol'),
+                    "service_name": service_name,
+                    "service_version": self._get_service_version(service),
+                    "recommendation": self._get_recommendation(port.get('portid'), service_name)
+                })
+
+        if host_info["open_ports"]:
+            for name in names_by_ip.get(host_info["ip_address"], [host_info["hostname"]]):
+                spool.append(dict(host_info, hostname=name))
+        return len(host_info["open_ports"])
 
     def generate(self):
         """
@@ -201,9 +326,21 @@ class FinalJsonGenerator:
         if subdomain_data:
             self.final_data['subdomains'] = subdomain_data
 
+        resolution_data = self.parse_resolution()
+        if resolution_data:
+            self.final_data['resolution'] = resolution_data
+
+        wildcard_data = self.parse_wildcards()
+        if wildcard_data:
+            self.final_data['wildcards'] = wildcard_data
+
         service_data = self.parse_services()
         if service_data:
             self.final_data['services'] = service_data
+            # Services carry their cluster id; the clusters list what each group looks like
+            clusters = load_clusters(self.log_dir)
+            if clusters:
+                self.final_data['clusters'] = clusters
 
         nmap_data = self.parse_nmap()
         if nmap_data:
@@ -213,17 +350,23 @@ class FinalJsonGenerator:
         from datetime import datetime
         self.final_data["scan_info"]["scan_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        # Save the final JSON file
+        # Save the final JSON file (spooled host lists are streamed in, not loaded)
         try:
             os.makedirs(self.json_dir, exist_ok=True)
             output_path = os.path.join(self.json_dir, "final.json")
-            with open(output_path, 'w') as f:
-                json.dump(self.final_data, f, indent=4)
+            with open(f"{output_path}.tmp", 'w') as f:
+                write_json(f, self.final_data)
+                f.write("\n")
+            os.replace(f"{output_path}.tmp", output_path)
             info(f"Final JSON report saved to: {output_path}")
             return True
         except Exception as e:
             error(f"Failed to write final.json: {e}")
             return False
+        finally:
+            for spool in self._spools:
+                spool.discard()
+            self._spools = []
 
     # --- Helper Methods ---
     
@@ -235,12 +378,12 @@ class FinalJsonGenerator:
             return next((g for g in match.groups() if g is not None), default).strip()
         return default
 
-    def _find_nmap_xml(self):
-        """Finds the first Nmap XML file in the logs directory."""
-        for filename in os.listdir(self.log_dir):
-            if filename.startswith("nmap_") and filename.endswith(".xml"):
-                return os.path.join(self.log_dir, filename)
-        return None
+    def _find_nmap_xmls(self):
+        """Every Nmap XML file in the logs directory (one per scan type run)."""
+        if not os.path.isdir(self.log_dir):
+            return []
+        return [os.path.join(self.log_dir, filename) for filename in sorted(os.listdir(self.log_dir))
+                if filename.startswith("nmap_") and filename.endswith(".xml")]
         
     def _get_hostname(self, host_element):
         """Extracts the most likely hostname from an Nmap host element."""
@@ -0,0 +1,131 @@
+# KESTREL/Engine/host_cache.py
+# Description: Cross-target cache of nmap results per IP and scan profile, merged back into each target's output.
+
+import os
+import time
+import xml.etree.ElementTree as ET
+from .cache import get_cache
+from .nmap_shards import iter_run, run_attrib, RunWriter
+
+CACHE_TOOL = "nmap_host"          # CACHE_TTL key
+EMPTY_TOOL = "nmap_host_empty"    # CACHE_TTL key of IPs with no open port, kept for a shorter time
+HOST_FILE = "host.xml"            # one <host> element, or empty when the sweep found no open port
+
+
+def _ipv4_of(host):
+    for address in host.findall('address'):
+        if address.get('addrtype') == 'ipv4':
+            return address.get('addr')
+    return None
+
+def cached_hosts(addresses, profile):
+    """
+    Splits 'addresses' into fresh cache hits ({ip: <host> XML, or '' for an
+    IP known to have no open port}) and the IPs that still need scanning.
+    """
+    cache = get_cache()
+    hits, misses = {}, []
+    for address in addresses:
+        for tool in (CACHE_TOOL, EMPTY_TOOL):
+            files = cache.load_text(tool, address, profile) if cache.cacheable(tool) else None
+            if files is not None and HOST_FILE in files:
+                hits[address] = files[HOST_FILE]
+                break
+        else:
+            misses.append(address)
+    return hits, misses
+
+def store_hosts(out_x, profile, scanned, empty=()):
+    """
+    Caches every <host> of out_x (None when the scan produced no output)
+    that was scanned in this run, plus an empty entry for each IP in
+    'empty' (swept with no open port, so nmap never saw it) that expires
+    after the much shorter CACHE_TTL[EMPTY_TOOL]. IPs missing from the
+    output (down, failed shard) are not cached. out_x is streamed host by
+    host. Returns the number of entries stored.
+    """
+    cache = get_cache()
+    scanned = set(scanned)
+    stored = 0
+    if out_x and os.path.exists(out_x):
+        try:
+            for host in iter_run(out_x):
+                if host.tag != 'host':
+                    continue
+                address = _ipv4_of(host)
+                status = host.find('status')
+                if address in scanned and status is not None and status.get('state') == 'up':
+                    host.tail = None
+                    stored += cache.store_text(CACHE_TOOL, address, profile,
+                                               {HOST_FILE: ET.tostring(host, encoding='unicode')}, evict=False)
+        except ET.ParseError:
+            pass
+    if cache.cacheable(EMPTY_TOOL):
+        for address in empty:
+            stored += cache.store_text(EMPTY_TOOL, address, profile, {HOST_FILE: ""}, evict=False)
+    if stored:
+        cache.evict()
+    return stored
+
+def _normal_block(host):
+    """A short nmap -oN style block for a cached <host> element."""
+    address = _ipv4_of(host) or "unknown"
+    scanned_at = int(host.get('starttime', 0) or 0)
+    when = time.strftime('%Y-%m-%d %H:%M', time.localtime(scanned_at)) if scanned_at else "an earlier run"
+    lines = [f"Nmap scan report for {address} (cached result from {when})", "Host is up.", ""]
+    rows = []
+    for port in host.findall('ports/port'):
+        state = port.find('state')
+        service = port.find('service')
+        version = " ".join(v for v in (service.get('product'), service.get('version'), service.get('extrainfo'))
+                           if v) if service is not None else ""
+        rows.append((f"{port.get('portid')}/{port.get('protocol')}", state.get('state') if state is not None else "",
+                     service.get('name', '') if service is not None else "", version))
+    if rows:
+        widths = [max(len(row[i]) for row in rows + [("PORT", "STATE", "SERVICE", "")]) for i in range(3)]
+        for row in [("PORT", "STATE", "SERVICE", "VERSION")] + rows:
+            lines.append(f"{row[0]:<{widths[0]}} {row[1]:<{widths[1]}} {row[2]:<{widths[2]}} {row[3]}".rstrip())
+    else:
+        lines.append("No open ports in the cached result.")
+    return "\n".join(lines) + "\n\n"
+
+def add_cached_hosts(out_n, out_x, hits):
+    """
+    Appends the cached <host> elements to out_x (adjusting its host counts)
+    and a block per host to out_n, so both read like this run scanned them.
+    out_x is rewritten as a stream, with the cached hosts inserted before
+    its runstats. Empty hits (no open port) add nothing. Returns the hosts added.
+    """
+    hosts = [ET.fromstring(text) for text in hits.values() if text]
+    if not hosts:
+        return 0
+
+    inserted = False
+    with RunWriter(out_x, out_x, run_attrib(out_x)) as out:
+        for child in iter_run(out_x):
+            if child.tag == 'runstats':
+                for host in hosts:
+                    out.write(host)
+                inserted = True
+                counts = child.find('hosts')
+                if counts is not None:
+                    counts.set('up', str(int(counts.get('up', 0)) + len(hosts)))
+                    counts.set('total', str(int(counts.get('total', 0)) + len(hosts)))
+            out.write(child)
+        if not inserted:
+            for host in hosts:
+                out.write(host)
+
+    with open(out_n, 'r', encoding='utf-8', errors='replace') as f:
+        lines = f.readlines()
+    # Before nmap's closing "# Nmap done" line, where the hosts of the run are
+    end = next((i for i in range(len(lines) - 1, -1, -1) if lines[i].startswith("# Nmap done")), len(lines))
+    blocks = "".join(_normal_block(host) for host in hosts)
+    blocks += f"# {len(hosts)} host(s) above reused from the Nmap result cache\n"
+    tmp_path = f"{out_n}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.writelines(lines[:end])
+        f.write(blocks)
+        f.writelines(lines[end:])
+    os.replace(tmp_path, out_n)
+    return len(hosts)
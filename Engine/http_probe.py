@@ -0,0 +1,405 @@
+# KESTREL/Engine/http_probe.py
+# Description: Built-in asyncio HTTP/HTTPS prober with pooled keep-alive connections, writing httpx-style JSON lines.
+
+import asyncio
+import hashlib
+import html
+import ipaddress
+import json
+import re
+import socket
+import ssl
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from .supervisor import cancelled
+from config import HTTP_CONCURRENCY, HTTP_MAX_PER_HOST, HTTP_TIMEOUT, HTTP_MAX_BODY, HTTP_USER_AGENT
+
+_TITLE_RE = re.compile(rb"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+_CHARSET_RE = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+MAX_HEADERS = 100
+
+
+# --- TLS certificates ---------------------------------------------------------
+# An unverified peer's certificate is only available DER-encoded (getpeercert()
+# returns {} without verification), so the few fields httpx reports are read
+# straight from the ASN.1.
+
+_OID_CN = bytes.fromhex("550403")
+_OID_ORG = bytes.fromhex("55040a")
+_OID_SAN = bytes.fromhex("551d11")
+
+def _tlv(data, pos):
+    """(tag, start of value, end of value) of the DER element at pos."""
+    tag, length = data[pos], data[pos + 1]
+    pos += 2
+    if length & 0x80:
+        count = length & 0x7f
+        length = int.from_bytes(data[pos:pos + count], 'big')
+        pos += count
+    return tag, pos, pos + length
+
+def _children(data, start, end):
+    while start < end:
+        tag, value, start = _tlv(data, start)
+        yield tag, value, start
+
+def _name_attrs(data, start, end):
+    """{OID bytes: text} of an X.501 Name (SEQUENCE of SETs of (OID, value))."""
+    attrs = {}
+    for _, set_start, set_end in _children(data, start, end):
+        for _, seq_start, seq_end in _children(data, set_start, set_end):
+            (_, oid_start, oid_end), (_, val_start, val_end) = list(_children(data, seq_start, seq_end))[:2]
+            attrs.setdefault(data[oid_start:oid_end], data[val_start:val_end].decode('utf-8', 'replace'))
+    return attrs
+
+def _cert_time(data, tag, start, end):
+    text = data[start:end].decode('ascii', 'replace').rstrip('Z')
+    if tag == 0x17:   # UTCTime: two-digit year
+        text = ("19" if int(text[:2]) >= 50 else "20") + text
+    return f"{text[0:4]}-{text[4:6]}-{text[6:8]}T{text[8:10]}:{text[10:12]}:{text[12:14]}Z"
+
+def parse_certificate(der):
+    """subject/issuer CN and organisation, DNS alt names and validity of a DER certificate ({} if unreadable)."""
+    try:
+        _, cert_start, cert_end = _tlv(der, 0)
+        _, tbs_start, tbs_end = _tlv(der, cert_start)
+        fields = list(_children(der, tbs_start, tbs_end))
+        if fields[0][0] == 0xa0:        # explicit version
+            fields = fields[1:]
+        # serial, signature algorithm, issuer, validity, subject, key, [extensions]
+        issuer = _name_attrs(der, fields[2][1], fields[2][2])
+        subject = _name_attrs(der, fields[4][1], fields[4][2])
+        not_before, not_after = [_cert_time(der, *child) for child in _children(der, fields[3][1], fields[3][2])]
+        names = []
+        for tag, start, end in fields[6:]:
+            if tag != 0xa3:
+                continue
+            _, ext_start, ext_end = _tlv(der, start)
+            for _, e_start, e_end in _children(der, ext_start, ext_end):
+                parts = list(_children(der, e_start, e_end))
+                if der[parts[0][1]:parts[0][2]] != _OID_SAN:
+                    continue
+                _, san_start, san_end = _tlv(der, parts[-1][1])
+                names = [der[s:e].decode('ascii', 'replace') for t, s, e in _children(der, san_start, san_end)
+                         if t == 0x82]    # dNSName
+    except (IndexError, ValueError):
+        return {}
+    cert = {"subject_cn": subject.get(_OID_CN), "subject_org": subject.get(_OID_ORG), "subject_an": names,
+            "issuer_cn": issuer.get(_OID_CN), "issuer_org": issuer.get(_OID_ORG),
+            "not_before": not_before, "not_after": not_after}
+    return {key: value for key, value in cert.items() if value}
+
+
+# --- Connections ----------------------------------------------------------------
+
+class _Connection:
+    def __init__(self, reader, writer, tls=None):
+        self.reader = reader
+        self.writer = writer
+        self.tls = tls
+        self.reused = False
+
+    def usable(self):
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    def close(self):
+        self.writer.close()
+
+
+def _tls_version(version):
+    """ssl's 'TLSv1.3' / 'TLSv1' / 'SSLv3' in httpx's spelling: 'tls13' / 'tls10' / 'ssl30'."""
+    version = (version or "").lower()
+    digits = "".join(ch for ch in version if ch.isdigit())
+    if not digits:
+        return version
+    return ("ssl" if version.startswith("ssl") else "tls") + digits.ljust(2, "0")
+
+
+class ConnectionPool:
+    """
+    Keep-alive connections per (scheme, address, port, TLS server name):
+    plain HTTP virtual hosts behind one address share their connections.
+    At most max_per_host connections per key are open at once, and at
+    most max_idle connections are kept idle in total.
+    """
+    def __init__(self, max_per_host=HTTP_MAX_PER_HOST, max_idle=HTTP_CONCURRENCY, timeout=HTTP_TIMEOUT):
+        self.max_per_host = max_per_host
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.slots = {}
+        self.idle = {}
+        self.idle_count = 0
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        self.context.check_hostname = False
+        self.context.verify_mode = ssl.CERT_NONE
+        self.context.set_alpn_protocols(["http/1.1"])
+
+    async def acquire(self, key):
+        slot = self.slots.setdefault(key, asyncio.Semaphore(self.max_per_host))
+        await slot.acquire()
+        idle = self.idle.get(key)
+        while idle:
+            conn = idle.pop()
+            self.idle_count -= 1
+            if conn.usable():
+                conn.reused = True
+                return conn
+            conn.close()
+        try:
+            return await self._open(*key)
+        except BaseException:
+            slot.release()
+            raise
+
+    async def _open(self, scheme, address, port, server_name):
+        if scheme != 'https':
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(address, port), self.timeout)
+            return _Connection(reader, writer)
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(address, port, ssl=self.context, server_hostname=server_name or None),
+            self.timeout)
+        tls_object = writer.get_extra_info('ssl_object')
+        tls = {"host": server_name or address, "port": str(port),
+               "tls_version": _tls_version(tls_object.version()),
+               "cipher": tls_object.cipher()[0]}
+        der = tls_object.getpeercert(binary_form=True)
+        if der:
+            tls.update(parse_certificate(der))
+        return _Connection(reader, writer, tls)
+
+    def release(self, key, conn, reusable):
+        if reusable and conn.usable() and self.idle_count < self.max_idle:
+            self.idle.setdefault(key, []).append(conn)
+            self.idle_count += 1
+        else:
+            conn.close()
+        self.slots[key].release()
+
+    def close(self):
+        for conns in self.idle.values():
+            for conn in conns:
+                conn.close()
+        self.idle.clear()
+        self.idle_count = 0
+
+
+# --- HTTP -------------------------------------------------------------------------
+
+async def _read_body(reader, headers, max_body):
+    """(body, whether the whole body was read, so the connection can be reused)."""
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        body = b""
+        while True:
+            size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                while (await reader.readline()).strip():
+                    pass      # trailers
+                return body, True
+            if len(body) + size > max_body:
+                body += await reader.readexactly(max_body - len(body))
+                return body, False
+            body += await reader.readexactly(size)
+            await reader.readline()
+    if 'content-length' in headers:
+        length = int(headers['content-length'])
+        body = await reader.readexactly(min(length, max_body))
+        return body, length <= max_body
+    # Neither: the body ends when the server closes the connection
+    blocks, size = [], 0
+    while size < max_body:
+        block = await reader.read(max_body - size)
+        if not block:
+            break
+        blocks.append(block)
+        size += len(block)
+    return b"".join(blocks), False
+
+async def _exchange(conn, method, target, host_header, max_body):
+    """Sends one request on conn; returns (status, headers, body, reusable)."""
+    conn.writer.write((f"{method} {target} HTTP/1.1\r\nHost: {host_header}\r\nUser-Agent: {HTTP_USER_AGENT}\r\n"
+                       f"Accept: */*\r\nConnection: keep-alive\r\n\r\n").encode('latin-1'))
+    await conn.writer.drain()
+    status_line = await conn.reader.readline()
+    if not status_line:
+        raise ConnectionResetError("connection closed before the response")
+    parts = status_line.decode('latin-1').split(None, 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+        raise ValueError("not an HTTP response")
+    version, status = parts[0], int(parts[1])
+    headers = {}
+    for _ in range(MAX_HEADERS):
+        line = (await conn.reader.readline()).decode('latin-1').strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers.setdefault(name.strip().lower(), value.strip())
+    if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+        body, complete = b"", True
+    else:
+        body, complete = await _read_body(conn.reader, headers, max_body)
+    connection = headers.get('connection', '').lower()
+    keep_alive = 'keep-alive' in connection if version == "HTTP/1.0" else 'close' not in connection
+    return status, headers, body, complete and keep_alive
+
+def _title(body, content_type):
+    match = _TITLE_RE.search(body)
+    if not match:
+        return None
+    charset = _CHARSET_RE.search(content_type or "")
+    try:
+        text = match.group(1).decode(charset.group(1) if charset else 'utf-8', 'replace')
+    except LookupError:
+        text = match.group(1).decode('utf-8', 'replace')
+    return " ".join(html.unescape(text).split()) or None
+
+def _is_ip(name):
+    try:
+        ipaddress.ip_address(name)
+        return True
+    except ValueError:
+        return False
+
+def candidate_urls(line):
+    """URLs tried for one input line: a URL as given, otherwise https and then http (like httpx)."""
+    line = line.strip()
+    if not line:
+        return []
+    if "://" in line:
+        return [line]
+    return [f"https://{line}", f"http://{line}"]
+
+
+class HttpProber:
+    """
+    Probes URLs with a shared connection pool and resolver cache. probe()
+    returns an httpx -json style record for the first candidate URL that
+    answers with any HTTP response, or None.
+    """
+    def __init__(self, pool=None, timeout=HTTP_TIMEOUT, max_body=HTTP_MAX_BODY):
+        self.pool = pool or ConnectionPool(timeout=timeout)
+        self.timeout = timeout
+        self.max_body = max_body
+        self.addresses = {}
+
+    async def _resolve(self, host):
+        if _is_ip(host):
+            return [host]
+        if host not in self.addresses:
+            loop = asyncio.get_running_loop()
+            try:
+                infos = await asyncio.wait_for(loop.getaddrinfo(host, None, type=socket.SOCK_STREAM), self.timeout)
+            except (OSError, UnicodeError, asyncio.TimeoutError):
+                infos = []
+            # IPv4 first, as httpx connects
+            self.addresses[host] = sorted(dict.fromkeys(info[4][0] for info in infos), key=lambda a: ':' in a)
+        return self.addresses[host]
+
+    async def fetch(self, url, method='GET'):
+        """The record for one URL, or None when it doesn't answer HTTP."""
+        try:
+            parts = urlsplit(url)
+            scheme, host, port = parts.scheme.lower(), parts.hostname, parts.port
+        except ValueError:
+            return None
+        if scheme not in ('http', 'https') or not host:
+            return None
+        port = port or (443 if scheme == 'https' else 80)
+        addresses = await self._resolve(host)
+        if not addresses:
+            return None
+        address = addresses[0]
+        key = (scheme, address, port, host if scheme == 'https' and not _is_ip(host) else None)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        host_header = parts.netloc.rsplit("@", 1)[-1]
+
+        started = time.monotonic()
+        for attempt in range(2):
+            try:
+                conn = await self.pool.acquire(key)
+            except (OSError, ssl.SSLError, asyncio.TimeoutError):
+                return None
+            try:
+                status, headers, body, reusable = await asyncio.wait_for(
+                    _exchange(conn, method, target, host_header, self.max_body), self.timeout)
+            except (OSError, ssl.SSLError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                self.pool.release(key, conn, False)
+                # A pooled connection the server closed while idle: retry once on a new one
+                if attempt == 0 and conn.reused and isinstance(e, (ConnectionError, asyncio.IncompleteReadError)):
+                    continue
+                return None
+            self.pool.release(key, conn, reusable)
+            break
+        elapsed = time.monotonic() - started
+
+        content_type = headers.get('content-type', '')
+        record = {
+            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            "url": f"{scheme}://{host_header}{parts.path}" + (f"?{parts.query}" if parts.query else ""),
+            "input": host_header,
+            "host": address,
+            "port": str(port),
+            "scheme": scheme,
+            "path": parts.path or "/",
+            "method": method,
+            "status_code": status,
+            "content_length": int(headers['content-length']) if headers.get('content-length', '').isdigit()
+                              else len(body),
+            "content_type": content_type.split(";")[0].strip(),
+            "title": _title(body, content_type),
+            "hash": {"body_md5": hashlib.md5(body).hexdigest()},
+            "words": len(body.split()),
+            "lines": body.count(b"\n") + 1 if body else 0,
+            "webserver": headers.get('server'),
+            "location": headers.get('location'),
+            "a": [a for a in addresses if ':' not in a],
+            "tls": conn.tls,
+            "time": f"{elapsed * 1000:.2f}ms",
+            "failed": False,
+        }
+        return {key: value for key, value in record.items() if value not in (None, "", [])}
+
+    async def probe(self, line):
+        """The record of the first candidate URL of an input line that answers, or None."""
+        for url in candidate_urls(line):
+            record = await self.fetch(url)
+            if record:
+                record['input'] = line.strip()
+                return record
+        return None
+
+
+async def _probe_all(lines, out, concurrency, timeout):
+    prober = HttpProber(ConnectionPool(max_idle=concurrency, timeout=timeout), timeout=timeout)
+    lines = iter(lines)
+    stats = {'probed': 0, 'live': 0}
+
+    async def _worker():
+        # Workers share one iterator: only 'concurrency' inputs are in flight, however long the list
+        for line in lines:
+            if cancelled():
+                return
+            if not line.strip():
+                continue
+            stats['probed'] += 1
+            record = await prober.probe(line)
+            if record:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                stats['live'] += 1
+
+    try:
+        await asyncio.gather(*(_worker() for _ in range(max(1, concurrency))))
+    finally:
+        prober.pool.close()
+    return stats
+
+def probe_to_file(lines, output_path, mode='a', concurrency=HTTP_CONCURRENCY, timeout=HTTP_TIMEOUT):
+    """
+    Probes every input line (host, host:port or URL) and writes one JSON
+    line per live URL to output_path as soon as it answers, so a skip or
+    crash keeps everything found so far. Stops taking new inputs when the
+    calling module is skipped. Returns {'probed': n, 'live': n}.
+    """
+    with open(output_path, mode) as out:
+        return asyncio.run(_probe_all(lines, out, concurrency, timeout))
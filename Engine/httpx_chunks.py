@@ -0,0 +1,251 @@
+# KESTREL/Engine/httpx_chunks.py
+# Description: Runs httpx-toolkit over a large host list as resumable chunks, appending each finished chunk to alive.json,
+# and records the finished batches of a streaming run so a resumed run skips them.
+
+import json
+import os
+import subprocess
+import threading
+import time
+from .logger import info, warning, error, get_log_file, set_log_file
+from .progress import get_board
+from .supervisor import run_tool, cancelled, current_unit, current_output_log, set_unit
+from config import (HTTPX_CHUNK_SIZE, HTTPX_WORKERS, HTTPX_CHUNK_TIMEOUT, HTTPX_CHUNK_RETRIES,
+                    HTTPX_EXTRA_FLAGS)
+
+CHUNKS_DIR = "httpx_chunks"        # under Logs/; kept only for chunks not done yet
+CHUNKS_STATE = "httpx_chunks.json"  # under Logs/; the chunks already in alive.json
+STREAM_STATE = "httpx_stream.json"  # under Logs/; file sizes after the last finished streaming batch
+STREAM_NAMES = "httpx_stream_names.txt"  # under Logs/; the names of the finished streaming batches
+
+
+def _signature(input_file, chunk_size):
+    """What a resumed run must match to reuse the recorded chunks."""
+    stat = os.stat(input_file)
+    return {'input': os.path.abspath(input_file), 'size': stat.st_size, 'mtime': stat.st_mtime,
+            'chunk_size': chunk_size}
+
+def _load_state(path, signature, json_output):
+    """
+    The recorded state when it belongs to this input and alive.json still
+    holds what it recorded (anything appended after the last record is cut
+    off), otherwise None.
+    """
+    try:
+        with open(path, 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if any(state.get(key) != value for key, value in signature.items()):
+        return None
+    if not os.path.exists(json_output) or os.path.getsize(json_output) < state.get('alive_bytes', 0):
+        return None
+    with open(json_output, 'r+b') as f:
+        f.truncate(state['alive_bytes'])
+    return state
+
+def _save_state(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=4)
+    os.replace(tmp_path, path)
+
+def _write_chunks(input_file, chunk_dir, chunk_size, done):
+    """Splits the input into chunk files (skipping recorded ones); returns [(index, path, hosts)]."""
+    chunks, lines, index = [], [], 0
+
+    def _flush():
+        if index not in done:
+            path = os.path.join(chunk_dir, f"chunk_{index:05d}.txt")
+            with open(path, 'w') as f:
+                f.writelines(lines)
+            chunks.append((index, path, len(lines)))
+
+    with open(input_file, 'r', errors='replace') as src:
+        for line in src:
+            if not line.strip():
+                continue
+            lines.append(line if line.endswith("\n") else line + "\n")
+            if len(lines) == chunk_size:
+                _flush()
+                lines, index = [], index + 1
+    if lines:
+        _flush()
+        index += 1
+    return chunks, index
+
+def run_chunked(input_file, json_output, on_chunk=None, chunk_size=HTTPX_CHUNK_SIZE, workers=HTTPX_WORKERS,
+                timeout=HTTPX_CHUNK_TIMEOUT, retries=HTTPX_CHUNK_RETRIES):
+    """
+    Probes the hosts of input_file with httpx-toolkit in chunks of
+    chunk_size, up to 'workers' processes at a time. Each finished chunk is
+    appended to json_output and recorded in Logs/httpx_chunks.json together
+    with the size of json_output, so a skip, a timeout or a crash loses at
+    most the chunks in flight: running again on the same input (a resumed
+    run) only probes the chunks not recorded. A chunk that fails or times
+    out is retried on its own. on_chunk() is called after each append.
+    Returns (chunks done, chunks failed); the recorded ones count as done.
+    """
+    logs_dir = os.path.dirname(json_output)
+    chunk_dir = os.path.join(logs_dir, CHUNKS_DIR)
+    state_path = os.path.join(logs_dir, CHUNKS_STATE)
+    os.makedirs(chunk_dir, exist_ok=True)
+
+    signature = _signature(input_file, chunk_size)
+    state = _load_state(state_path, signature, json_output)
+    if state:
+        info(f"Resuming HTTPX: {len(state['done'])} chunks are already in {os.path.basename(json_output)}.")
+    else:
+        open(json_output, 'w').close()
+        state = dict(signature, done=[], alive_bytes=0)
+        # Chunk files of an earlier input or chunk size
+        for name in os.listdir(chunk_dir):
+            os.remove(os.path.join(chunk_dir, name))
+    done = set(state['done'])
+    chunks, total = _write_chunks(input_file, chunk_dir, chunk_size, done)
+    state['chunks'] = total
+    _save_state(state_path, state)
+    if not chunks:
+        return len(done), 0
+
+    pending = list(chunks)
+    failed = []
+    lock = threading.Lock()
+    board, started = get_board(), time.time()
+    # Chunk threads act for the calling module: same skip/quit tag, tool log and log sink
+    unit, output_log, log_file = current_unit(), current_output_log(), get_log_file()
+    run_id = board.start(unit, "httpx")
+
+    def _append(index, output):
+        with lock:
+            if os.path.exists(output):
+                with open(output, 'rb') as src, open(json_output, 'ab') as dst:
+                    while True:
+                        block = src.read(1 << 20)
+                        if not block:
+                            break
+                        dst.write(block)
+                    state['alive_bytes'] = dst.tell()
+                os.remove(output)
+            done.add(index)
+            state['done'] = sorted(done)
+            _save_state(state_path, state)
+            finished = len(done) - (total - len(chunks))
+            remaining = (time.time() - started) / finished * (len(chunks) - finished)
+            board.update(run_id, percent=100.0 * len(done) / total, remaining=int(remaining),
+                         phase=f"chunk {len(done)}/{total}")
+            if on_chunk:
+                on_chunk()
+
+    def _worker():
+        set_unit(unit, output_log)
+        set_log_file(log_file)
+        while True:
+            with lock:
+                if not pending:
+                    return
+                index, path, count = pending.pop(0)
+            label = f"HTTPX chunk {index + 1}/{total} ({count} hosts)"
+            output = f"{path[:-len('.txt')]}.json"
+            error_text = None
+            for attempt in range(retries + 1):
+                if cancelled():
+                    return
+                if attempt:
+                    warning(f"{label} failed ({error_text}); retrying, attempt {attempt + 1}...")
+                if os.path.exists(output):
+                    os.remove(output)
+                try:
+                    result = run_tool(["httpx-toolkit", "-json", *HTTPX_EXTRA_FLAGS, "-o", output], stdin=path,
+                                      timeout=timeout)
+                except subprocess.TimeoutExpired:
+                    error_text = f"timed out after {timeout} seconds"
+                    continue
+                except Exception as e:
+                    error_text = str(e)
+                    continue
+                if result.returncode == 0:
+                    _append(index, output)
+                    os.remove(path)
+                    info(f"{label} done.")
+                    break
+                error_text = result.stderr.strip()[-300:] or f"exit code {result.returncode}"
+            else:
+                if os.path.exists(output):
+                    os.remove(output)
+                with lock:
+                    failed.append((index, path, error_text))
+
+    threads = [threading.Thread(target=_worker, daemon=True) for _ in range(max(1, min(workers, len(chunks))))]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        board.finish(run_id)
+
+    for index, path, error_text in sorted(failed):
+        error(f"HTTPX chunk {index + 1}/{total} gave up: {error_text}. "
+              f"Its hosts are listed in {os.path.relpath(path, logs_dir)}.")
+    if not os.listdir(chunk_dir):
+        os.rmdir(chunk_dir)
+    return len(done), len(failed)
+
+
+class StreamLedger:
+    """
+    Progress of a streaming HTTPX run (names arriving from the enumeration
+    modules in batches). After each finished batch its names are appended
+    to Logs/httpx_stream_names.txt and the sizes of the files the batches
+    append to (alive.json, the resolution files) are recorded in
+    Logs/httpx_stream.json. A resumed run cuts those files back to the last
+    record and skips the names listed, so it loses at most the batch that
+    was in flight.
+    """
+    def __init__(self, logs_dir, scope, paths):
+        self.state_path = os.path.join(logs_dir, STREAM_STATE)
+        self.names_path = os.path.join(logs_dir, STREAM_NAMES)
+        self.scope = scope
+        self.paths = list(paths)
+        self.sizes = {}
+
+    def open(self):
+        """
+        Returns the names already handled: those of the recorded batches,
+        with every file cut back to the record, or none (every file emptied)
+        when there is no usable record for this scope.
+        """
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        sizes = state.get('sizes', {}) if state.get('scope') == self.scope else {}
+        files = self.paths + [self.names_path]
+        if not sizes or any(not os.path.exists(path) or os.path.getsize(path) < sizes.get(path, 0)
+                            or path not in sizes for path in files):
+            sizes = {path: 0 for path in files}
+        for path in files:
+            with open(path, 'a+b') as f:
+                f.truncate(sizes[path])
+        self.sizes = sizes
+        self._save()
+        with open(self.names_path, 'r') as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def commit(self, names):
+        """Records a finished batch: its names and the current size of every file."""
+        with open(self.names_path, 'a') as f:
+            f.writelines(f"{name}\n" for name in names)
+        self.sizes = {path: os.path.getsize(path) for path in self.paths + [self.names_path]}
+        self._save()
+
+    def rollback(self):
+        """Cuts every file back to the last finished batch (a batch that gave up)."""
+        for path in self.paths:
+            with open(path, 'r+b') as f:
+                f.truncate(self.sizes[path])
+
+    def _save(self):
+        _save_state(self.state_path, {'scope': self.scope, 'sizes': self.sizes})
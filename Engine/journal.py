@@ -0,0 +1,149 @@
+# KESTREL/Engine/journal.py
+# Description: Append-only run journal (JSON Lines) that makes interrupted runs resumable.
+
+import json
+import os
+import threading
+import time
+
+RUNS_DIR = ".runs"
+# Module states that count as finished when a run is resumed ('running' and
+# 'pending' units were interrupted, and 'failed' ones may have hit a transient
+# error: those run again)
+COMPLETED_STATES = ('done', 'skipped', 'cached', 'resumed')
+# What a failed or skipped module that keeps its partial progress (MODULE_MAP
+# 'resumable') is recorded as: it is entered again, and its target is not done
+INCOMPLETE_STATE = 'incomplete'
+
+
+class RunJournal:
+    """
+    Records a run as JSON lines in <results_dir>/.runs/<run_id>.jsonl: one
+    'run' line with the selection, then 'target' lines with each target's
+    directory, 'module' lines with every (target, module) state change and
+    its artifact paths, and 'target_end' lines. Lines are only ever appended
+    and fsynced, so a crash loses at most the line being written; replaying
+    the file gives the last state of every unit.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.run_id = os.path.splitext(os.path.basename(path))[0]
+        self.run = None
+        self.target_dirs = {}     # index -> target directory
+        self.target_status = {}   # index -> final status
+        self.units = {}           # (index, module choice) -> state
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, results_dir, name, targets, module_choices, report_enabled,
+               is_file_input=False, file_name=None, module_options=None):
+        runs_dir = os.path.join(results_dir, RUNS_DIR)
+        os.makedirs(runs_dir, exist_ok=True)
+        name = "".join(c for c in name if c.isalnum() or c in ['.', '-', '_'])
+        run_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{name}"
+        path = os.path.join(runs_dir, f"{run_id}.jsonl")
+        suffix = 1
+        while os.path.exists(path):
+            suffix += 1
+            path = os.path.join(runs_dir, f"{run_id}_{suffix}.jsonl")
+        journal = cls(path)
+        journal._append({
+            'event': 'run', 'targets': list(targets), 'module_choices': module_choices,
+            'report_enabled': report_enabled, 'is_file_input': is_file_input,
+            'file_name': file_name, 'module_options': module_options or {},
+        })
+        return journal
+
+    @classmethod
+    def open(cls, results_dir, run):
+        """Loads a journal by run id or path. Raises FileNotFoundError or ValueError."""
+        path = run
+        if not os.path.exists(path):
+            path = os.path.join(results_dir, RUNS_DIR, run if run.endswith('.jsonl') else f"{run}.jsonl")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No run journal found for '{run}'")
+        journal = cls(path)
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    journal._apply(json.loads(line))
+                except json.JSONDecodeError:
+                    # A line cut short by a crash
+                    continue
+        if journal.run is None:
+            raise ValueError(f"{path} is not a KESTREL run journal")
+        return journal
+
+    def _apply(self, record):
+        event = record.get('event')
+        if event == 'run':
+            self.run = record
+        elif event == 'target':
+            self.target_dirs[record['index']] = record['dir']
+        elif event == 'module':
+            self.units[(record['index'], record['module'])] = record['state']
+        elif event == 'target_end':
+            self.target_status[record['index']] = record['status']
+
+    def _append(self, record):
+        record['time'] = time.strftime("%Y-%m-%d %H:%M:%S")
+        line = json.dumps(record, separators=(',', ':'), default=str)
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(record)
+
+    def set_target_dir(self, index, target, target_dir):
+        self._append({'event': 'target', 'index': index, 'target': target, 'dir': target_dir})
+
+    def target_dir(self, index):
+        """The directory a resumed target already used (None if it is gone)."""
+        target_dir = self.target_dirs.get(index)
+        return target_dir if target_dir and os.path.isdir(target_dir) else None
+
+    def record(self, index, target, choice, state, artifacts=None):
+        entry = {'event': 'module', 'index': index, 'target': target, 'module': choice, 'state': state}
+        if artifacts:
+            entry['artifacts'] = artifacts
+        self._append(entry)
+
+    def completed(self, index):
+        """Module choices of a target that finished in an earlier attempt."""
+        return {choice for (i, choice), state in self.units.items()
+                if i == index and state in COMPLETED_STATES}
+
+    def finish_target(self, index, target, status):
+        self._append({'event': 'target_end', 'index': index, 'target': target, 'status': status})
+
+    def target_done(self, index):
+        """A target that finished with every module completed (a failed one is retried on resume)."""
+        return self.target_status.get(index) == 'done' and all(
+            state in COMPLETED_STATES for (i, _choice), state in self.units.items() if i == index)
+
+    def for_target(self, index, target):
+        return TargetJournal(self, index, target)
+
+
+class TargetJournal:
+    """The part of a RunJournal that execute_modules sees: one target's units."""
+    def __init__(self, journal, index, target):
+        self.journal = journal
+        self.index = index
+        self.target = target
+
+    def completed(self):
+        return self.journal.completed(self.index)
+
+    def record(self, choice, state, artifacts=None):
+        self.journal.record(self.index, self.target, choice, state, artifacts)
+
+
+def list_runs(results_dir):
+    """Run ids of the journals under <results_dir>/.runs, newest first."""
+    runs_dir = os.path.join(results_dir, RUNS_DIR)
+    if not os.path.isdir(runs_dir):
+        return []
+    return sorted((os.path.splitext(f)[0] for f in os.listdir(runs_dir) if f.endswith('.jsonl')),
+                  reverse=True)
@@ -1,21 +1,44 @@
 # MSFconsole-style logging utility with full line coloring
+import threading
 import colorama
 from colorama import Fore, Style
 
 colorama.init(autoreset=True)
 
+# Batch runs route each target's messages to its own log file so parallel
+# targets don't interleave on the console. The setting is per thread.
+_local = threading.local()
+
+def set_log_file(path):
+    """Send this thread's messages to 'path' (None restores console output)."""
+    _local.log_file = path
+
+def get_log_file():
+    return getattr(_local, 'log_file', None)
+
+def _emit(color, tag, message):
+    log_file = get_log_file()
+    if log_file:
+        try:
+            with open(log_file, 'a') as f:
+                f.write(f"{tag} {message}\n")
+            return
+        except OSError:
+            pass
+    print(f"{color}{tag}{Style.RESET_ALL} {color}{message}{Style.RESET_ALL}")
+
 def info(message):
-    print(f"{Fore.CYAN}[*]{Style.RESET_ALL} {Fore.CYAN}{message}{Style.RESET_ALL}")
+    _emit(Fore.CYAN, "[*]", message)
 
 def success(message):
-    print(f"{Fore.GREEN}[+]{Style.RESET_ALL} {Fore.GREEN}{message}{Style.RESET_ALL}")
+    _emit(Fore.GREEN, "[+]", message)
 
 def warning(message):
-    print(f"{Fore.YELLOW}[!]{Style.RESET_ALL} {Fore.YELLOW}{message}{Style.RESET_ALL}")
+    _emit(Fore.YELLOW, "[!]", message)
 
 def error(message):
-    print(f"{Fore.RED}[-]{Style.RESET_ALL} {Fore.RED}{message}{Style.RESET_ALL}")
+    _emit(Fore.RED, "[-]", message)
 
 def target_info(message):
     """Special yellow color for target information"""
-    print(f"{Fore.YELLOW}[+]{Style.RESET_ALL} {Fore.YELLOW}{message}{Style.RESET_ALL}")
+    _emit(Fore.YELLOW, "[+]", message)
@@ -74,7 +74,7 @@ def show_help():
     L File input → @targets.txt (list of targets)
 
     [ + ] MODULE DESCRIPTIONS
-    [0] Complete Pipeline - Run all modules sequentially
+    [0] Complete Pipeline - Run all modules (independent ones in parallel)
 
     [1] Whois - Domain registration intelligence
     [2] Subfinder - Passive subdomain discovery
@@ -92,7 +92,7 @@ def show_help():
     [ + ] Runtime Control (during execution)
     [ - ] Trigger: 00 + ENTER
     [ - ] Actions:
-        s → Skip current module
+        s → Skip running module(s)
         q → Quit KESTREL entirely
     [ - ] Any other key → Exit Runtime Menu
 
@@ -0,0 +1,285 @@
+# KESTREL/Engine/nmap_shards.py
+# Description: Runs an nmap host list as parallel shards and merges their -oX/-oN outputs into one scan.
+
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import quoteattr
+from .logger import info, warning, error, get_log_file, set_log_file
+from .progress import get_board, NmapStats
+from .supervisor import run_tool, cancelled, current_unit, current_output_log, set_unit
+from config import NMAP_MAX_PARALLEL, NMAP_SHARD_RETRIES, NMAP_STATS_EVERY
+
+SHARDS_DIR = "nmap_shards"   # under Logs/; kept only for shards that failed
+
+# Every nmap process (all shards of all targets of a batch) takes one of these
+_slots = threading.BoundedSemaphore(max(1, NMAP_MAX_PARALLEL))
+
+
+def run_nmap(argv):
+    """
+    Runs one nmap process under the global NMAP_MAX_PARALLEL cap. With
+    NMAP_STATS_EVERY its periodic stats are parsed onto the progress board
+    (see Engine/progress.py) under the calling module's label.
+    """
+    if NMAP_STATS_EVERY:
+        argv = [argv[0], "--stats-every", f"{NMAP_STATS_EVERY}s", *argv[1:]]
+    with _slots:
+        board, unit = get_board(), current_unit()
+        run_id = board.start(unit, "nmap")
+        try:
+            return run_tool(argv, on_line=NmapStats(board, run_id, unit, get_log_file()).feed)
+        finally:
+            board.finish(run_id)
+
+def read_hosts(path):
+    """Unique non-empty lines of a host list, in file order."""
+    hosts = []
+    seen = set()
+    with open(path, 'r') as f:
+        for line in f:
+            host = line.strip()
+            if host and host not in seen:
+                seen.add(host)
+                hosts.append(host)
+    return hosts
+
+def split_hosts(hosts, shards):
+    """
+    Deals the hosts round-robin into at most 'shards' lists, so shard sizes
+    differ by one at most and neighbouring names (often the same network)
+    end up in different shards.
+    """
+    shards = max(1, min(shards, len(hosts)))
+    return [hosts[i::shards] for i in range(shards)]
+
+def _complete_xml(path):
+    """True when path is a whole nmap XML document (a killed nmap leaves it unterminated)."""
+    finished = False
+    try:
+        for child in iter_run(path):
+            if child.tag == 'runstats' and child.find('finished') is not None:
+                finished = True
+    except (ET.ParseError, OSError):
+        return False
+    return finished
+
+
+def run_sharded(command, hosts, out_n, out_x, shards, retries=NMAP_SHARD_RETRIES):
+    """
+    Scans 'hosts' with 'command' (nmap and its options, without targets or
+    output flags) as up to 'shards' nmap processes running side by side,
+    each within the global cap. A shard that fails is retried on its own;
+    the shards that succeeded are merged into out_x / out_n, which read like
+    the output of a single nmap run. Returns (shards done, shards failed).
+    """
+    return run_shards([(command, part) for part in split_hosts(hosts, shards)], out_n, out_x,
+                      retries, summary=f"{len(hosts)} hosts")
+
+def run_shards(shards, out_n, out_x, retries=NMAP_SHARD_RETRIES, summary=None):
+    """
+    Runs (command, hosts) shards like run_sharded, for callers whose shards
+    need different options (e.g. a different port list per group of hosts).
+    """
+    logs_dir = os.path.dirname(out_x)
+    shard_dir = os.path.join(logs_dir, SHARDS_DIR)
+    os.makedirs(shard_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(out_x))[0]
+    total = len(shards)
+
+    jobs = []
+    for index, (command, part) in enumerate(shards, 1):
+        base = os.path.join(shard_dir, f"{stem}.{index}")
+        with open(f"{base}.hosts", 'w') as f:
+            f.write("\n".join(part) + "\n")
+        jobs.append({'index': index, 'count': len(part), 'command': command, 'hosts': f"{base}.hosts",
+                     'n': f"{base}.txt", 'x': f"{base}.xml", 'ok': False, 'error': None})
+
+    # Shard threads act for the calling module: same skip/quit tag, tool log and log sink
+    unit, output_log, log_file = current_unit(), current_output_log(), get_log_file()
+
+    def _worker(job):
+        set_unit(unit, output_log)
+        set_log_file(log_file)
+        label = f"Nmap shard {job['index']}/{total} ({job['count']} hosts)"
+        for attempt in range(retries + 1):
+            if cancelled():
+                job['error'] = "cancelled"
+                return
+            if attempt:
+                warning(f"{label} failed ({job['error']}); retrying, attempt {attempt + 1}...")
+            try:
+                result = run_nmap(job['command'] + ["-iL", job['hosts'], "-oN", job['n'], "-oX", job['x']])
+            except Exception as e:
+                job['error'] = str(e)
+                continue
+            if result.returncode == 0 and _complete_xml(job['x']):
+                job['ok'] = True
+                info(f"{label} done.")
+                return
+            job['error'] = result.stderr.strip()[-300:] or f"exit code {result.returncode}"
+
+    threads = [threading.Thread(target=_worker, args=(job,), daemon=True) for job in jobs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    done = [job for job in jobs if job['ok']]
+    failed = [job for job in jobs if not job['ok']]
+    for job in failed:
+        error(f"Nmap shard {job['index']}/{total} gave up: {job['error']}. "
+              f"Its hosts are listed in {os.path.relpath(job['hosts'], logs_dir)}.")
+    if done:
+        summary = summary or f"{sum(len(part) for _, part in shards)} hosts"
+        args = " ".join(shards[0][0] + ["-oN", out_n, "-oX", out_x]) + f" ({summary} in {total} shards)"
+        stats = merge_xml([job['x'] for job in done], out_x, args)
+        merge_normal([job['n'] for job in done], out_n, stats)
+        for job in done:
+            for key in ('hosts', 'n', 'x'):
+                if os.path.exists(job[key]):
+                    os.remove(job[key])
+    if not os.listdir(shard_dir):
+        os.rmdir(shard_dir)
+    return len(done), len(failed)
+
+
+def run_attrib(path):
+    """The attributes of path's <nmaprun> element (only the start of the file is read)."""
+    with open(path, 'rb') as f:
+        for _event, elem in ET.iterparse(f, events=('start',)):
+            return dict(elem.attrib)
+    return {}
+
+def iter_run(path):
+    """
+    Yields each child of path's <nmaprun> (<host>, <runstats>, ...) as soon
+    as it is parsed, then drops it from the tree, so a document of any size
+    is read in constant memory. Raises ET.ParseError on a truncated file.
+    """
+    with open(path, 'rb') as f:
+        depth, root = 0, None
+        for event, elem in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if depth == 0:
+                    if elem.tag != 'nmaprun':
+                        return
+                    root = elem
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1:
+                yield elem
+                root.clear()
+
+
+class RunWriter:
+    """
+    Writes an nmaprun document element by element to out_path under the
+    prologue of the nmap XML file prologue_from (XML declaration, DOCTYPE,
+    stylesheet), so viewers still render it. The file is replaced atomically
+    on a clean exit of the 'with' block; out_path may be one of the inputs.
+    """
+    def __init__(self, out_path, prologue_from, attrib):
+        with open(prologue_from, 'r', encoding='utf-8', errors='replace') as f:
+            head = f.read(4096)
+        self.out_path = out_path
+        self.tmp_path = f"{out_path}.tmp"
+        self.file = open(self.tmp_path, 'w', encoding='utf-8')
+        self.file.write(head[:head.find('<nmaprun')] if '<nmaprun' in head
+                        else '<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.file.write("<nmaprun" + "".join(f" {key}={quoteattr(str(value))}" for key, value in attrib.items())
+                        + ">\n")
+
+    def write(self, elem):
+        elem.tail = "\n"
+        self.file.write(ET.tostring(elem, encoding='unicode'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.file.write("</nmaprun>\n")
+        self.file.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.out_path)
+        elif os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        return False
+
+
+def merge_xml(paths, out_path, args=None):
+    """
+    Merges shard XML files into one nmaprun document: the first shard's
+    prologue, scaninfo and settings, every shard's <host> elements and a
+    runstats block covering the whole run. Shards are streamed one element
+    at a time, so memory does not grow with the scan. Returns the merged
+    run stats.
+    """
+    attribs = [run_attrib(path) for path in paths]
+    merged = dict(attribs[0])
+    if args:
+        merged['args'] = args
+    start = min(int(attrib.get('start', 0) or 0) for attrib in attribs)
+    end = start
+    up = down = 0
+    with RunWriter(out_path, paths[0], merged) as out:
+        for index, path in enumerate(paths):
+            for child in iter_run(path):
+                if child.tag == 'host' or (index == 0 and child.tag in ('scaninfo', 'verbose', 'debugging')):
+                    out.write(child)
+                elif child.tag == 'runstats':
+                    finished = child.find('finished')
+                    if finished is not None:
+                        end = max(end, int(finished.get('time', 0) or 0))
+                    counts = child.find('hosts')
+                    if counts is not None:
+                        up += int(counts.get('up', 0))
+                        down += int(counts.get('down', 0))
+
+        stats = {'start': start, 'end': end, 'elapsed': end - start, 'up': up, 'down': down,
+                 'total': up + down, 'timestr': time.strftime('%a %b %d %H:%M:%S %Y', time.localtime(end)),
+                 'shards': len(paths)}
+        summary = (f"Nmap done at {stats['timestr']}; {stats['total']} IP addresses ({up} hosts up) "
+                   f"scanned in {stats['elapsed']:.2f} seconds")
+        runstats = ET.Element('runstats')
+        ET.SubElement(runstats, 'finished', time=str(end), timestr=stats['timestr'], summary=summary,
+                      elapsed=f"{stats['elapsed']:.2f}", exit="success")
+        ET.SubElement(runstats, 'hosts', up=str(up), down=str(down), total=str(stats['total']))
+        out.write(runstats)
+    return stats
+
+def merge_normal(paths, out_path, stats):
+    """Concatenates shard -oN files under the first shard's header and one closing summary line."""
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        for i, path in enumerate(paths):
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    # Per-shard "# Nmap ... scan initiated" / "# Nmap done" lines
+                    if line.startswith("# Nmap "):
+                        if i == 0 and "scan initiated" in line:
+                            out.write(line)
+                        continue
+                    out.write(line)
+        out.write(f"# Nmap done at {stats['timestr']} -- {stats['total']} IP addresses "
+                  f"({stats['up']} hosts up) scanned in {stats['elapsed']:.2f} seconds "
+                  f"({stats['shards']} shards)\n")
+    os.replace(tmp_path, out_path)
+
+def write_empty(out_n, out_x, args, start):
+    """Writes nmap-shaped outputs for a scan that had nothing to look at (no host has an open port)."""
+    end = time.time()
+    timestr = time.strftime('%a %b %d %H:%M:%S %Y', time.localtime(end))
+    root = ET.Element('nmaprun', scanner="nmap", args=args, start=str(int(start)))
+    runstats = ET.SubElement(root, 'runstats')
+    ET.SubElement(runstats, 'finished', time=str(int(end)), timestr=timestr, elapsed=f"{end - start:.2f}",
+                  summary=f"Nmap done at {timestr}; 0 IP addresses (0 hosts up) scanned", exit="success")
+    ET.SubElement(runstats, 'hosts', up="0", down="0", total="0")
+    with open(out_x, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE nmaprun>\n')
+        f.write(ET.tostring(root, encoding='unicode') + "\n")
+    with open(out_n, 'w', encoding='utf-8') as f:
+        f.write(f"# {args}\n# Nmap done at {timestr} -- 0 IP addresses (0 hosts up) scanned\n")
@@ -0,0 +1,126 @@
+# KESTREL/Engine/portscan.py
+# Description: Built-in asyncio TCP connect sweep that finds open ports before nmap's detailed scan.
+
+import asyncio
+import os
+import resource
+import socket
+from .supervisor import cancelled
+from config import (DISCOVERY_CONCURRENCY, DISCOVERY_RATE, DISCOVERY_TIMEOUT,
+                    NMAP_SERVICES_FILE)
+
+# Where nmap installs its port frequency table
+NMAP_SERVICES_PATHS = [
+    "/usr/share/nmap/nmap-services",
+    "/usr/local/share/nmap/nmap-services",
+    "/opt/homebrew/share/nmap/nmap-services",
+    "/opt/local/share/nmap/nmap-services",
+]
+
+
+def find_services_file():
+    """The nmap-services file to rank ports with (NMAP_SERVICES_FILE or nmap's usual locations), or None."""
+    for path in ([NMAP_SERVICES_FILE] if NMAP_SERVICES_FILE else NMAP_SERVICES_PATHS):
+        if os.path.isfile(path):
+            return path
+    return None
+
+def top_ports(count, path=None, protocol='tcp'):
+    """
+    The 'count' most frequently open ports according to nmap-services: the
+    same list nmap's --top-ports uses. Returns None when no nmap-services
+    file is available.
+    """
+    path = path or find_services_file()
+    if not path:
+        return None
+    ranked = {}
+    with open(path, 'r', errors='replace') as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            fields = line.split()
+            if len(fields) < 3 or '/' not in fields[1]:
+                continue
+            port, proto = fields[1].split('/', 1)
+            if proto != protocol or not port.isdigit():
+                continue
+            try:
+                ranked[int(port)] = max(ranked.get(int(port), 0.0), float(fields[2]))
+            except ValueError:
+                continue
+    return sorted(ranked, key=lambda p: (-ranked[p], p))[:count]
+
+
+def _fd_budget(concurrency):
+    """Caps concurrency below the open-files limit (each attempt holds a socket)."""
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return concurrency
+    return max(1, min(concurrency, soft - 128))
+
+async def resolve_ipv4(hosts):
+    """
+    host -> first IPv4 address from the system resolver (so /etc/hosts
+    applies, as it does for nmap, which scans nothing else without -6);
+    hosts that don't resolve are left out.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def _one(host):
+        try:
+            infos = await loop.getaddrinfo(host, None, family=socket.AF_INET, type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError, OSError):
+            return host, None
+        return host, infos[0][4][0] if infos else None
+
+    return {host: addr for host, addr in await asyncio.gather(*(_one(h) for h in hosts)) if addr}
+
+async def _sweep(hosts, ports, concurrency, rate, timeout):
+    loop = asyncio.get_running_loop()
+    addresses = await resolve_ipv4(hosts)
+    # Several names often share an address: connect to each address once
+    open_by_addr = {addr: set() for addr in set(addresses.values())}
+    slots = asyncio.Semaphore(_fd_budget(concurrency))
+    interval = 1.0 / rate if rate else 0.0
+    next_at = loop.time()
+    tasks = set()
+
+    async def _probe(addr, port):
+        try:
+            transport, _ = await asyncio.wait_for(loop.create_connection(asyncio.Protocol, addr, port), timeout)
+            transport.abort()
+            open_by_addr[addr].add(port)
+        except (OSError, asyncio.TimeoutError):
+            pass    # refused (closed) or no answer (filtered)
+        finally:
+            slots.release()
+
+    # Port-major order spreads the attempts over every host instead of hammering one
+    for port in ports:
+        if cancelled():
+            break
+        for addr in open_by_addr:
+            await slots.acquire()
+            if interval:
+                now = loop.time()
+                next_at = max(next_at, now) + interval
+                # Sleep only when well ahead of schedule; short bursts keep the timer overhead down
+                if next_at - now > 0.01:
+                    await asyncio.sleep(next_at - now)
+            task = loop.create_task(_probe(addr, port))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*list(tasks))
+    return {host: sorted(open_by_addr[addr]) for host, addr in addresses.items()}, addresses
+
+def sweep(hosts, ports, concurrency=DISCOVERY_CONCURRENCY, rate=DISCOVERY_RATE, timeout=DISCOVERY_TIMEOUT):
+    """
+    TCP connect sweep of every host over 'ports'. Returns (open ports by
+    host, address by host); hosts that do not resolve are missing from both.
+    A port counts as open when the handshake completes; refused and
+    unanswered ports are not reported. Stops early when the calling module
+    is skipped.
+    """
+    return asyncio.run(_sweep(list(hosts), list(ports), concurrency, rate, timeout))
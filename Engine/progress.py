@@ -0,0 +1,130 @@
+# KESTREL/Engine/progress.py
+# Description: Shared board of live tool progress (nmap --stats-every) read by the runtime menu and the console.
+
+import re
+import threading
+import time
+from .logger import info, set_log_file
+from config import TOOL_PROGRESS_INTERVAL
+
+# nmap --stats-every output:
+#   Stats: 0:01:12 elapsed; 3 hosts completed (5 up), 2 undergoing SYN Stealth Scan
+#   SYN Stealth Scan Timing: About 45.20% done; ETC: 12:34 (0:00:15 remaining)
+_NMAP_STATS_RE = re.compile(r"^Stats: (\S+) elapsed; (\d+) hosts? completed \((\d+) up\), (\d+) undergoing (.+)$")
+_NMAP_TIMING_RE = re.compile(r"^(.+?) Timing: About ([\d.]+)% done(?:; ETC: (\S+) \((\S+) remaining\))?")
+
+
+def _seconds(clock):
+    """'1:02:03' -> 3723."""
+    seconds = 0
+    for part in clock.split(':'):
+        if not part.isdigit():
+            return None
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+def _clock(seconds):
+    return time.strftime('%H:%M:%S', time.gmtime(seconds)) if seconds < 86400 else f"{seconds // 3600}h"
+
+
+class ProgressBoard:
+    """
+    Latest progress of every running tool process, grouped by unit (the
+    module label the supervisor tags its tools with). Several processes of
+    one unit (nmap shards) are summed up into one line.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.runs = {}
+        self.next_id = 0
+        self.last_echo = {}
+
+    def start(self, unit, tool):
+        with self.lock:
+            self.next_id += 1
+            self.runs[self.next_id] = {'unit': unit, 'tool': tool, 'started': time.time(), 'phase': None,
+                                       'percent': None, 'remaining': None, 'etc': None,
+                                       'hosts_done': 0, 'hosts_up': 0, 'hosts_active': 0}
+            return self.next_id
+
+    def update(self, run_id, **fields):
+        with self.lock:
+            if run_id in self.runs:
+                self.runs[run_id].update(fields)
+
+    def finish(self, run_id):
+        with self.lock:
+            run = self.runs.pop(run_id, None)
+            if run and not any(other['unit'] == run['unit'] for other in self.runs.values()):
+                self.last_echo.pop(run['unit'], None)
+
+    def due(self, unit):
+        """True at most once per TOOL_PROGRESS_INTERVAL per unit (its processes report at about the same time)."""
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_echo.get(unit, 0.0) < TOOL_PROGRESS_INTERVAL:
+                return False
+            self.last_echo[unit] = now
+            return True
+
+    def summary(self, unit):
+        """One line about the unit's running tools (progress once they report it), or None when none runs."""
+        with self.lock:
+            runs = [dict(run) for run in self.runs.values() if run['unit'] == unit]
+        if not runs:
+            return None
+        reported = [run for run in runs if run['percent'] is not None]
+        tool = runs[0]['tool'] + (f" x{len(runs)}" if len(runs) > 1 else "")
+        parts = []
+        phases = sorted({run['phase'] for run in reported if run['phase']})
+        if phases:
+            parts.append("/".join(phases))
+        if reported:
+            # Processes that haven't reported yet count as 0% done
+            parts.append(f"{sum(run['percent'] for run in reported) / len(runs):.1f}% done")
+        hosts_done = sum(run['hosts_done'] for run in runs)
+        if hosts_done or any(run['hosts_active'] for run in runs):
+            parts.append(f"{hosts_done} hosts completed ({sum(run['hosts_up'] for run in runs)} up)")
+        remaining = [run['remaining'] for run in reported if run['remaining'] is not None]
+        if remaining:
+            parts.append(f"ETA {_clock(max(remaining))}")
+        if not parts:
+            parts.append(f"running for {_clock(int(time.time() - min(run['started'] for run in runs)))}")
+        return f"{tool}: " + ", ".join(parts)
+
+
+class NmapStats:
+    """Parses one nmap process's stdout line by line into the board."""
+    def __init__(self, board, run_id, unit, log_file=None):
+        self.board = board
+        self.run_id = run_id
+        self.unit = unit
+        # The calling module's log sink: lines arrive on the supervisor thread
+        self.log_file = log_file
+
+    def feed(self, line):
+        line = line.strip()
+        match = _NMAP_STATS_RE.match(line)
+        if match:
+            self.board.update(self.run_id, hosts_done=int(match.group(2)), hosts_up=int(match.group(3)),
+                              hosts_active=int(match.group(4)), phase=match.group(5))
+            return
+        match = _NMAP_TIMING_RE.match(line)
+        if match:
+            remaining = _seconds(match.group(4)) if match.group(4) else None
+            self.board.update(self.run_id, phase=match.group(1), percent=float(match.group(2)),
+                              etc=match.group(3), remaining=remaining)
+            summary = self.board.summary(self.unit)
+            if summary and self.board.due(self.unit):
+                set_log_file(self.log_file)
+                try:
+                    info(f"[{self.unit or 'nmap'}] {summary}")
+                finally:
+                    set_log_file(None)
+
+
+_board = ProgressBoard()
+
+def get_board():
+    """The process-wide progress board."""
+    return _board
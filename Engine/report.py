@@ -1,6 +1,7 @@
 # KESTREL/Engine/report.py
 # Description: Generates the final, fully-styled HTML report from the structured final.json file.
 
+import html
 import os
 import json
 from .logger import info, error, success
@@ -216,18 +217,61 @@ class ReportGenerator:
         </div>
         """
 
-    def _generate_service_section(self):
-        services = self.data.get('services', [])
-        rows_html = ""
-        for s in services:
-            rows_html += f"""
+    @staticmethod
+    def _service_row(s):
+        return f"""
             <tr>
                 <td><a href="{s.get('url', '#')}" target="_blank">{s.get('url', 'N/A')}</a></td>
                 <td>{s.get('host', 'N/A')}</td>
                 <td>{s.get('port', 'N/A')}</td>
                 <td>{s.get('webserver', 'N/A')}</td>
+                <td>{s.get('provider') or '-'}</td>
             </tr>
             """
+
+    def _generate_cluster_groups(self, services):
+        """Collapsible groups for the response clusters with more than one URL; returns (groups, other rows)."""
+        members = {}
+        for s in services:
+            members.setdefault(s.get('cluster'), []).append(s)
+        groups_html, rows_html = "", ""
+        for cluster in self.data.get('clusters', []):
+            rows = members.pop(cluster['id'], [])
+            if len(rows) < 2:
+                rows_html += "".join(self._service_row(s) for s in rows)
+                continue
+            status = cluster.get('status_code') or 'N/A'
+            title = html.escape(cluster.get('title') or 'No title')
+            representative = cluster.get('representative', '#')
+            groups_html += f"""
+                <details class="cluster-group">
+                    <summary><span class="status-badge status-{status}">{status}</span> {title}
+                        <span class="cluster-size">{len(rows)} URLs</span></summary>
+                    <div class="cluster-representative">Screenshotted as: <a href="{representative}" target="_blank">{representative}</a></div>
+                    <table class="compact-table">
+                        <thead><tr><th>URL</th><th>Host</th><th>Port</th><th>Web Server</th><th>CDN / Edge</th></tr></thead>
+                        <tbody>{"".join(self._service_row(s) for s in rows)}</tbody>
+                    </table>
+                </details>
+                """
+        # Services of an older run without cluster ids
+        for rows in members.values():
+            rows_html += "".join(self._service_row(s) for s in rows)
+        return groups_html, rows_html
+
+    def _generate_service_section(self):
+        services = self.data.get('services', [])
+        clusters_html = ""
+        if self.data.get('clusters'):
+            groups_html, rows_html = self._generate_cluster_groups(services)
+            screenshots = ""
+            if os.path.exists(os.path.join(self.target_dir, "Screenshots", "report.html")):
+                screenshots = ' | Screenshots: <a href="../Screenshots/report.html" target="_blank">one per cluster</a>'
+            clusters_html = (f"<div class='code-block'><button class='copy-button' onclick='copyCode(this)'>Copy</button>"
+                             f"<code>{len(services)} live URLs in {len(self.data['clusters'])} response clusters</code>"
+                             f"{screenshots}</div>{groups_html}")
+        else:
+            rows_html = "".join(self._service_row(s) for s in services)
         return f"""
         <div class="section service" id="service-discovery">
             <h2 class="section-header">
@@ -235,10 +279,11 @@ class ReportGenerator:
                 <button class="toggle-btn" onclick="toggleSection(this)"><i class="fas fa-chevron-up"></i></button>
             </h2>
             <div class="section-content">
+                 {clusters_html}
                  <div style="position: relative;">
                     <button class="table-copy" onclick="copyTable(this)">Copy Table</button>
                     <table class="compact-table">
-                        <thead><tr><th>URL</th><th>Host</th><th>Port</th><th>Web Server</th></tr></thead>
+                        <thead><tr><th>URL</th><th>Host</th><th>Port</th><th>Web Server</th><th>CDN / Edge</th></tr></thead>
                         <tbody>{rows_html}</tbody>
                     </table>
                 </div>
@@ -251,7 +296,9 @@ class ReportGenerator:
         summary = nmap.get('scan_summary', {})
         hosts_html = ""
         for host in nmap.get('hosts', []):
-            hosts_html += f"<div class='url-header'>{host.get('hostname', 'N/A')} ({host.get('ip_address', '')})</div>"
+            provider = f" - {host['provider']}" if host.get('provider') else ""
+            scan = f" [{host['scan']}]" if host.get('scan') else ""
+            hosts_html += f"<div class='url-header'>{host.get('hostname', 'N/A')} ({host.get('ip_address', '')}){provider}{scan}</div>"
             ports_html = ""
             for port in host.get('open_ports', []):
                 ports_html += f"""
@@ -265,6 +312,9 @@ class ReportGenerator:
                 </div>
                 """
             hosts_html += f"<div class='service-grid'>{ports_html}</div>"
+        for host in nmap.get('cdn_skipped', []):
+            hosts_html += (f"<div class='url-header'>{', '.join(host.get('hostnames', [])) or 'N/A'} "
+                           f"({host.get('ip_address', '')}) - {host.get('provider', 'CDN')}: not scanned</div>")
 
         return f"""
         <div class="section network" id="network-analysis">
@@ -412,6 +462,10 @@ class ReportGenerator:
         .service-port {{ font-weight: 700; color: var(--primary); }}
         .service-details {{ font-size: 0.9em; color: #6c757d; }}
         .service-recommendation {{ margin-top: 8px; padding: 8px; background: #f8f9fa; border-radius: 4px; border-left: 3px solid var(--warning); font-size: 0.85em; }}
+        .cluster-group {{ background: white; border-left: 4px solid var(--secondary); border-radius: 8px; margin: 10px 0; padding: 10px 15px; box-shadow: 0 2px 6px rgba(0,0,0,0.1); }}
+        .cluster-group summary {{ cursor: pointer; font-weight: 600; }}
+        .cluster-size {{ float: right; color: #6c757d; font-weight: 400; }}
+        .cluster-representative {{ margin-top: 8px; font-size: 0.9em; color: #6c757d; }}
         .url-header {{ background: linear-gradient(135deg, var(--secondary) 0%, #2980b9 100%); color: white; padding: 12px; border-radius: 8px 8px 0 0; margin-top: 20px; font-weight: 600; }}
         .footer {{ text-align: center; margin-top: 40px; color: white; padding: 25px; background: rgba(0,0,0,0.3); border-radius: 15px; }}
         .contact-info {{ display: flex; justify-content: center; flex-wrap: wrap; gap: 15px; margin-top: 15px; }}
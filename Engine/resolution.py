@@ -0,0 +1,141 @@
+# KESTREL/Engine/resolution.py
+# Description: Bulk A/AAAA/CNAME resolution of discovered names and the host->IP mapping (JSON Lines).
+
+import asyncio
+import json
+import os
+from .dns_resolver import make_resolver, DNSError
+from .supervisor import cancelled
+
+RESOLVED_FILE = "resolved.jsonl"
+RESOLVED_NAMES_FILE = "resolved_subs.txt"
+PRUNED_FILE = "wildcard_pruned.txt"
+
+
+def host_record(name, responses):
+    """
+    Builds the compact mapping record for one name from its A/AAAA responses.
+    CNAMEs come from the answer chains, so no separate CNAME query is needed.
+    """
+    record = {'host': name, 'a': [], 'aaaa': [], 'cname': []}
+    for response in responses:
+        if not response:
+            continue
+        for _owner, _ttl, rtype, rdata in response['answers']:
+            if rtype == 'A' and rdata not in record['a']:
+                record['a'].append(rdata)
+            elif rtype == 'AAAA' and rdata not in record['aaaa']:
+                record['aaaa'].append(rdata)
+            elif rtype == 'CNAME':
+                target = rdata.rstrip('.')
+                if target not in record['cname']:
+                    record['cname'].append(target)
+    return record
+
+def is_resolved(record):
+    return bool(record['a'] or record['aaaa'])
+
+async def resolve_names(names, on_record, workers=200, resolver=None, detector=None):
+    """
+    Resolves A and AAAA for every name from an iterable (read lazily, so a
+    file object keeps memory flat) with a bounded number of concurrent workers.
+    on_record(record) is called for every name; returns (total, errors).
+    Names left without addresses because a query failed get an 'error' key.
+    With a WildcardDetector, resolved records that only hit a wildcard zone's
+    catch-all answer get a 'wildcard' key naming that zone.
+    """
+    own_resolver = resolver is None
+    resolver = resolver or make_resolver()
+    names = iter(names)
+    counts = {'total': 0, 'errors': 0}
+
+    async def worker():
+        for name in names:
+            if cancelled():
+                # Skipped or quit: leave the rest of the names unread
+                return
+            name = name.strip()
+            if not name:
+                continue
+            counts['total'] += 1
+            responses, failed = [], False
+            for rtype in ('A', 'AAAA'):
+                try:
+                    responses.append(await resolver.query(name, rtype))
+                except DNSError:
+                    counts['errors'] += 1
+                    failed = True
+            record = host_record(name, responses)
+            if failed and not is_resolved(record):
+                # No NXDOMAIN or empty answer to go on: the name may well exist
+                record['error'] = True
+            if detector and is_resolved(record):
+                zone = await detector.match(record, resolver)
+                if zone:
+                    record['wildcard'] = zone
+            on_record(record)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+    finally:
+        if own_resolver:
+            resolver.close()
+    return counts['total'], counts['errors']
+
+def resolve_to_files(names, logs_dir, mode='w', workers=200, detector=None):
+    """
+    Resolves names and writes resolved hosts to Logs/resolved.jsonl and their
+    names to Logs/resolved_subs.txt (mode='a' appends). Names whose queries
+    failed are passed through to resolved_subs.txt as well, so they are still
+    probed rather than dropped as dead. With a detector,
+    wildcard matches go to Logs/wildcard_pruned.txt instead and the zone
+    summary is saved to Logs/wildcards.json. Returns a stats dict.
+    """
+    stats = {'total': 0, 'resolved': 0, 'unresolved': 0, 'dropped': 0, 'pruned': 0, 'errors': 0}
+    resolved_path = os.path.join(logs_dir, RESOLVED_FILE)
+    names_path = os.path.join(logs_dir, RESOLVED_NAMES_FILE)
+    pruned_path = os.path.join(logs_dir, PRUNED_FILE)
+    with open(resolved_path, mode) as mapping, open(names_path, mode) as alive_names, \
+         open(pruned_path, mode) as pruned:
+        def on_record(record):
+            if record.get('wildcard'):
+                stats['pruned'] += 1
+                pruned.write(f"{record['host']}\t{record['wildcard']}\n")
+            elif is_resolved(record):
+                stats['resolved'] += 1
+                mapping.write(json.dumps(record, separators=(',', ':')) + "\n")
+                alive_names.write(record['host'] + "\n")
+            elif record.get('error'):
+                stats['unresolved'] += 1
+                alive_names.write(record['host'] + "\n")
+            else:
+                stats['dropped'] += 1
+        stats['total'], stats['errors'] = asyncio.run(
+            resolve_names(names, on_record, workers=workers, detector=detector))
+    if detector:
+        detector.pruned += stats['pruned']
+        detector.save(logs_dir)
+    return stats
+
+def iter_pruned(logs_dir):
+    """Yields (host, zone) pairs from Logs/wildcard_pruned.txt (nothing if it is missing)."""
+    path = os.path.join(logs_dir, PRUNED_FILE)
+    if not os.path.exists(path):
+        return
+    with open(path, 'r') as f:
+        for line in f:
+            host, _, zone = line.rstrip("\n").partition("\t")
+            if host:
+                yield host, zone
+
+def iter_resolved(logs_dir):
+    """Yields the mapping records from Logs/resolved.jsonl (nothing if it is missing)."""
+    path = os.path.join(logs_dir, RESOLVED_FILE)
+    if not os.path.exists(path):
+        return
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
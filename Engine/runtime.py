@@ -1,20 +1,29 @@
 #KESTREL/Engine/runtime.py
 
+import glob
 import importlib
-import multiprocessing
-import threading
+import queue
 import time
+import threading
 import select
 import sys
 import os
-import signal
-from .logger import info, error, success, warning
+from .logger import info, error, success, warning, set_log_file
+from .scheduler import ModuleScheduler
+from .stream import SubdomainBus
+from .subdomains import is_domain_target
+from .cache import get_cache
+from .supervisor import set_unit, terminate_unit, get_supervisor
+from .progress import get_board
+from .journal import INCOMPLETE_STATE
+from config import MAX_PARALLEL_MODULES, STREAMING_PIPELINE, KILL_GRACE_PERIOD
 #
 #
 class RuntimeControl:
     """Background listener that watches stdin for the '00' trigger and exposes
-    flags plus helper functions to pause/resume/skip/quit the currently running
-    module process (by PID)."""
+    flags plus helper functions to skip/quit the running modules. Modules are
+    identified by label; skip/quit terminate the tools the supervisor started
+    under that label and wake every execution loop watching this controller."""
     def __init__(self):
         self.stop_thread = threading.Event()
         self.listener_paused = threading.Event()
@@ -25,8 +34,17 @@ class RuntimeControl:
         self.skip_current = False
         self.quit_program = False
         self.current_module = None
-        # process control
-        self.current_pid = None
+        # modules running side by side (label -> start time) and the ones asked to skip
+        self.running = {}
+        self.skipped = set()
+        self.running_lock = threading.Lock()
+        # running labels in the order the open runtime menu numbered them
+        self.menu_labels = []
+        # execution loops (queues) to wake on skip/quit
+        self.watchers = []
+        # lets pause/stop interrupt the listener's blocking wait on stdin
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_w, False)
         # last trigger time to debounce
         self.last_trigger_time = 0.0
     def start(self):
@@ -35,45 +53,93 @@ class RuntimeControl:
         info("Runtime control activated. Type '00' then ENTER during execution for control menu.")
     def stop(self):
         self.stop_thread.set()
+        self.listener_paused.set()
+        self._wake_listener()
         if self.thread:
             self.thread.join(timeout=1)
         info("Runtime control deactivated.")
     def pause_listener(self):
         """Pause the listener (avoid catching keys while user types other prompts)."""
         self.listener_paused.clear()
+        self._wake_listener()
     def resume_listener(self):
         self.listener_paused.set()
+    def _wake_listener(self):
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass
+    def watch(self, events):
+        """Registers an execution loop's event queue for ('control', ...) wake-ups."""
+        with self.running_lock:
+            self.watchers.append(events)
+    def unwatch(self, events):
+        with self.running_lock:
+            if events in self.watchers:
+                self.watchers.remove(events)
+    def _notify_watchers(self, command):
+        with self.running_lock:
+            watchers = list(self.watchers)
+        for events in watchers:
+            events.put(('control', command))
     def set_current_module(self, module_name):
         self.current_module = module_name
-    def set_current_pid(self, pid):
-        """Set the PID of the currently running module process (or None)."""
-        self.current_pid = pid
+    def add_running(self, module_name):
+        """Register a module started by the scheduler (its tools are tracked by label)."""
+        with self.running_lock:
+            self.running[module_name] = time.time()
+            self.current_module = ", ".join(self.running)
+    def remove_running(self, module_name):
+        with self.running_lock:
+            self.running.pop(module_name, None)
+            self.skipped.discard(module_name)
+            self.current_module = ", ".join(self.running) or None
+            if not self.running:
+                self.skip_current = False
     #----- high level commands
-    def skip_module(self):
-        if self.current_module:
+    def skip_module(self, labels=None):
+        """
+        Skip the running modules named in labels, or every module currently
+        running (several may run side by side, for several batch targets).
+        """
+        with self.running_lock:
+            labels = [label for label in (self.running if labels is None else labels) if label in self.running]
+            self.skipped.update(labels)
+        if labels:
             self.skip_current = True
-            info(f"Skip requested for module '{self.current_module}'.")
-            if self.current_pid:
-                try:
-                    os.kill(self.current_pid, signal.SIGTERM)
-                except Exception as e:
-                    warning(f"Could not SIGTERM pid {self.current_pid}: {e}")
+            info(f"Skip requested for module '{', '.join(labels)}'.")
+            for label in labels:
+                self._terminate(label)
+            self._notify_watchers('skip')
     def quit_execution(self):
         self.quit_program = True
         info("Quit requested. Terminating KESTREL run.")
-        if self.current_pid:
-            try:
-                os.kill(self.current_pid, signal.SIGTERM)
-            except Exception as e:
-                warning(f"Could not SIGTERM pid {self.current_pid}: {e}")
+        with self.running_lock:
+            labels = list(self.running)
+        for label in labels:
+            self._terminate(label)
+        self._notify_watchers('quit')
+    def _terminate(self, label):
+        try:
+            terminate_unit(label)
+        except Exception as e:
+            warning(f"Could not terminate '{label}': {e}")
     #----- helpers
-    def _get_char(self, timeout=0.1):
-        """Non-blocking single char read (works when user presses ENTER)."""
+    def _get_char(self):
+        """Blocks until a char is typed (works when user presses ENTER) or the listener is woken."""
         try:
-            if select.select([sys.stdin], [], [], timeout)[0]:
-                return sys.stdin.read(1)
+            readable = select.select([sys.stdin, self._wake_r], [], [])[0]
+            if self._wake_r in readable:
+                os.read(self._wake_r, 4096)
+                return None
+            if readable:
+                ch = sys.stdin.read(1)
+                if not ch:
+                    # stdin is closed: nothing left to listen for
+                    self.stop_thread.wait()
+                return ch or None
         except Exception:
-            pass
+            self.stop_thread.wait()
         return None
     def _clear_input_buffer(self):
         """Clear pending stdin (helpful after menu input)."""
@@ -82,13 +148,30 @@ class RuntimeControl:
                 sys.stdin.readline()
         except Exception:
             pass
+    def status_lines(self, numbered=False):
+        """One line per running module: how long it has run and its tools' live progress."""
+        with self.running_lock:
+            running = dict(self.running)
+        board = get_board()
+        lines = []
+        for number, (label, started) in enumerate(running.items(), 1):
+            elapsed = time.strftime('%H:%M:%S', time.gmtime(time.time() - started))
+            progress = board.summary(label)
+            prefix = f"[{number}] " if numbered else ""
+            lines.append(f"  {prefix}{label} [{elapsed}]" + (f" {progress}" if progress else ""))
+        return lines
     def _display_runtime_menu(self):
         current_module_display = f" ({self.current_module})" if self.current_module else ""
+        # The numbers shown are what a skip picks from
+        with self.running_lock:
+            self.menu_labels = list(self.running)
+        status = "\n".join(self.status_lines(numbered=len(self.menu_labels) > 1))
+        status = f"Running:\n{status}\n{'='*40}\n" if status else ""
         menu_text = f"""
 {'='*40}
 [*] RUNTIME CONTROL MENU{current_module_display}
 {'='*40}
-[s] Skip current module
+{status}[s] Skip running module(s)
 [q] Quit KESTREL entirely
 Any other key → Exit Runtime Menu
 {'='*40}
@@ -97,26 +180,41 @@ Enter choice: """
     def _process_runtime_command(self, command):
         command = command.lower().strip()
         if command == 's':
-            self.skip_module()
+            self.skip_module(self._choose_skip())
         elif command == 'q':
             self.quit_execution()
         else:
             info("Exiting runtime control menu.")
         self.runtime_menu_active = False
         self._clear_input_buffer()
+    def _choose_skip(self):
+        """
+        The labels to skip: the only running module, or the ones picked by
+        number from the menu (in a batch every target's modules are listed).
+        """
+        labels = self.menu_labels or list(self.running)
+        if len(labels) <= 1:
+            return labels
+        answer = input(f"Skip which module(s)? Numbers separated by commas, or 'a' for all [a] > ").strip().lower()
+        if answer in ('', 'a', 'all'):
+            return labels
+        chosen = []
+        for part in answer.replace(' ', ',').split(','):
+            if part.isdigit() and 1 <= int(part) <= len(labels):
+                chosen.append(labels[int(part) - 1])
+        if not chosen:
+            warning("No running module picked; nothing skipped.")
+        return chosen
     def _listener(self):
         """Thread: detect '00' + ENTER trigger and run menu."""
         buffer = ""
         while not self.stop_thread.is_set():
             if not self.listener_paused.is_set():
-                time.sleep(0.1)
-                continue
-            if self.runtime_menu_active:
-                time.sleep(0.1)
+                self.listener_paused.wait()
                 continue
-            
-            # Non-blocking read
-            ch = self._get_char(timeout=0.05)
+
+            # Blocking read; pause/stop wake it up
+            ch = self._get_char()
             if ch:
                 buffer += ch
                 # Keep buffer small to avoid memory issues with long running processes
@@ -153,8 +251,6 @@ Enter choice: """
                 elif ch in ['\n', '\r']:
                      if not buffer.endswith("00\n") and not buffer.endswith("00\r"):
                         buffer = ""
-            
-            time.sleep(0.05)
 
     def wait_if_paused(self):
         # Pause feature removed, but keeping method stub to avoid breaking external calls if any remain
@@ -162,128 +258,388 @@ Enter choice: """
 
     def should_skip_current(self):
         return self.skip_current
+    def should_skip(self, module_name):
+        with self.running_lock:
+            return module_name in self.skipped
     def should_quit(self):
         return self.quit_program
     def reset_module_state(self):
         self.skip_current = False
-        self.current_pid = None
         self.current_module = None
+        self.running = {}
+        self.skipped = set()
 #
 #
-def execute_modules(module_choices, target, target_dir, report_enabled):
-    module_map = {
-        '1': {'file': 'whois', 'handler': 'run', 'name': 'Whois'},
-        '2': {'file': 'dig', 'handler': 'run', 'name': 'Dig (DNS)'},
-        '3': {'file': 'subfinder', 'handler': 'run', 'name': 'Subfinder'},
-        '4': {'file': 'amass', 'handler': 'run', 'name': 'Amass'},
-        '5': {'file': 'httpx_toolkit', 'handler': 'run', 'name': 'HTTPX'},
-        '6': {'file': 'nmap', 'handler': 'run', 'name': 'Nmap'},
-        '7': {'file': 'screenshot', 'handler': 'run', 'name': 'Screenshot'}
-    }
-    if '0' in module_choices:
-        choices = sorted(module_map.keys(), key=lambda x: int(x))
-    else:
-        choices = module_choices.split()
-    runtime_controller = RuntimeControl()
-    runtime_controller.start()
-    info(f"Starting {len(choices)} module(s)...")
-    def _module_runner(choice, target, target_dir, is_auto_mode=False):
+# Every module declares the artifacts it consumes and produces so the scheduler
+# can overlap the ones that do not depend on each other. Internal stages are not
+# in the menu; they are added automatically when a selected module consumes what
+# they produce. 'input' names a Logs/ file passed to the module as '@file'.
+# In streaming mode 'streams' modules publish what they find on a bus and the
+# 'stream_consumer' starts right away instead of waiting for them; stages marked
+# 'inline_when_streaming' are then done by the consumer batch by batch.
+# 'artifacts' are the Logs/ files a module writes (glob patterns allowed); they
+# are recorded in the run journal and, for tools with a CACHE_TTL, kept in the
+# result cache (see Engine/cache.py). A 'resumable' module keeps its partial
+# progress, so a resumed run enters it again after it failed or was skipped.
+# Modules run on threads of this process, so in-process state (e.g. the whois
+# memo) is shared by every target of a batch.
+MODULE_MAP = {
+    '1': {'file': 'whois', 'handler': 'run', 'name': 'Whois',
+          'consumes': [], 'produces': ['whois'], 'artifacts': ['whois.txt']},
+    '2': {'file': 'dig', 'handler': 'run', 'name': 'Dig (DNS)',
+          'consumes': [], 'produces': ['dns_records'], 'artifacts': ['dig.txt', 'dig.json']},
+    '3': {'file': 'subfinder', 'handler': 'run', 'name': 'Subfinder',
+          'consumes': [], 'produces': ['raw_subdomains'], 'streams': True, 'artifacts': ['subfinder.txt']},
+    '4': {'file': 'amass', 'handler': 'run', 'name': 'Amass',
+          'consumes': [], 'produces': ['raw_subdomains'], 'streams': True, 'artifacts': ['amass.txt']},
+    'merge': {'file': 'merge_subs', 'handler': 'run', 'name': 'Subdomain Merge', 'internal': True,
+              'consumes': ['raw_subdomains'], 'produces': ['subdomains'], 'artifacts': ['merged_subs.txt']},
+    'resolve': {'file': 'resolve_subs', 'handler': 'run', 'name': 'Mass Resolution', 'internal': True,
+                'consumes': ['subdomains'], 'produces': ['resolved_subdomains'],
+                'artifacts': ['resolved.jsonl', 'resolved_subs.txt', 'wildcards.json', 'wildcard_pruned.txt'],
+                'inline_when_streaming': True},
+    '5': {'file': 'httpx_toolkit', 'handler': 'run', 'name': 'HTTPX',
+          'consumes': ['resolved_subdomains'], 'produces': ['live_hosts'], 'input': 'resolved_subs.txt',
+          'stream_consumer': True, 'resumable': True, 'artifacts': ['alive.json', 'alive.txt', 'services.jsonl', 'httpx_chunks.json',
+                                                    'httpx_stream.json', 'httpx_stream_names.txt',
+                                                    'clusters.json', 'screenshot_targets.txt']},
+    '6': {'file': 'nmap', 'handler': 'run', 'name': 'Nmap',
+          'consumes': ['live_hosts'], 'produces': ['open_ports'],
+          'artifacts': ['nmap_*.txt', 'nmap_*.xml', 'nmap_discovery.json', 'scan_plan.json', 'scan_targets.txt']},
+    '7': {'file': 'screenshot', 'handler': 'run', 'name': 'Screenshot',
+          'consumes': ['live_hosts'], 'produces': ['screenshots'], 'input': 'screenshot_targets.txt',
+          'artifacts': ['screenshot_failed.txt']}
+}
+class _ModuleThread(threading.Thread):
+    """
+    Runs one module on a thread of this process. The external tools it starts
+    go through the supervisor tagged with the module's label, so skip/quit
+    can terminate exactly its process groups; when the handler returns, a
+    ('finished', choice) event wakes the execution loop.
+    """
+    def __init__(self, choice, label, target, target_dir, events, is_auto_mode=False,
+                 options=None, log_file=None):
+        super().__init__(name=f"kestrel-{label}", daemon=True)
+        self.choice = choice
+        self.label = label
+        self.module_target = target
+        self.target_dir = target_dir
+        self.events = events
+        self.options = dict(options or {})
+        if choice == '6' and is_auto_mode:
+            self.options['is_auto_mode'] = True
+        self.log_file = log_file
+        self.exitcode = None
+
+    def run(self):
+        # Batch mode: route this thread's log lines to the target's log
+        set_log_file(self.log_file)
+        # Tool output is streamed to Logs/tools/<module>.log
+        set_unit(self.label, os.path.join(self.target_dir, "Logs", "tools",
+                                          f"{MODULE_MAP[self.choice]['file']}.log"))
         try:
-            # Re-open stdin in the child process if it's interactive Nmap
-            if choice == '6' and not is_auto_mode:
-                sys.stdin = open(0)
-            
-            module_info = module_map.get(choice)
-            if not module_info:
-                print(f"[!] Unknown module '{choice}'")
-                return
-            module_name = module_info['name']
-            module_package_name = f"Modules.{module_info['file']}"
-            module = importlib.import_module(module_package_name)
-            handler_name = module_info['handler']
-            handler = getattr(module, handler_name)
+            module = importlib.import_module(f"Modules.{MODULE_MAP[self.choice]['file']}")
+            handler = getattr(module, MODULE_MAP[self.choice]['handler'])
             if isinstance(handler, type):
-                if choice == '6' and is_auto_mode:
-                    instance = handler(target, target_dir, runtime_control=None, is_auto_mode=True)
-                else:
-                    instance = handler(target, target_dir, runtime_control=None)
-                instance.run()
+                result = handler(self.module_target, self.target_dir, runtime_control=None, **self.options).run()
             else:
-                if choice == '6' and is_auto_mode:
-                    handler(target, target_dir, is_auto_mode=True)
-                else:
-                    handler(target, target_dir)
+                result = handler(self.module_target, self.target_dir, **self.options)
+            # Modules report failure by returning False
+            self.exitcode = 1 if result is False else 0
         except Exception as e:
-            print(f"[module runner] error: {e}")
-    for choice in choices:
-        runtime_controller.reset_module_state()
-        if runtime_controller.should_quit():
-            info("Quitting as requested...")
-            break
-        module_info = module_map.get(choice)
-        if not module_info:
-            warning(f"Unknown module choice '{choice}'. Skipping.")
-            continue
-        module_name = module_info['name']
-        runtime_controller.set_current_module(module_name)
-        if runtime_controller.should_skip_current():
-            warning(f"Module '{module_name}' SKIPPED.")
-            runtime_controller.reset_module_state()
-            continue
-        try:
-            # First, check if this is an interactive Nmap run
-            is_auto = ('0' in module_choices) and choice == '6'
-            
-            runtime_controller.pause_listener()
-            
-            # Only resume the listener if the module is NOT interactive
-            if module_name != 'Nmap' or is_auto:
-                runtime_controller.resume_listener()
+            error(f"[module runner] error: {e}")
+            self.exitcode = 1
+        finally:
+            set_unit(None)
+            set_log_file(None)
+            self.events.put(('finished', self.choice))
 
-            info(f"--- Executing module: {module_name} ---")
-            proc = multiprocessing.Process(target=_module_runner, args=(choice,
-                target, target_dir, is_auto))
-            proc.start()
-            runtime_controller.set_current_pid(proc.pid)
-            while proc.is_alive():
-                if runtime_controller.should_skip_current():
-                    try:
-                        os.kill(proc.pid, signal.SIGTERM)
-                    except Exception:
-                        pass
-                    break
-                if runtime_controller.should_quit():
-                    try:
-                        os.kill(proc.pid, signal.SIGTERM)
-                    except Exception:
-                        pass
+def _with_internal_stages(choices):
+    """Adds the internal stages whose output a selected module (or stage) consumes."""
+    stages = list(choices)
+    changed = True
+    while changed:
+        changed = False
+        for key, module_info in MODULE_MAP.items():
+            if not module_info.get('internal') or key in stages:
+                continue
+            produces = set(module_info['produces'])
+            for i, choice in enumerate(stages):
+                if produces.intersection(MODULE_MAP[choice]['consumes']):
+                    stages.insert(i, key)
+                    changed = True
                     break
-                time.sleep(0.2)
-            if proc.is_alive():
-                try:
-                    proc.join(timeout=1)
-                except Exception:
-                    pass
-            runtime_controller.set_current_pid(None)
+    return stages
+def _module_target(choice, target, target_dir):
+    """Feeds a module its declared input list ('@file') when an earlier stage wrote one."""
+    input_name = MODULE_MAP[choice].get('input')
+    if input_name:
+        input_file = os.path.join(target_dir, "Logs", input_name)
+        if os.path.exists(input_file) and os.path.getsize(input_file) > 0:
+            return f"@{input_file}"
+    return target
+def _setup_streaming(stages, target, module_options):
+    """
+    Wires the enumeration modules to the prober through a SubdomainBus.
+    Returns (bus, producers, consumer, stages, module graph for the scheduler),
+    or a None bus when streaming does not apply to this run.
+    """
+    producers = [c for c in stages if MODULE_MAP[c].get('streams')]
+    consumer = next((c for c in stages if MODULE_MAP[c].get('stream_consumer')), None)
+    if not (STREAMING_PIPELINE and producers and consumer and is_domain_target(target)):
+        return None, [], None, stages, MODULE_MAP
+    bus = SubdomainBus()
+    bus.publish(target)
+    for choice in producers:
+        module_options[choice] = dict(module_options.get(choice, {}), bus=bus)
+    module_options[consumer] = dict(module_options.get(consumer, {}), bus=bus, scope=target)
+    # The consumer no longer waits for the files; it reads the bus instead
+    graph = dict(MODULE_MAP)
+    graph[consumer] = dict(MODULE_MAP[consumer], consumes=[])
+    stages = [c for c in stages if not MODULE_MAP[c].get('inline_when_streaming')]
+    return bus, producers, consumer, stages, graph
+def _cache_args(options):
+    """The module options that identify a result (drops the bus and other live objects)."""
+    return {k: v for k, v in (options or {}).items()
+            if k not in ('bus', 'scope') and isinstance(v, (str, int, float, bool, type(None)))}
 
-            # Always resume the listener after a module process finishes
-            runtime_controller.resume_listener()
+def _restore_cached(choice, target, target_dir, options, bus):
+    """
+    Restores a cached result into Logs/ instead of running the module.
+    Streaming producers replay the restored names onto the bus.
+    """
+    artifacts = MODULE_MAP[choice].get('artifacts')
+    if not artifacts or target.startswith('@'):
+        return False
+    logs_dir = os.path.join(target_dir, "Logs")
+    restored = get_cache().restore(MODULE_MAP[choice]['file'], target, _cache_args(options), logs_dir)
+    if not restored:
+        return False
+    _replay_on_bus(choice, [os.path.join(logs_dir, name) for name in restored], bus)
+    return True
+
+def _replay_on_bus(choice, paths, bus):
+    """Publishes the names a streaming producer found earlier (cache hit or resumed run)."""
+    if not bus or not MODULE_MAP[choice].get('streams'):
+        return
+    for path in paths:
+        with open(path, 'r') as f:
+            for line in f:
+                bus.publish(line)
+
+def _artifact_paths(choice, target_dir):
+    """The artifact files a module has written to Logs/ (for the run journal)."""
+    paths = []
+    for pattern in MODULE_MAP[choice].get('artifacts', []):
+        paths.extend(sorted(glob.glob(os.path.join(target_dir, "Logs", pattern))))
+    return paths
+
+def _resumable(stages, completed, producers, consumer):
+    """
+    The completed stages a resumed run can skip: a stage is run again when
+    anything upstream of it (including streaming producers feeding the
+    consumer) has to run again, since its output would be stale otherwise.
+    """
+    rerun = {c for c in stages if c not in completed}
+    changed = True
+    while changed:
+        changed = False
+        for choice in stages:
+            if choice in rerun:
+                continue
+            consumes = set(MODULE_MAP[choice]['consumes'])
+            upstream = [o for o in stages if consumes.intersection(MODULE_MAP[o]['produces'])]
+            if choice == consumer:
+                upstream += producers
+            if any(o in rerun for o in upstream):
+                rerun.add(choice)
+                changed = True
+    return [c for c in stages if c not in rerun]
+
+def _store_cached(choice, target, target_dir, options):
+    """Caches a successful module's artifacts (only when they were all written)."""
+    artifacts = MODULE_MAP[choice].get('artifacts')
+    if not artifacts or target.startswith('@'):
+        return
+    paths = [os.path.join(target_dir, "Logs", name) for name in artifacts]
+    if all(os.path.exists(p) and os.path.getsize(p) > 0 for p in paths):
+        get_cache().store(MODULE_MAP[choice]['file'], target, _cache_args(options), paths)
+
+def execute_modules(module_choices, target, target_dir, report_enabled, max_parallel=None,
+                    runtime_controller=None, limiter=None, module_options=None,
+                    log_file=None, on_event=None, journal=None):
+    """
+    Runs the selected modules for one target.
 
+    Batch runs pass a shared runtime_controller and ToolLimiter, preset
+    module_options (e.g. the Nmap scan type chosen once for every target),
+    a per-target log_file for raw module output and an on_event callback
+    receiving (event, module_name) for 'start', 'done', 'cached', 'resumed',
+    'failed' and 'skipped'. Passive modules with a fresh cached result are
+    restored from the cache instead of being run.
+
+    With a TargetJournal every module state change is journaled, and modules
+    that completed in an earlier attempt of the run are not run again.
+    """
+    module_options = dict(module_options or {})
+    if '0' in module_choices:
+        choices = sorted((k for k in MODULE_MAP if k.isdigit()), key=lambda x: int(x))
+    else:
+        choices = module_choices.split()
+    for choice in choices:
+        if choice not in MODULE_MAP or MODULE_MAP[choice].get('internal'):
+            warning(f"Unknown module choice '{choice}'. Skipping.")
+    choices = [c for c in choices if c in MODULE_MAP and not MODULE_MAP[c].get('internal')]
+    stages = _with_internal_stages(choices)
+    is_run_all = '0' in module_choices
+    # Interactive Nmap prompts on the terminal, so it has to run on its own
+    exclusive = [] if is_run_all or 'scan_type' in module_options.get('6', {}) else ['6']
+    bus, producers, consumer, stages, graph = _setup_streaming(stages, target, module_options)
+    if bus:
+        info("Streaming pipeline: HTTPX probes subdomains while enumeration runs.")
+    resumed = _resumable(stages, journal.completed(), producers, consumer) if journal else []
+    if journal:
+        for choice in stages:
+            if choice not in resumed:
+                journal.record(choice, 'pending')
+    scheduler = ModuleScheduler(stages, graph,
+                                max_parallel=max_parallel or MAX_PARALLEL_MODULES,
+                                exclusive=exclusive)
+    # A batch shares one controller between targets; label modules with their target
+    owns_controller = runtime_controller is None
+    if owns_controller:
+        runtime_controller = RuntimeControl()
+        runtime_controller.start()
+    def _label(choice):
+        name = MODULE_MAP[choice]['name']
+        return name if owns_controller else f"{name} [{target}]"
+    def _notify(event, choice):
+        if journal and event != 'resumed':
+            artifacts = _artifact_paths(choice, target_dir) if event in ('done', 'cached') else None
+            state = 'running' if event == 'start' else event
+            if event in ('failed', 'skipped') and MODULE_MAP[choice].get('resumable'):
+                # It keeps what it finished: a resumed run picks up the rest
+                state = INCOMPLETE_STATE
+            journal.record(choice, state, artifacts)
+        if on_event:
+            try:
+                on_event(event, MODULE_MAP[choice]['name'])
+            except Exception:
+                pass
+    info(f"Starting {len(scheduler.pending)} module(s) (up to {scheduler.max_parallel} in parallel)...")
+    # Module threads, skip/quit and freed tool slots all report here; the loop
+    # sleeps on this queue instead of polling
+    events = queue.Queue()
+    runtime_controller.watch(events)
+    if limiter:
+        limiter.watch(events)
+    running = {} # choice -> _ModuleThread
+
+    def _finish(choice):
+        worker = running.pop(choice)
+        worker.join()
+        module_name = MODULE_MAP[choice]['name']
+        skipped = runtime_controller.should_skip(_label(choice))
+        scheduler.finish(choice)
+        runtime_controller.remove_running(_label(choice))
+        get_supervisor().clear_unit(_label(choice))
+        if limiter:
+            limiter.release(MODULE_MAP[choice]['file'])
+        # Always resume the listener after a module finishes
+        runtime_controller.resume_listener()
+        if skipped:
+            warning(f"Module '{module_name}' SKIPPED.")
+            _notify('skipped', choice)
+        elif worker.exitcode == 0:
+            _store_cached(choice, target, target_dir, module_options.get(choice))
+            _notify('done', choice)
+        else:
+            _notify('failed', choice)
+        # Nobody is reading any more
+        if bus and choice == consumer:
+            bus.drain()
+
+    try:
+        while not scheduler.done():
             if runtime_controller.should_quit():
                 info("Quitting as requested...")
+                if bus and not bus.closed:
+                    bus.close()
+                for choice in running:
+                    terminate_unit(_label(choice))
+                # Tools get the grace period to exit before the supervisor kills them
+                deadline = time.time() + KILL_GRACE_PERIOD + 1
+                for choice, worker in running.items():
+                    worker.join(timeout=max(0.0, deadline - time.time()))
+                    runtime_controller.remove_running(_label(choice))
+                    get_supervisor().clear_unit(_label(choice))
+                    if limiter:
+                        limiter.release(MODULE_MAP[choice]['file'])
+                scheduler.cancel_pending()
                 break
-            if runtime_controller.should_skip_current():
-                warning(f"Module '{module_name}' SKIPPED.")
-                runtime_controller.reset_module_state()
+            progressed = False
+            for choice in scheduler.ready():
+                module_info = MODULE_MAP[choice]
+                module_name = module_info['name']
+                is_auto = is_run_all and choice == '6'
+                if choice in resumed:
+                    info(f"--- {module_name}: completed in an earlier attempt, not run again ---")
+                    _replay_on_bus(choice, _artifact_paths(choice, target_dir), bus)
+                    scheduler.start(choice)
+                    scheduler.finish(choice)
+                    _notify('resumed', choice)
+                    progressed = True
+                    continue
+                if _restore_cached(choice, target, target_dir, module_options.get(choice), bus):
+                    success(f"--- {module_name}: restored cached result ---")
+                    scheduler.start(choice)
+                    scheduler.finish(choice)
+                    _notify('cached', choice)
+                    progressed = True
+                    continue
+                # Per-tool caps are shared by every target of a batch
+                if limiter and not limiter.acquire(module_info['file']):
+                    continue
+                try:
+                    # Keep the listener away from stdin while interactive Nmap prompts
+                    if choice in exclusive:
+                        runtime_controller.pause_listener()
+                    info(f"--- Executing module: {module_name} ---")
+                    worker = _ModuleThread(choice, _label(choice), _module_target(choice, target, target_dir),
+                                           target_dir, events, is_auto, module_options.get(choice), log_file)
+                    runtime_controller.add_running(_label(choice))
+                    worker.start()
+                except Exception as e:
+                    error(f"An error occurred while running module {module_info['file']}: {e}")
+                    runtime_controller.remove_running(_label(choice))
+                    runtime_controller.resume_listener()
+                    if limiter:
+                        limiter.release(module_info['file'])
+                    scheduler.finish(choice)
+                    _notify('failed', choice)
+                    progressed = True
+                    continue
+                scheduler.start(choice)
+                running[choice] = worker
+                _notify('start', choice)
+            # Close the bus once every producer is done, or early when the prober is skipped
+            if bus and not bus.closed and (all(c in scheduler.finished for c in producers) or
+                                           (consumer in running and runtime_controller.should_skip(_label(consumer)))):
+                bus.close()
+            if progressed or scheduler.done():
                 continue
-        except ImportError as e:
-            error(f"Could not import module: {module_info['file']}. Details: {e}")
-        except AttributeError:
-            error(f"Module {module_info['file']} is missing the required handler.")
-        except Exception as e:
-            error(f"An error occurred while running module {module_info['file']}: {e}")
-    time.sleep(1)
-    runtime_controller.stop()
+            # Block until a module finishes, skip/quit is requested or a tool slot frees up
+            kind, choice = events.get()
+            if kind == 'finished' and choice in running:
+                _finish(choice)
+    finally:
+        runtime_controller.unwatch(events)
+        if limiter:
+            limiter.unwatch(events)
+    if bus:
+        bus.drain()
+    if owns_controller:
+        runtime_controller.stop()
     if runtime_controller.should_quit():
         info("KESTREL terminated by user.")
         return False
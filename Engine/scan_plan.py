@@ -0,0 +1,89 @@
+# KESTREL/Engine/scan_plan.py
+# Description: Pre-scan planner that collapses hostnames onto the unique IPs nmap actually has to scan.
+
+import asyncio
+import ipaddress
+import json
+import os
+from .resolution import iter_resolved
+from .portscan import resolve_ipv4
+from .cdn import get_index
+from config import CDN_POLICY
+
+SCAN_PLAN_FILE = "scan_plan.json"
+SCAN_TARGETS_FILE = "scan_targets.txt"
+
+
+def _host_only(name):
+    """'www.example.com:8443' -> 'www.example.com' (alive.txt keeps httpx's host:port)."""
+    name = name.strip().lower().rstrip('.')
+    if name.count(':') == 1:
+        name = name.split(':', 1)[0]
+    return name
+
+def _ipv4(name):
+    try:
+        address = ipaddress.ip_address(name)
+    except ValueError:
+        return None
+    return str(address) if address.version == 4 else None
+
+def plan_scan(hosts, logs_dir, cdn_policy=CDN_POLICY):
+    """
+    Maps every host to the IPv4 address nmap would scan for it (the first A
+    record; nmap scans nothing else without -6) and groups the hosts by
+    address. Names already in Logs/resolved.jsonl are not resolved again;
+    the rest go through the system resolver, like nmap's own lookups.
+    Addresses in CDN / cloud edge ranges are tagged with their provider and
+    listed as 'skipped' or 'downgraded' according to cdn_policy.
+    Writes Logs/scan_plan.json ({address: [hosts]}, the hosts with no IPv4
+    address and the CDN addresses) and the addresses for the full scan to
+    Logs/scan_targets.txt, and returns the plan.
+    """
+    names = list(dict.fromkeys(name for name in map(_host_only, hosts) if name))
+
+    address_of = {}
+    wanted = set(names)
+    for record in iter_resolved(logs_dir):
+        if record.get('host') in wanted and record.get('a'):
+            address_of[record['host']] = record['a'][0]
+    for name in names:
+        if _ipv4(name):
+            address_of[name] = _ipv4(name)
+
+    missing = [name for name in names if name not in address_of]
+    if missing:
+        address_of.update(asyncio.run(resolve_ipv4(missing)))
+
+    addresses = {}
+    for name in names:
+        if name in address_of:
+            addresses.setdefault(address_of[name], []).append(name)
+    providers = get_index().classify(addresses)
+    edge = list(providers) if cdn_policy in ('skip', 'downgrade') else []
+    plan = {'hosts': len(names), 'addresses': addresses,
+            'unresolved': [name for name in names if name not in address_of],
+            'providers': providers, 'cdn_policy': cdn_policy,
+            'skipped': edge if cdn_policy == 'skip' else [],
+            'downgraded': edge if cdn_policy == 'downgrade' else []}
+    with open(os.path.join(logs_dir, SCAN_PLAN_FILE), 'w') as f:
+        json.dump(plan, f, indent=4)
+    with open(os.path.join(logs_dir, SCAN_TARGETS_FILE), 'w') as f:
+        f.writelines(f"{address}\n" for address in scan_addresses(plan))
+    return plan
+
+def scan_addresses(plan):
+    """The planned addresses that get the full scan (CDN addresses skipped or downgraded are not among them)."""
+    edge = set(plan.get('skipped', [])) | set(plan.get('downgraded', []))
+    return [address for address in plan['addresses'] if address not in edge]
+
+def load_plan(logs_dir):
+    """The saved scan plan, or None when the scan was not planned."""
+    path = os.path.join(logs_dir, SCAN_PLAN_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
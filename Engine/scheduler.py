@@ -0,0 +1,121 @@
+# KESTREL/Engine/scheduler.py
+# Description: Dependency-graph scheduler deciding which selected modules may run concurrently.
+
+import threading
+
+
+class ModuleScheduler:
+    """
+    Tracks the selected modules and hands out the ones that are ready to run.
+
+    A module is ready once every *selected* module producing an artifact it
+    consumes has finished (done, failed or skipped). Modules that are not
+    connected by an artifact run side by side, up to max_parallel at a time.
+    Exclusive modules (e.g. interactive Nmap) only start on an idle scheduler
+    and block everything else until they finish.
+    """
+    def __init__(self, choices, module_map, max_parallel=1, exclusive=None):
+        self.module_map = module_map
+        self.max_parallel = max(1, int(max_parallel))
+        self.exclusive = set(exclusive or [])
+        # Keep the user's order (and drop duplicates/unknown keys)
+        self.pending = []
+        for choice in choices:
+            if choice in module_map and choice not in self.pending:
+                self.pending.append(choice)
+        self.running = []
+        self.finished = []
+
+    def _unfinished_producers(self, choice):
+        """Selected modules that still have to produce something 'choice' consumes."""
+        consumes = set(self.module_map[choice].get('consumes', []))
+        blockers = []
+        for other in self.pending + self.running:
+            if other == choice:
+                continue
+            if consumes.intersection(self.module_map[other].get('produces', [])):
+                blockers.append(other)
+        return blockers
+
+    def ready(self):
+        """Returns the modules that can be started right now, in selection order."""
+        if any(c in self.exclusive for c in self.running):
+            return []
+
+        slots = self.max_parallel - len(self.running)
+        ready = []
+        for choice in self.pending:
+            if slots <= 0:
+                break
+            if self._unfinished_producers(choice):
+                continue
+            if choice in self.exclusive:
+                # Wait for the scheduler to drain, then run it on its own
+                if not self.running and not ready:
+                    ready.append(choice)
+                break
+            ready.append(choice)
+            slots -= 1
+        return ready
+
+    def start(self, choice):
+        self.pending.remove(choice)
+        self.running.append(choice)
+
+    def finish(self, choice):
+        if choice in self.running:
+            self.running.remove(choice)
+        elif choice in self.pending:
+            self.pending.remove(choice)
+        self.finished.append(choice)
+
+    def cancel_pending(self):
+        """Drops every module that has not started yet (used on quit)."""
+        dropped = list(self.pending)
+        self.pending = []
+        return dropped
+
+    def done(self):
+        return not self.pending and not self.running
+
+
+class ToolLimiter:
+    """
+    Caps how many processes of each tool run at once across every target of a
+    batch (e.g. at most two Nmap scans while dozens of Whois lookups proceed).
+    Tools without a configured limit are not capped. Execution loops waiting
+    for a slot register their event queue with watch() and get a ('slot', tool)
+    event whenever one is released.
+    """
+    def __init__(self, limits=None):
+        self.limits = dict(limits or {})
+        self.in_use = {}
+        self.lock = threading.Lock()
+        self.watchers = []
+
+    def watch(self, events):
+        with self.lock:
+            self.watchers.append(events)
+
+    def unwatch(self, events):
+        with self.lock:
+            if events in self.watchers:
+                self.watchers.remove(events)
+
+    def acquire(self, tool):
+        """Non-blocking: returns True and takes a slot if one is free."""
+        with self.lock:
+            limit = self.limits.get(tool)
+            used = self.in_use.get(tool, 0)
+            if limit is not None and used >= limit:
+                return False
+            self.in_use[tool] = used + 1
+            return True
+
+    def release(self, tool):
+        with self.lock:
+            if self.in_use.get(tool, 0) > 0:
+                self.in_use[tool] -= 1
+            watchers = list(self.watchers)
+        for events in watchers:
+            events.put(('slot', tool))
@@ -0,0 +1,205 @@
+# KESTREL/Engine/screenshot_batches.py
+# Description: Runs EyeWitness over a URL list in batches sized from free memory and cores, backing off under memory pressure.
+
+import math
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+from .logger import info, success, warning, error
+from .progress import get_board
+from .supervisor import run_tool, cancelled, current_unit, session_rss
+from config import (SCREENSHOT_BATCH_SIZE, SCREENSHOT_MAX_THREADS, SCREENSHOT_THREADS_PER_CORE,
+                    SCREENSHOT_MB_PER_THREAD, SCREENSHOT_RESERVE_MB, SCREENSHOT_TIMEOUT, SCREENSHOT_RETRIES)
+
+FAILED_FILE = "screenshot_failed.txt"   # under Logs/; URLs still without a screenshot after the retries
+INDEX_FILE = "report.html"              # under Screenshots/; links every batch's EyeWitness report
+WATCH_INTERVAL = 2.0                    # Seconds between memory checks of a running batch
+MB = 1024 * 1024
+
+
+def available_mb():
+    """MemAvailable from /proc/meminfo in MB, or None where it can't be read."""
+    try:
+        with open("/proc/meminfo", 'r') as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+def size_threads(per_thread_mb=SCREENSHOT_MB_PER_THREAD):
+    """
+    EyeWitness threads that fit right now: one headless browser per
+    per_thread_mb of the memory available above SCREENSHOT_RESERVE_MB,
+    capped by SCREENSHOT_THREADS_PER_CORE per core and SCREENSHOT_MAX_THREADS.
+    """
+    by_cpu = (os.cpu_count() or 1) * SCREENSHOT_THREADS_PER_CORE
+    available = available_mb()
+    by_memory = by_cpu if available is None else (available - SCREENSHOT_RESERVE_MB) // max(1, per_thread_mb)
+    return int(max(1, min(SCREENSHOT_MAX_THREADS, by_cpu, by_memory)))
+
+def _key(text):
+    """URLs and EyeWitness's screenshot file names (the URL with punctuation replaced) reduced to one form."""
+    return re.sub(r"[^a-z0-9]+", ".", text.lower()).strip(".")
+
+def captured_urls(urls, out_dir):
+    """The URLs of a batch that have a screenshot in out_dir/screens (bare hosts: either scheme)."""
+    screens = os.path.join(out_dir, "screens")
+    if not os.path.isdir(screens):
+        return set()
+    saved = {_key(os.path.splitext(name)[0]) for name in os.listdir(screens)}
+    captured = set()
+    for url in urls:
+        candidates = [url] if "://" in url else [f"http://{url}", f"https://{url}"]
+        if any(_key(candidate) in saved for candidate in candidates):
+            captured.add(url)
+    return captured
+
+
+def _run_batch(list_path, out_dir, threads, count):
+    """
+    One EyeWitness run over list_path, watched every WATCH_INTERVAL seconds:
+    when the memory available drops below SCREENSHOT_RESERVE_MB, or the
+    browsers' RSS outgrows what was free at the start, the run is stopped.
+    Returns {'pressure': bool, 'peak_rss': bytes, 'error': str or None}.
+    """
+    available = available_mb()
+    budget = None if available is None else max(1, available - SCREENSHOT_RESERVE_MB) * MB
+    state = {'pressure': False, 'peak_rss': 0, 'error': None}
+    finished = threading.Event()
+
+    def _watch(pid, stop):
+        while not finished.wait(WATCH_INTERVAL):
+            rss = session_rss(pid)
+            state['peak_rss'] = max(state['peak_rss'], rss)
+            free = available_mb()
+            if (free is not None and free < SCREENSHOT_RESERVE_MB) or (budget and rss > budget):
+                state['pressure'] = True
+                stop()
+                return
+
+    def _on_start(pid, stop):
+        threading.Thread(target=_watch, args=(pid, stop), daemon=True).start()
+
+    command = ["eyewitness", "--web", "--timeout", str(SCREENSHOT_TIMEOUT), "--threads", str(threads),
+               "--prepend-https", "-f", list_path, "-d", out_dir, "--no-prompt"]
+    # Each browser handles ceil(count / threads) pages; allow twice their page timeout
+    timeout = math.ceil(count / threads) * SCREENSHOT_TIMEOUT * 2 + 60
+    try:
+        result = run_tool(command, on_start=_on_start, timeout=timeout)
+        if result.returncode != 0 and not state['pressure']:
+            state['error'] = result.stderr.strip()[-300:] or f"exit code {result.returncode}"
+    except subprocess.TimeoutExpired:
+        state['error'] = f"timed out after {timeout} seconds"
+    finally:
+        finished.set()
+    return state
+
+def _write_index(out_root, batches):
+    """Screenshots/report.html: a link to each batch's EyeWitness report."""
+    rows = "".join(f'<li><a href="{name}/report.html">{name}</a> ({count} screenshots)</li>\n'
+                   for name, count in batches)
+    with open(os.path.join(out_root, INDEX_FILE), 'w', encoding='utf-8') as f:
+        f.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>KESTREL screenshots</title></head>\n"
+                f"<body><h1>Screenshots</h1>\n<ul>\n{rows}</ul></body></html>\n")
+
+def run_batches(urls, out_root, logs_dir):
+    """
+    Screenshots 'urls' with EyeWitness in batches of SCREENSHOT_BATCH_SIZE,
+    each into its own Screenshots/batch_NNNN directory. The thread count is
+    sized from free memory and cores before every batch: halved when a
+    batch had to be stopped for memory, and raised again (at most doubled,
+    and never back to a count that was stopped) from the browsers' measured
+    RSS when it went through. Only the URLs of a batch without a screenshot
+    are queued again, up to SCREENSHOT_RETRIES times (a stop for memory
+    doesn't count as an attempt until a single thread is left).
+    Returns (URLs captured, URLs failed); URLs not reached before a skip or
+    quit are neither.
+    """
+    os.makedirs(out_root, exist_ok=True)
+    # Batches of an earlier run would pass for this run's screenshots and drop out of the index
+    for name in os.listdir(out_root):
+        if name.startswith("batch_") or name == INDEX_FILE:
+            path = os.path.join(out_root, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+    queue = deque((url, 0) for url in dict.fromkeys(urls))
+    total = len(queue)
+    per_thread_mb = SCREENSHOT_MB_PER_THREAD
+    threads = size_threads(per_thread_mb)
+    ceiling = SCREENSHOT_MAX_THREADS
+    captured, failed, batches = 0, [], []
+    board, unit, started = get_board(), current_unit(), time.time()
+    run_id = board.start(unit, "eyewitness")
+    try:
+        while queue and not cancelled():
+            batch = [queue.popleft() for _ in range(min(SCREENSHOT_BATCH_SIZE, len(queue)))]
+            name = f"batch_{len(batches) + 1:04d}"
+            out_dir = os.path.join(out_root, name)
+            list_path = os.path.join(out_root, f"{name}.txt")
+            with open(list_path, 'w') as f:
+                f.writelines(f"{url}\n" for url, _ in batch)
+            info(f"Screenshot {name}: {len(batch)} URLs with {threads} threads ({len(queue)} queued after it).")
+            state = _run_batch(list_path, out_dir, threads, len(batch))
+            os.remove(list_path)
+
+            done = captured_urls([url for url, _ in batch], out_dir)
+            captured += len(done)
+            batches.append((name, len(done)))
+            peak_mb = state['peak_rss'] // MB
+            if state['pressure']:
+                warning(f"Screenshot {name} stopped under memory pressure (browsers at {peak_mb} MB); "
+                        f"{len(done)} of {len(batch)} captured, retrying the rest with fewer threads.")
+            elif state['error']:
+                warning(f"Screenshot {name} failed ({state['error']}); {len(done)} of {len(batch)} captured.")
+            else:
+                info(f"Screenshot {name} done: {len(done)} of {len(batch)} captured (browsers peaked at {peak_mb} MB).")
+
+            for url, attempts in batch:
+                if url in done:
+                    continue
+                # URLs cut off by a memory stop get another chance without using up a retry
+                if state['pressure'] and threads > 1:
+                    queue.appendleft((url, attempts))
+                elif attempts < SCREENSHOT_RETRIES:
+                    queue.append((url, attempts + 1))
+                else:
+                    failed.append(url)
+
+            if peak_mb:
+                per_thread_mb = max(per_thread_mb, peak_mb // threads)
+            if state['pressure']:
+                # Never go back to a thread count that ran out of memory
+                ceiling = max(1, threads - 1)
+                threads = max(1, threads // 2)
+            else:
+                threads = min(size_threads(per_thread_mb), threads * 2, ceiling)
+
+            handled = total - len(queue)
+            elapsed = time.time() - started
+            board.update(run_id, percent=100.0 * handled / total, phase=name,
+                         remaining=int(elapsed / handled * len(queue)) if handled else None)
+    finally:
+        board.finish(run_id)
+
+    if queue:
+        info(f"Screenshots stopped with {len(queue)} URLs still queued; they are not counted as failed.")
+    if batches:
+        _write_index(out_root, batches)
+    failed_path = os.path.join(logs_dir, FAILED_FILE)
+    if failed:
+        with open(failed_path, 'w') as f:
+            f.writelines(f"{url}\n" for url in failed)
+        error(f"{len(failed)} URLs have no screenshot; they are listed in {os.path.relpath(failed_path, logs_dir)}.")
+    elif os.path.exists(failed_path):
+        os.remove(failed_path)
+    if captured:
+        success(f"{captured} of {total} URLs captured.")
+    return captured, failed
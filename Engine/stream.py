@@ -0,0 +1,77 @@
+# KESTREL/Engine/stream.py
+# Description: Streaming bus that lets enumeration modules hand subdomains to the prober as they appear.
+
+import queue
+import time
+from .supervisor import run_tool
+
+_CLOSE = "__KESTREL_STREAM_CLOSED__"
+
+
+class SubdomainBus:
+    """
+    Queue between the enumeration modules (producers) and the live prober
+    (consumer), which run on threads of the same process. Producers publish
+    raw tool lines as the tool prints them; the runtime closes the bus once
+    every producer has finished (or the consumer is skipped) and the consumer
+    reads it in micro-batches until then.
+    """
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.closed = False
+
+    def publish(self, line):
+        line = line.strip()
+        if line:
+            self.queue.put(line)
+
+    def close(self):
+        """Called by the runtime once all producers are done (or the consumer is skipped)."""
+        if not self.closed:
+            self.closed = True
+            self.queue.put(_CLOSE)
+
+    def drain(self):
+        """Discards whatever is queued once nobody consumes it any more."""
+        try:
+            while True:
+                self.queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def batches(self, batch_size=200, max_wait=10.0):
+        """
+        Yields lists of lines: a batch is emitted once it holds batch_size
+        lines or max_wait seconds after its first line arrived.
+        """
+        batch = []
+        deadline = None
+        while True:
+            # Without a partial batch there is nothing to time out: block until a line arrives
+            timeout = None if deadline is None else max(0.0, deadline - time.time())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item == _CLOSE:
+                if batch:
+                    yield batch
+                return
+            if item is not None:
+                if not batch:
+                    deadline = time.time() + max_wait
+                batch.append(item)
+            if batch and (len(batch) >= batch_size or time.time() >= deadline):
+                yield batch
+                batch = []
+                deadline = None
+
+
+def run_and_publish(argv, bus):
+    """
+    Runs a tool under the supervisor like subprocess.run, but publishes every
+    stdout line to the bus as soon as the tool prints it. Returns a
+    CompletedProcess (whose stdout holds only the last lines; the tools also
+    write their own output files).
+    """
+    return run_tool(argv, on_line=bus.publish)
@@ -0,0 +1,113 @@
+# KESTREL/Engine/subdomains.py
+# Description: Subdomain normalisation, scope checks and a flat-memory streaming merge/dedupe.
+
+import os
+import re
+import heapq
+import ipaddress
+import tempfile
+
+# Names held in memory at once before a sorted run is spilled to disk
+MERGE_CHUNK_SIZE = 200000
+
+_HOSTNAME_RE = re.compile(r"^(?=.{1,253}$)([a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9])?\.)*[a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9])?$")
+
+def normalise_name(line):
+    """
+    Turns one line of tool output into a clean lowercase hostname, or None.
+    Handles plain names, URLs, 'host:port', wildcard prefixes and Amass's
+    'name (FQDN) --> ...' graph lines.
+    """
+    if not line:
+        return None
+    name = line.strip()
+    if not name or name.startswith('#'):
+        return None
+    name = name.split()[0]
+    if '://' in name:
+        name = name.split('://', 1)[1]
+    name = name.split('/', 1)[0].split(':', 1)[0]
+    name = name.lower().rstrip('.')
+    while name.startswith('*.'):
+        name = name[2:]
+    if not _HOSTNAME_RE.match(name):
+        return None
+    return name
+
+def is_domain_target(target):
+    """True for a domain name, False for IPs, CIDR ranges and file targets."""
+    if not target or target.startswith('@') or '/' in target:
+        return False
+    try:
+        ipaddress.ip_address(target)
+        return False
+    except ValueError:
+        return normalise_name(target) is not None
+
+def in_scope(name, apex):
+    return name == apex or name.endswith('.' + apex)
+
+def _spill(names, tmp_dir):
+    """Writes a sorted run of names to a temporary file and returns its path."""
+    fd, path = tempfile.mkstemp(prefix="subs_run_", suffix=".txt", dir=tmp_dir)
+    with os.fdopen(fd, 'w') as f:
+        for name in sorted(names):
+            f.write(name + "\n")
+    return path
+
+def _iter_file(path):
+    with open(path, 'r') as f:
+        for line in f:
+            yield line.rstrip("\n")
+
+def merge_name_streams(streams, output_file, apex=None, chunk_size=MERGE_CHUNK_SIZE):
+    """
+    Normalises, scope-filters and deduplicates names from any number of line
+    iterables in one pass and writes the sorted unique set to output_file.
+
+    Memory stays bounded by chunk_size: once that many names are buffered the
+    sorted run is spilled to disk and the runs are k-way merged at the end.
+    Returns a stats dict (read, out_of_scope, invalid, duplicates, written).
+    """
+    stats = {'read': 0, 'invalid': 0, 'out_of_scope': 0, 'duplicates': 0, 'written': 0}
+    out_dir = os.path.dirname(os.path.abspath(output_file))
+    buffer = set()
+    runs = []
+    try:
+        for stream in streams:
+            for line in stream:
+                stats['read'] += 1
+                name = normalise_name(line)
+                if not name:
+                    stats['invalid'] += 1
+                    continue
+                if apex and not in_scope(name, apex):
+                    stats['out_of_scope'] += 1
+                    continue
+                buffer.add(name)
+                if len(buffer) >= chunk_size:
+                    runs.append(_spill(buffer, out_dir))
+                    buffer = set()
+
+        tmp_output = output_file + ".tmp"
+        with open(tmp_output, 'w') as out:
+            merged = heapq.merge(sorted(buffer), *[_iter_file(r) for r in runs])
+            buffer = None
+            previous = None
+            for name in merged:
+                if name == previous:
+                    continue
+                out.write(name + "\n")
+                stats['written'] += 1
+                previous = name
+        os.replace(tmp_output, output_file)
+    finally:
+        for run_path in runs:
+            try:
+                os.remove(run_path)
+            except OSError:
+                pass
+
+    valid = stats['read'] - stats['invalid'] - stats['out_of_scope']
+    stats['duplicates'] = valid - stats['written']
+    return stats
@@ -0,0 +1,447 @@
+# KESTREL/Engine/supervisor.py
+# Description: Event-driven supervisor that runs external tools in their own process groups.
+
+import atexit
+import heapq
+import json
+import os
+import selectors
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from .capture import OutputCapture
+from .logger import get_log_file
+from config import KILL_GRACE_PERIOD, TOOL_REGISTRY_DIR
+
+_local = threading.local()
+
+
+def set_unit(tag, output_log=None):
+    """
+    Tags the tools started by this thread (the module label used by
+    skip/quit) and names the rotating log their output is streamed to.
+    """
+    _local.unit = tag
+    _local.output_log = output_log
+
+def current_unit():
+    return getattr(_local, 'unit', None)
+
+def current_output_log():
+    return getattr(_local, 'output_log', None)
+
+
+def _proc_stat(pid):
+    """(session id, start time in clock ticks) of a live process, from /proc; None when it is gone (or a zombie)."""
+    try:
+        with open(f"/proc/{pid}/stat", 'r') as f:
+            # The command name may contain spaces and parentheses: split after the last ')'
+            fields = f.read().rsplit(')', 1)[1].split()
+        if fields[0] == 'Z':
+            return None
+        return int(fields[3]), int(fields[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+def _start_time(pid):
+    stat = _proc_stat(pid)
+    return stat[1] if stat else None
+
+
+class ToolRegistry:
+    """
+    On-disk list of the process groups this KESTREL process has started, in
+    <directory>/<pid>.json with the owner's and every tool's start time (so a
+    recycled PID is never mistaken for one of ours). The file is rewritten as
+    tools start and exit, and removed when none are left; a file whose owner
+    is dead is what a crashed run left behind (see reap_strays).
+    """
+    def __init__(self, directory=TOOL_REGISTRY_DIR):
+        self.directory = directory
+        self.path = os.path.join(directory, f"{os.getpid()}.json")
+        self.owner_start = _start_time(os.getpid())
+        self.tools = {}   # session id (= the tool's PID) -> {'start', 'argv'}
+        self._lock = threading.Lock()
+
+    def add(self, pid, argv):
+        with self._lock:
+            self.tools[pid] = {'start': _start_time(pid), 'argv': [str(a) for a in argv]}
+            self._write()
+
+    def remove(self, pid):
+        with self._lock:
+            if self.tools.pop(pid, None) is not None:
+                self._write()
+
+    def clear(self):
+        with self._lock:
+            self.tools = {}
+            self._write()
+
+    def _write(self):
+        # Best effort: a read-only home must not stop the scan
+        try:
+            if not self.tools:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'owner_start': self.owner_start, 'tools': self.tools}, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+
+def _session_members(sid):
+    """PIDs of the live processes in session sid."""
+    members = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            stat = _proc_stat(int(entry))
+            if stat and stat[0] == sid:
+                members.append(int(entry))
+    return members
+
+def session_rss(sid):
+    """Resident memory in bytes of every live process in session sid (a tool and all its children)."""
+    page = os.sysconf('SC_PAGE_SIZE')
+    total = 0
+    for pid in _session_members(sid):
+        try:
+            with open(f"/proc/{pid}/statm", 'r') as f:
+                total += int(f.read().split()[1]) * page
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+def reap_strays(directory=TOOL_REGISTRY_DIR, grace=KILL_GRACE_PERIOD):
+    """
+    Kills what a crashed KESTREL run left running: for every registry file
+    whose owner is gone, each recorded tool session is sent SIGTERM and,
+    after the grace period, SIGKILL. A session whose leader PID now belongs
+    to a different process is left alone. Returns [(argv, process count)]
+    of the sessions that were reaped. Needs /proc (Linux); elsewhere it
+    only discards stale registry files.
+    """
+    if not os.path.isdir(directory):
+        return []
+    reaped = []
+    victims = []
+    for name in os.listdir(directory):
+        owner = name[:-len(".json")]
+        if not name.endswith(".json") or not owner.isdigit() or int(owner) == os.getpid():
+            continue
+        path = os.path.join(directory, name)
+        try:
+            with open(path, 'r') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            record = {}
+        owner_start = record.get('owner_start')
+        if owner_start is not None and _start_time(int(owner)) == owner_start:
+            continue    # another KESTREL instance, still running
+        if os.path.isdir("/proc"):
+            for sid, tool in record.get('tools', {}).items():
+                sid = int(sid)
+                leader_start = _start_time(sid)
+                if leader_start is not None and leader_start != tool.get('start'):
+                    continue    # the PID was recycled; not our session any more
+                members = _session_members(sid)
+                if members:
+                    reaped.append((tool.get('argv', []), len(members)))
+                    victims.extend(members)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    for pid in victims:
+        _kill(pid, signal.SIGTERM)
+    # These are not our children (init reaps them), so watch /proc until they are gone
+    deadline = time.monotonic() + grace
+    while victims and time.monotonic() < deadline:
+        time.sleep(0.1)
+        victims = [pid for pid in victims if _proc_stat(pid)]
+    for pid in victims:
+        _kill(pid, signal.SIGKILL)
+    return reaped
+
+def _kill(pid, sig):
+    try:
+        os.kill(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class _ToolProcess:
+    """Bookkeeping for one supervised child: its pipes, output capture and exit status."""
+    def __init__(self, popen, tag, capture):
+        self.popen = popen
+        self.tag = tag
+        self.capture = capture
+        self.open_pipes = 0
+        self.exited = False
+        self.done = threading.Event()
+
+
+class Supervisor:
+    """
+    Starts tools directly (no shell) in a new session, so each one leads its
+    own process group, and watches all of them from a single selector thread:
+    stdout/stderr pipes, a pidfd per child for its exit and a wake-up pipe for
+    new children. Nothing polls; a caller blocked in run() is released the
+    moment its child has exited and both pipes are drained.
+
+    Teardown works on whole groups: terminating a unit sends SIGTERM to each
+    of its tools' groups and SIGKILL to the ones still alive after
+    grace seconds, and whatever is left in a group when its leader exits is
+    killed before the leader is reaped (while its PID, and so the group id,
+    cannot be recycled).
+    """
+    def __init__(self, grace=KILL_GRACE_PERIOD, registry=None):
+        self.grace = grace
+        self.registry = registry or ToolRegistry()
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, ('wake', None))
+        self._lock = threading.Lock()
+        self._incoming = []       # processes waiting to be registered by the loop thread
+        self._procs = set()
+        self._cancelled = set()   # tags whose tools were terminated (skip/quit)
+        self._kill_at = []        # heap of (deadline, seq, proc) for SIGKILL escalation
+        self._kill_seq = 0
+        self._thread = None
+
+    # --- public API ---
+
+    def run(self, argv, stdin=None, input=None, stdout=None, timeout=None, on_line=None,
+            keep_stdout=False, on_start=None):
+        """
+        Runs argv like subprocess.run(capture_output=True, text=True), except
+        that output is streamed (see OutputCapture): the returned stdout and
+        stderr hold only their last lines unless keep_stdout is set.
+
+        stdin is a path to feed the tool, input a string to feed it, stdout a
+        path to write its output to instead of capturing it, and on_line a
+        callback receiving each stdout line as it is printed. on_start is
+        called with the tool's PID (its session id) and a function that
+        terminates it, for callers that watch the running tool. Raises
+        subprocess.TimeoutExpired after terminating the tool's process group
+        when timeout runs out, and FileNotFoundError when the tool is missing.
+        """
+        tag = current_unit()
+        if tag is not None and tag in self._cancelled:
+            return subprocess.CompletedProcess(argv, -signal.SIGTERM, "", "cancelled")
+        self._ensure_loop()
+
+        stdin_file = stdout_file = None
+        try:
+            if input is not None:
+                stdin_file = tempfile.TemporaryFile()
+                stdin_file.write(input.encode())
+                stdin_file.seek(0)
+            elif stdin is not None:
+                stdin_file = open(stdin, 'rb')
+            if stdout is not None:
+                stdout_file = open(stdout, 'wb')
+            popen = subprocess.Popen(argv, stdin=stdin_file or subprocess.DEVNULL,
+                                     stdout=stdout_file or subprocess.PIPE, stderr=subprocess.PIPE,
+                                     start_new_session=True)
+        finally:
+            # The child holds its own copies of these descriptors
+            for f in (stdin_file, stdout_file):
+                if f:
+                    f.close()
+
+        capture = OutputCapture(argv, log_path=current_output_log(), on_line=on_line,
+                                keep_stdout=keep_stdout, log_file=get_log_file())
+        proc = _ToolProcess(popen, tag, capture)
+        self.registry.add(popen.pid, argv)
+        with self._lock:
+            self._procs.add(proc)
+            self._incoming.append(proc)
+        self._wake()
+        if on_start:
+            on_start(popen.pid, lambda: self._terminate([proc]))
+        if not proc.done.wait(timeout):
+            self._terminate([proc])
+            proc.done.wait()
+            raise subprocess.TimeoutExpired(argv, timeout)
+        return subprocess.CompletedProcess(argv, popen.returncode,
+                                           proc.capture.stdout_text(), proc.capture.stderr_text())
+
+    def terminate_unit(self, tag):
+        """
+        Terminates the process groups of every tool started under tag
+        (SIGTERM, then SIGKILL after the grace period); later run() calls
+        under it return at once.
+        """
+        with self._lock:
+            self._cancelled.add(tag)
+            procs = [p for p in self._procs if p.tag == tag]
+        self._terminate(procs)
+        return len(procs)
+
+    def shutdown(self):
+        """Terminates every tool and waits (at most the grace period) before killing the rest. Used at exit."""
+        with self._lock:
+            procs = list(self._procs)
+        for proc in procs:
+            self._signal(proc, signal.SIGTERM)
+        deadline = time.monotonic() + self.grace
+        for proc in procs:
+            if not proc.done.wait(max(0.0, deadline - time.monotonic())):
+                self._signal(proc, signal.SIGKILL)
+        self.registry.clear()
+
+    def clear_unit(self, tag):
+        """Forgets a finished unit's cancellation."""
+        with self._lock:
+            self._cancelled.discard(tag)
+
+    def cancelled(self, tag=None):
+        tag = current_unit() if tag is None else tag
+        return tag is not None and tag in self._cancelled
+
+    # --- selector loop ---
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="kestrel-supervisor", daemon=True)
+                self._thread.start()
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass    # the loop already has a wake-up pending
+
+    def _signal(self, proc, sig):
+        # Once the leader is reaped its PID may be recycled: never signal the group after that
+        if proc.exited:
+            return
+        try:
+            os.killpg(proc.popen.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _terminate(self, procs):
+        """SIGTERM now; the loop thread sends SIGKILL to the groups still alive after the grace period."""
+        deadline = time.monotonic() + self.grace
+        with self._lock:
+            for proc in procs:
+                self._kill_seq += 1
+                heapq.heappush(self._kill_at, (deadline, self._kill_seq, proc))
+        for proc in procs:
+            self._signal(proc, signal.SIGTERM)
+        self._wake()
+
+    def _escalate(self):
+        """Sends the due SIGKILLs; returns how long until the next one (None: nothing pending)."""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._kill_at and self._kill_at[0][0] <= now:
+                due.append(heapq.heappop(self._kill_at)[2])
+            next_deadline = self._kill_at[0][0] if self._kill_at else None
+        for proc in due:
+            if not proc.exited:
+                self._signal(proc, signal.SIGKILL)
+        return None if next_deadline is None else max(0.0, next_deadline - now)
+
+    def _register(self, proc):
+        for pipe, kind in ((proc.popen.stdout, 'stdout'), (proc.popen.stderr, 'stderr')):
+            if pipe is not None:
+                self._selector.register(pipe.fileno(), selectors.EVENT_READ, (kind, proc))
+                proc.open_pipes += 1
+        try:
+            pidfd = os.pidfd_open(proc.popen.pid)
+            self._selector.register(pidfd, selectors.EVENT_READ, ('exit', proc))
+        except (AttributeError, OSError):
+            # No pidfd (old kernel/Python): a helper thread waits and wakes the loop
+            threading.Thread(target=self._wait_child, args=(proc,), daemon=True).start()
+
+    def _wait_child(self, proc):
+        # Wait without reaping, so the group can still be cleaned up by _child_exited
+        try:
+            os.waitid(os.P_PID, proc.popen.pid, os.WEXITED | os.WNOWAIT)
+        except ChildProcessError:
+            pass
+        with self._lock:
+            self._incoming.append(('exited', proc))
+        self._wake()
+
+    def _child_exited(self, proc):
+        # The leader is a zombie, so its PID (the group id) is still reserved: anything
+        # left in the group now is an orphan of the tool (e.g. amass' helpers) and goes
+        self._signal(proc, signal.SIGKILL)
+        proc.popen.wait()
+        proc.exited = True
+        self.registry.remove(proc.popen.pid)
+        self._maybe_done(proc)
+
+    def _maybe_done(self, proc):
+        if proc.exited and proc.open_pipes == 0 and not proc.done.is_set():
+            proc.capture.close(proc.popen.returncode)
+            with self._lock:
+                self._procs.discard(proc)
+            proc.done.set()
+
+    def _loop(self):
+        timeout = None
+        while True:
+            for key, _ in self._selector.select(timeout):
+                kind, proc = key.data
+                if kind == 'wake':
+                    os.read(self._wake_r, 4096)
+                    with self._lock:
+                        incoming, self._incoming = self._incoming, []
+                    for item in incoming:
+                        if isinstance(item, tuple):
+                            self._child_exited(item[1])
+                        else:
+                            self._register(item)
+                elif kind == 'exit':
+                    self._selector.unregister(key.fd)
+                    os.close(key.fd)
+                    self._child_exited(proc)
+                else:
+                    data = os.read(key.fd, 65536)
+                    if data:
+                        proc.capture.feed(kind, data)
+                        continue
+                    self._selector.unregister(key.fd)
+                    (proc.popen.stdout if kind == 'stdout' else proc.popen.stderr).close()
+                    proc.open_pipes -= 1
+                    self._maybe_done(proc)
+            timeout = self._escalate()
+
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+def get_supervisor():
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = Supervisor()
+            # Tools run in their own sessions, so Ctrl+C on the terminal does not reach them
+            atexit.register(_supervisor.shutdown)
+        return _supervisor
+
+def run_tool(argv, **kwargs):
+    """Runs a tool under the process-wide supervisor (see Supervisor.run)."""
+    return get_supervisor().run(argv, **kwargs)
+
+def terminate_unit(tag):
+    return get_supervisor().terminate_unit(tag)
+
+def cancelled():
+    """True once the module running on this thread was skipped or quit."""
+    return get_supervisor().cancelled()
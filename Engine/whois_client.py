@@ -0,0 +1,241 @@
+# KESTREL/Engine/whois_client.py
+# Description: In-process whois client (TCP/43) with referral following and batch-wide memoization.
+
+import ipaddress
+import os
+import re
+import socket
+import threading
+from .supervisor import cancelled
+from config import WHOIS_SERVER, WHOIS_TIMEOUT, WHOIS_MAX_PER_SERVER, WHOIS_MAX_REFERRALS
+
+PSL_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "Resources", "public_suffix_list.dat")
+
+# Lines pointing at the next server: IANA 'refer:'/'whois:', the registry's
+# 'Registrar WHOIS Server:' and ARIN's 'ReferralServer: whois://host'
+_REFERRAL_RE = re.compile(
+    r"^[ \t]*(?:refer|whois|Registrar WHOIS Server|ReferralServer)[ \t]*:[ \t]*(\S+)[ \t]*$",
+    re.IGNORECASE | re.MULTILINE)
+
+
+class WhoisError(Exception):
+    """Raised when the first whois server in a chain cannot be queried."""
+
+
+class WhoisCancelled(WhoisError):
+    """Raised when the module asking for a lookup is skipped or quit; never memoized."""
+
+
+class PublicSuffixIndex:
+    """
+    Public suffix rules (normal, '*.' wildcard and '!' exception) from the
+    bundled Resources/public_suffix_list.dat. Only the ICANN section is used:
+    whois is answered for the registered domain, not for e.g. 'user.github.io'.
+    """
+    def __init__(self, path=PSL_FILE):
+        self.rules = set()
+        self.wildcards = set()
+        self.exceptions = set()
+        in_icann = False
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if "===BEGIN ICANN DOMAINS===" in line:
+                    in_icann = True
+                elif "===END ICANN DOMAINS===" in line:
+                    break
+                if not in_icann or not line or line.startswith('//'):
+                    continue
+                rule = self._ascii(line.split()[0])
+                if rule.startswith('!'):
+                    self.exceptions.add(rule[1:])
+                elif rule.startswith('*.'):
+                    self.wildcards.add(rule[2:])
+                else:
+                    self.rules.add(rule)
+
+    @staticmethod
+    def _ascii(rule):
+        try:
+            return rule.encode('idna').decode('ascii').lower()
+        except UnicodeError:
+            return rule.lower()
+
+    def public_suffix(self, name):
+        """Longest public suffix of name (a bare TLD when no rule matches)."""
+        labels = name.lower().rstrip('.').split('.')
+        for i in range(len(labels)):
+            candidate = ".".join(labels[i:])
+            if candidate in self.exceptions:
+                return ".".join(labels[i + 1:])
+            if candidate in self.rules or ".".join(labels[i + 1:]) in self.wildcards:
+                return candidate
+        return labels[-1]
+
+    def registrable_domain(self, name):
+        """'a.b.example.co.uk' -> 'example.co.uk'; None when name is itself a public suffix."""
+        name = name.lower().rstrip('.')
+        suffix = self.public_suffix(name)
+        if name == suffix:
+            return None
+        return ".".join(name.split('.')[-(suffix.count('.') + 2):])
+
+
+def parse_server(spec):
+    """'whois.example.net', 'host:4343' or 'whois://host' -> (host, port)."""
+    spec = spec.strip()
+    if '://' in spec:
+        spec = spec.split('://', 1)[1]
+    spec = spec.rstrip('/')
+    host, _, port = spec.partition(':')
+    return host.lower(), int(port) if port.isdigit() else 43
+
+
+class WhoisClient:
+    """
+    Resolves whois answers by following IANA -> registry -> registrar
+    referrals. Targets are collapsed to their registrable domain and every
+    answer is memoized for the life of the client, so a batch of fifty
+    subdomains of one apex sends one query chain. Concurrent lookups of the
+    same domain wait for the first one, and each whois server gets at most
+    max_per_server connections at a time.
+    """
+    def __init__(self, root_server="whois.iana.org", timeout=10.0, max_per_server=2,
+                 max_referrals=2, suffixes=None):
+        self.root_server = root_server
+        self.timeout = timeout
+        self.max_per_server = max(1, max_per_server)
+        self.max_referrals = max_referrals
+        self.suffixes = suffixes or PublicSuffixIndex()
+        self._lock = threading.Lock()
+        self._server_slots = {}   # server -> BoundedSemaphore
+        self._tld_servers = {}    # tld -> registry whois server
+        self._answers = {}        # key -> answer text or WhoisError
+        self._inflight = {}       # key -> Event set when the answer is stored
+
+    def _slots(self, server):
+        with self._lock:
+            if server not in self._server_slots:
+                self._server_slots[server] = threading.BoundedSemaphore(self.max_per_server)
+            return self._server_slots[server]
+
+    def query_server(self, server, query):
+        """One RFC 3912 exchange: send the query line, read until the server closes."""
+        host, port = parse_server(server)
+        with self._slots(f"{host}:{port}"):
+            with socket.create_connection((host, port), timeout=self.timeout) as sock:
+                sock.sendall(query.encode('utf-8') + b"\r\n")
+                chunks = []
+                while True:
+                    data = sock.recv(65536)
+                    if not data:
+                        break
+                    chunks.append(data)
+        return b"".join(chunks).decode('utf-8', errors='replace')
+
+    @staticmethod
+    def referral(text):
+        """The next whois server named in an answer, or None."""
+        for match in _REFERRAL_RE.finditer(text):
+            value = match.group(1)
+            # Some registries print a web URL here (and ARIN may point at rwhois); only whois servers are followed
+            if value.lower().startswith(('http://', 'https://', 'rwhois://')):
+                continue
+            return value
+        return None
+
+    def registry_server(self, tld):
+        """Whois server of a TLD as published by IANA (memoized)."""
+        with self._lock:
+            if tld in self._tld_servers:
+                return self._tld_servers[tld]
+        server = self.referral(self.query_server(self.root_server, tld)) or self.root_server
+        with self._lock:
+            self._tld_servers[tld] = server
+        return server
+
+    def lookup_key(self, target):
+        """What a target is looked up as: the IP itself or its registrable domain."""
+        target = target.strip().lower().rstrip('.')
+        try:
+            return str(ipaddress.ip_address(target))
+        except ValueError:
+            return self.suffixes.registrable_domain(target) or target
+
+    def lookup(self, target):
+        """
+        Returns (key, answer text) for a domain or IP. Raises WhoisError when
+        no server answered; failures are memoized too so a batch does not
+        keep hammering a server that refused it.
+        """
+        key = self.lookup_key(target)
+        while True:
+            with self._lock:
+                if key in self._answers:
+                    break
+                event = self._inflight.get(key)
+                owner = event is None
+                if owner:
+                    event = self._inflight[key] = threading.Event()
+            if not owner:
+                # Wait for the other lookup; if it was cancelled, take over
+                event.wait()
+                continue
+            try:
+                answer = self._resolve(key)
+            except WhoisCancelled:
+                with self._lock:
+                    del self._inflight[key]
+                event.set()
+                raise
+            except Exception as e:
+                answer = WhoisError(f"whois lookup for {key} failed: {e}")
+            with self._lock:
+                self._answers[key] = answer
+            event.set()
+            break
+        answer = self._answers[key]
+        if isinstance(answer, WhoisError):
+            raise answer
+        return key, answer
+
+    def _resolve(self, key):
+        try:
+            ipaddress.ip_address(key)
+            server = self.root_server
+        except ValueError:
+            server = self.registry_server(key.rsplit('.', 1)[-1])
+        sections = []
+        visited = set()
+        for _ in range(self.max_referrals + 1):
+            if cancelled():
+                raise WhoisCancelled(f"whois lookup for {key} was cancelled")
+            visited.add(parse_server(server))
+            try:
+                text = self.query_server(server, key)
+            except OSError as e:
+                if not sections:
+                    raise WhoisError(f"{server}: {e}")
+                sections.append(f"% Referral to {server} failed: {e}\n")
+                break
+            sections.append(f"% Answer from {server}\n{text.strip()}\n")
+            next_server = self.referral(text)
+            if not next_server or parse_server(next_server) in visited:
+                break
+            server = next_server
+        return "\n".join(sections)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """The process-wide client configured from config.py (shared by every target of a batch)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = WhoisClient(root_server=WHOIS_SERVER, timeout=WHOIS_TIMEOUT,
+                                  max_per_server=WHOIS_MAX_PER_SERVER,
+                                  max_referrals=WHOIS_MAX_REFERRALS)
+        return _client
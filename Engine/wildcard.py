@@ -0,0 +1,114 @@
+# KESTREL/Engine/wildcard.py
+# Description: Detects wildcard DNS zones and prunes names that only hit the catch-all answer.
+
+import asyncio
+import json
+import os
+import random
+import string
+from .dns_resolver import DNSError
+from .supervisor import cancelled
+from config import WILDCARD_FILTER, WILDCARD_PROBES
+
+WILDCARD_FILE = "wildcards.json"
+
+
+def _random_label(length=12):
+    return "".join(random.choice(string.ascii_lowercase + string.digits) for _ in range(length))
+
+
+class WildcardDetector:
+    """
+    Resolves random labels under each parent zone of the discovered names and
+    caches the zone's catch-all answer set (IPs and CNAME targets). A name is
+    pruned when its addresses all fall inside the answer set of one of its
+    parent zones. The cache lives on the object so streaming batches share it.
+    """
+    def __init__(self, apex=None, probes=3):
+        self.apex = apex
+        self.probes = max(1, probes)
+        self.zones = {}     # zone -> {'ips': set, 'cnames': set} ({} sets when not a wildcard)
+        self.pruned = 0
+        self._pending = {}  # zone -> task, for the event loop currently running
+
+    def _parent_zones(self, host):
+        """Parent zones of host, nearest first, never above the apex."""
+        labels = host.split('.')
+        zones = []
+        for i in range(1, len(labels) - 1):
+            zone = ".".join(labels[i:])
+            zones.append(zone)
+            if self.apex and zone == self.apex:
+                break
+        if self.apex:
+            zones = [z for z in zones if z == self.apex or z.endswith('.' + self.apex)]
+        return zones
+
+    async def _probe_zone(self, zone, resolver):
+        answers = {'ips': set(), 'cnames': set()}
+        for _ in range(self.probes):
+            if cancelled():
+                # A cut-short probe is not cached as the zone's answer set
+                return answers
+            name = f"{_random_label()}.{zone}"
+            for rtype in ('A', 'AAAA'):
+                try:
+                    response = await resolver.query(name, rtype)
+                except DNSError:
+                    continue
+                for _owner, _ttl, rr_type, rdata in response['answers']:
+                    if rr_type in ('A', 'AAAA'):
+                        answers['ips'].add(rdata)
+                    elif rr_type == 'CNAME':
+                        answers['cnames'].add(rdata.rstrip('.'))
+        self.zones[zone] = answers
+        return answers
+
+    async def zone_answers(self, zone, resolver):
+        """Catch-all answers for a zone (empty sets when it has no wildcard)."""
+        if zone in self.zones:
+            return self.zones[zone]
+        task = self._pending.get(zone)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(self._probe_zone(zone, resolver))
+            self._pending[zone] = task
+        return await task
+
+    async def match(self, record, resolver):
+        """Returns the wildcard zone a resolved record falls under, or None."""
+        host = record['host']
+        if self.apex and host == self.apex:
+            return None
+        ips = set(record['a']) | set(record['aaaa'])
+        cnames = set(record['cname'])
+        for zone in self._parent_zones(host):
+            answers = await self.zone_answers(zone, resolver)
+            if not answers['ips'] and not answers['cnames']:
+                continue
+            if ips and ips <= answers['ips']:
+                return zone
+            if cnames and cnames & answers['cnames']:
+                return zone
+        return None
+
+    def wildcard_zones(self):
+        return {zone: sorted(a['ips'] | a['cnames']) for zone, a in self.zones.items()
+                if a['ips'] or a['cnames']}
+
+    def save(self, logs_dir):
+        """Writes the zone summary next to the pruned names list (Logs/wildcards.json)."""
+        summary = {
+            'zones': self.wildcard_zones(),
+            'pruned_count': self.pruned,
+            'pruned_file': "wildcard_pruned.txt",
+        }
+        with open(os.path.join(logs_dir, WILDCARD_FILE), 'w') as f:
+            json.dump(summary, f, indent=4)
+        return summary
+
+
+def make_detector(apex=None):
+    """WildcardDetector configured from config.py, or None when filtering is off."""
+    if not WILDCARD_FILTER:
+        return None
+    return WildcardDetector(apex=apex, probes=WILDCARD_PROBES)
@@ -1,23 +1,30 @@
 # KESTREL/Modules/amass.py
 # Amass module execution
-import subprocess
 import os
 import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from Engine.logger import info, error
+from Engine.stream import run_and_publish
+from Engine.supervisor import run_tool
 
-def run(target, output_dir):
-    """Run the amass tool on the target."""
+def run(target, output_dir, bus=None):
+    """Run the amass tool on the target.
+
+    With a streaming bus, every name is published as amass prints it.
+    """
     try:
         log_file = f"{output_dir}/Logs/amass.txt"
         
        
-        command = f"amass enum -d {target} -o {log_file}"
-        info(f"Running: {command}")
+        command = ["amass", "enum", "-d", target, "-o", log_file]
+        info(f"Running: {' '.join(command)}")
         
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
+        if bus is not None:
+            result = run_and_publish(command, bus)
+        else:
+            result = run_tool(command)
 
         if result.returncode == 0:
             if os.path.exists(log_file) and os.path.getsize(log_file) > 0:
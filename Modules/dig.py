@@ -1,11 +1,17 @@
 # KESTREL/Modules/dig.py
-# Description: Performs DNS reconnaissance using dig (A, MX, NS, TXT, SOA).
+# Description: Performs DNS reconnaissance (A, AAAA, MX, NS, TXT, SOA) with the
+# built-in async resolver, or with dig when DNS_ENGINE = 'dig'.
 
-import subprocess
+import asyncio
 import os
 import shutil
 import json
 from Engine.logger import info, success, error, warning
+from Engine.dns_resolver import make_resolver
+from Engine.supervisor import run_tool, cancelled
+from config import DNS_ENGINE
+
+RECORD_TYPES = ['A', 'AAAA', 'MX', 'NS', 'TXT', 'SOA']
 
 def check_dig():
     """Check if dig is installed."""
@@ -48,12 +54,58 @@ def parse_dig_output(raw_output):
 
     return records
 
+def query_native(target, record_types=RECORD_TYPES):
+    """
+    Resolves every record type concurrently with the built-in resolver and
+    returns the text dig would print for them ('+noall +answer' sections).
+    """
+    async def _resolve():
+        resolver = make_resolver()
+        try:
+            return await resolver.resolve(target, record_types)
+        finally:
+            resolver.close()
+
+    responses = asyncio.run(_resolve())
+    full_output = ""
+    for rtype in record_types:
+        response = responses.get(rtype)
+        if response is None:
+            error(f"DNS query failed for {rtype} (no resolver answered)")
+            continue
+        lines = [f"{name}\t{ttl}\tIN\t{rr_type}\t{rdata}" for name, ttl, rr_type, rdata in response['answers']]
+        if lines:
+            full_output += f";; TYPE: {rtype}\n" + "\n".join(lines) + "\n\n"
+        else:
+            full_output += f";; TYPE: {rtype}\n; No records found\n\n"
+    return full_output
+
+def query_dig(target, record_types=RECORD_TYPES):
+    """Runs one dig process per record type and returns the combined output."""
+    full_output = ""
+    for rtype in record_types:
+        cmd = ["dig", target, rtype, "+noall", "+answer"]
+        info(f"Querying {rtype} records...")
+
+        result = run_tool(cmd, keep_stdout=True)
+
+        if result.returncode == 0:
+            output = result.stdout
+            if output.strip():
+                 full_output += f";; TYPE: {rtype}\n{output}\n"
+            else:
+                 full_output += f";; TYPE: {rtype}\n; No records found\n\n"
+        else:
+            error(f"Dig failed for {rtype}: {result.stderr}")
+    return full_output
+
 def run(target, output_dir):
-    """Run dig queries against the target."""
+    """Run DNS queries against the target."""
     
     info(f"--- Executing module: Dig (DNS Recon) ---")
 
-    if not check_dig():
+    use_native = DNS_ENGINE == 'native'
+    if not use_native and not check_dig():
         error("Dig is not installed or not found in PATH.")
         return False
 
@@ -65,25 +117,16 @@ def run(target, output_dir):
 
     try:
         # Perform queries for multiple record types
-        record_types = ['A', 'AAAA', 'MX', 'NS', 'TXT', 'SOA']
-        full_output = ""
-        
-        for rtype in record_types:
-            cmd = ["dig", target, rtype, "+noall", "+answer"]
-            info(f"Querying {rtype} records...")
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                output = result.stdout
-                if output.strip():
-                     full_output += f";; TYPE: {rtype}\n{output}\n"
-                else:
-                     full_output += f";; TYPE: {rtype}\n; No records found\n\n"
-            else:
-                error(f"Dig failed for {rtype}: {result.stderr}")
+        if use_native:
+            info(f"Querying {', '.join(RECORD_TYPES)} records with the built-in resolver...")
+            full_output = query_native(target)
+        else:
+            full_output = query_dig(target)
+        if cancelled():
+            # Skipped or quit mid-query: don't save a partial answer set
+            return False
 
-        # Save raw output
+        # Save raw output (same layout as dig's, so parse_dig_output reads both)
         with open(dig_log, "w") as f:
             f.write(full_output)
         
@@ -1,5 +1,5 @@
 # KESTREL/Modules/httpx_toolkit.py
-# Description: HTTPX module execution (using httpx-toolkit).
+# Description: HTTPX module execution (httpx-toolkit, or the built-in prober when HTTP_ENGINE = 'native').
 
 import subprocess
 import os
@@ -9,31 +9,246 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from Engine.logger import info, success, error, warning
+from Engine.subdomains import normalise_name, is_domain_target, in_scope
+from Engine.resolution import resolve_to_files, RESOLVED_FILE, RESOLVED_NAMES_FILE, PRUNED_FILE
+from Engine.wildcard import make_detector
+from Engine.supervisor import run_tool, cancelled
+from Engine.alive import AliveDigest, digest_alive, ALIVE_TXT
+from Engine.http_probe import probe_to_file
+from Engine.httpx_chunks import run_chunked, StreamLedger, CHUNKS_DIR
+from config import (STREAM_BATCH_SIZE, STREAM_BATCH_WAIT, RESOLVE_WORKERS, HTTP_ENGINE, HTTPX_CHUNK_SIZE,
+                    HTTPX_CHUNK_TIMEOUT, HTTPX_CHUNK_RETRIES, HTTPX_EXTRA_FLAGS)
 
-def extract_urls_from_json(json_file, output_file):
-    """Extract clean URLs from httpx JSON output using jq and sed."""
+def extract_hostnames(logs_dir):
+    """Digests alive.json into alive.txt (unique hostnames) and services.jsonl in one pass."""
     try:
-        command = f"jq -r '.url' {json_file} | sed -E 's#(https?://)?([^/]+).*#\\2#' | sort -u > {output_file}"
-        info(f"Extracting unique hostnames from JSON output...")
-        
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        if result.returncode == 0:
-            with open(output_file, 'r') as f:
-                url_count = len(f.readlines())
-            success(f"Extracted {url_count} unique hostnames to: {os.path.basename(output_file)}")
-            return True
-        else:
-            error(f"URL extraction failed: {result.stderr.strip()}")
+        info("Extracting unique hostnames from JSON output...")
+        count = digest_alive(logs_dir)
+        success(f"Extracted {count} unique hostnames to: {ALIVE_TXT}")
+        return True
+    except Exception as e:
+        error(f"Error extracting URLs from JSON: {e}")
+        return False
+
+def run_streaming(scope, output_dir, bus):
+    """
+    Probe subdomains from the streaming bus in micro-batches while enumeration
+    is still running. Each batch is resolved first (dead names and wildcard
+    catch-all matches are dropped, the rest appended to the resolved.jsonl
+    mapping), then probed; results are
+    appended to alive.json and alive.txt is refreshed, so live hosts show up
+    long before Amass finishes. Finished batches are recorded (StreamLedger),
+    so a resumed run keeps their results and skips their names.
+    """
+    logs_dir = os.path.join(output_dir, "Logs")
+    json_output = os.path.join(logs_dir, "alive.json")
+    batch_input = os.path.join(logs_dir, "httpx_batch.txt")
+    batch_output = os.path.join(logs_dir, "httpx_batch.json")
+    apex = normalise_name(scope) if is_domain_target(scope) else None
+    # One detector for the whole stream so each zone is probed only once
+    detector = make_detector(apex)
+    probed_batches = 0
+    failed_batches = 0
+    # Reads each line of alive.json once, however many batches append to it
+    digest = AliveDigest(logs_dir)
+
+    info("Streaming mode: probing subdomains as enumeration finds them...")
+    ledger = StreamLedger(logs_dir, scope, [json_output, os.path.join(logs_dir, RESOLVED_FILE),
+                                            os.path.join(logs_dir, RESOLVED_NAMES_FILE),
+                                            os.path.join(logs_dir, PRUNED_FILE)])
+    seen = ledger.open()
+    if seen:
+        info(f"Resuming HTTPX: {len(seen)} names were already handled by earlier batches.")
+        digest.update()
+    try:
+        for batch in bus.batches(STREAM_BATCH_SIZE, STREAM_BATCH_WAIT):
+            if cancelled():
+                # Skipped or quit: the runtime has closed the bus, stop probing what is left
+                break
+            names = []
+            for line in batch:
+                name = normalise_name(line)
+                if not name or name in seen or (apex and not in_scope(name, apex)):
+                    continue
+                seen.add(name)
+                names.append(name)
+            if not names:
+                continue
+
+            # Resolve the batch; only names with A/AAAA records are probed
+            resolved_names = os.path.join(logs_dir, RESOLVED_NAMES_FILE)
+            already_resolved = os.path.getsize(resolved_names)
+            stats = resolve_to_files(names, logs_dir, mode='a', workers=RESOLVE_WORKERS, detector=detector)
+            if stats['dropped']:
+                info(f"Dropped {stats['dropped']} names that do not resolve.")
+            if stats['unresolved']:
+                info(f"Kept {stats['unresolved']} names whose DNS queries failed; probing them anyway.")
+            if stats['pruned']:
+                info(f"Pruned {stats['pruned']} names that only hit wildcard DNS.")
+            if not stats['resolved'] and not stats['unresolved']:
+                ledger.commit(names)
+                continue
+            with open(resolved_names, 'r') as src, open(batch_input, 'w') as f:
+                src.seek(already_resolved)
+                for line in src:
+                    f.write(line)
+            if HTTP_ENGINE == 'native':
+                # Records go straight into alive.json as each name answers
+                info(f"Probing {stats['resolved'] + stats['unresolved']} new names ({len(seen)} seen so far)...")
+                with open(batch_input, 'r') as names_file:
+                    live = probe_to_file(names_file, json_output)['live']
+                if cancelled():
+                    # Cut short: the batch is probed again on --resume
+                    break
+                ledger.commit(names)
+                probed_batches += 1
+                if live:
+                    success(f"{live} live hosts in this batch.")
+                    digest.update()
+                continue
+            command = ["httpx-toolkit", "-json", *HTTPX_EXTRA_FLAGS, "-o", batch_output]
+            info(f"Probing {stats['resolved'] + stats['unresolved']} new names ({len(seen)} seen so far)...")
+            # Same timeout and retries as a chunk of a host list (see Engine/httpx_chunks.py)
+            error_text = None
+            for attempt in range(HTTPX_CHUNK_RETRIES + 1):
+                if cancelled():
+                    break
+                if attempt:
+                    warning(f"HTTPX batch failed ({error_text}); retrying, attempt {attempt + 1}...")
+                if os.path.exists(batch_output):
+                    os.remove(batch_output)
+                try:
+                    result = run_tool(command, stdin=batch_input, timeout=HTTPX_CHUNK_TIMEOUT)
+                except subprocess.TimeoutExpired:
+                    error_text = f"timed out after {HTTPX_CHUNK_TIMEOUT} seconds"
+                    continue
+                if result.returncode == 0:
+                    error_text = None
+                    break
+                error_text = result.stderr.strip()[-300:] or f"exit code {result.returncode}"
+            if cancelled():
+                break
+            if error_text:
+                error(f"HTTPX batch gave up: {error_text}. Continuing with the next batch.")
+                # Not recorded: its resolution lines are dropped and --resume probes it again
+                ledger.rollback()
+                seen.difference_update(names)
+                failed_batches += 1
+                continue
+
+            live = 0
+            if os.path.exists(batch_output):
+                with open(batch_output, 'r') as src, open(json_output, 'a') as dst:
+                    for line in src:
+                        dst.write(line)
+                        live += 1
+            ledger.commit(names)
+            probed_batches += 1
+            if live:
+                success(f"{live} live hosts in this batch.")
+                digest.update()
+    finally:
+        for path in (batch_input, batch_output):
+            if os.path.exists(path):
+                os.remove(path)
+
+    if failed_batches:
+        error(f"{failed_batches} HTTPX batches gave up; --resume probes them again.")
+    if os.path.getsize(json_output) == 0:
+        warning(f"HTTPX probed {len(seen)} names in {probed_batches} batches but found no live hosts.")
+        return not failed_batches
+    success(f"HTTPX JSON results saved to: {os.path.basename(json_output)}")
+    try:
+        count = digest.update(final=True)
+    except Exception as e:
+        error(f"Error extracting URLs from JSON: {e}")
+        return False
+    success(f"Extracted {count} unique hostnames to: {ALIVE_TXT}")
+    return not failed_batches
+
+def run_native(target, json_output):
+    """
+    Probe the target (or the '@file' list) with the built-in prober. Every
+    live URL is appended to alive.json as it answers, so there is no overall
+    timeout and a skip keeps what was found.
+    """
+    if target.startswith('@'):
+        input_file = target[1:]
+        if not os.path.exists(input_file) or os.path.getsize(input_file) == 0:
+            error(f"Input file not found or is empty: {input_file}. Skipping HTTPX.")
             return False
+        info(f"Probing the hosts in {input_file} with the built-in prober...")
+        with open(input_file, 'r') as f:
+            stats = probe_to_file(f, json_output, mode='w')
+    else:
+        info(f"Probing {target} with the built-in prober...")
+        stats = probe_to_file([target], json_output, mode='w')
+
+    if not stats['live']:
+        warning(f"HTTPX probed {stats['probed']} hosts but found no live hosts.")
+        return True
+    success(f"HTTPX JSON results saved to: {os.path.basename(json_output)} ({stats['live']} live URLs)")
+    if extract_hostnames(os.path.dirname(json_output)):
+        info("Clean hostnames for other tools are available in alive.txt.")
+        return True
+    error("HTTPX succeeded but hostname extraction failed.")
+    return False
+
+def run_file(input_file, json_output):
+    """
+    Probe a host list with httpx-toolkit in resumable chunks (see
+    Engine/httpx_chunks.py); alive.txt is refreshed after every chunk.
+    Fails when any chunk gave up, so a resumed run probes it again.
+    """
+    logs_dir = os.path.dirname(json_output)
+    digest = AliveDigest(logs_dir)
+    info(f"Running: httpx-toolkit -json {' '.join(HTTPX_EXTRA_FLAGS)} < {input_file} "
+         f"(in chunks of {HTTPX_CHUNK_SIZE} hosts)")
+    done, failed = run_chunked(input_file, json_output, on_chunk=digest.update)
+    if not done:
+        if not cancelled():
+            error("HTTPX failed on every chunk.")
+        return False
+    if failed:
+        error(f"HTTPX gave up on {failed} of {done + failed} chunks; their hosts are in {CHUNKS_DIR}/ "
+              f"and are probed again when the run is resumed.")
+
+    if os.path.getsize(json_output) == 0:
+        if not failed:
+            warning("HTTPX ran successfully but found no live hosts.")
+        return not failed # No results alone is not a failure
+    success(f"HTTPX JSON results saved to: {os.path.basename(json_output)}")
+    try:
+        count = digest.update(final=True)
     except Exception as e:
         error(f"Error extracting URLs from JSON: {e}")
         return False
+    success(f"Extracted {count} unique hostnames to: {ALIVE_TXT}")
+    info("Clean hostnames for other tools are available in alive.txt.")
+    return not failed
+
+def run(target, output_dir, bus=None, scope=None):
+    """Run the httpx-toolkit on the target and extract clean hostnames.
+
+    With a streaming bus the names come from the enumeration modules while
+    they run (see run_streaming); 'scope' is then the original target.
+    With HTTP_ENGINE = 'native' the built-in prober replaces httpx-toolkit.
+    """
+    if bus is not None:
+        try:
+            return run_streaming(scope or target, output_dir, bus)
+        except Exception as e:
+            error(f"An error occurred while executing httpx-toolkit: {e}")
+            return False
 
-def run(target, output_dir):
-    """Run the httpx-toolkit on the target and extract clean hostnames."""
     json_output = os.path.join(output_dir, "Logs", "alive.json")
-    txt_output = os.path.join(output_dir, "Logs", "alive.txt")
-    command = ""
+    if HTTP_ENGINE == 'native':
+        try:
+            return run_native(target, json_output)
+        except Exception as e:
+            error(f"An error occurred while probing with the built-in prober: {e}")
+            return False
+    command = ["httpx-toolkit", "-json", *HTTPX_EXTRA_FLAGS, "-o", json_output]
 
     try:
         # --- CHANGE START: Logic to handle different input types ---
@@ -43,15 +258,11 @@ def run(target, output_dir):
             if not os.path.exists(input_file) or os.path.getsize(input_file) == 0:
                 error(f"Input file not found or is empty: {input_file}. Skipping HTTPX.")
                 return False
-            command = f"cat {input_file} | httpx-toolkit -json -o {json_output}"
+            return run_file(input_file, json_output)
         else:
             # Input is a single domain/IP
-            command = f"echo {target} | httpx-toolkit -json -o {json_output}"
-       
-
-        info(f"Running: {command}")
-        # Using a longer timeout for potentially large lists
-        result = subprocess.run(command, shell=True, capture_output=True, text=True, timeout=300)
+            info(f"Running: {' '.join(command)} <<< {target}")
+            result = run_tool(command, input=f"{target}\n", timeout=300)
 
         if result.returncode == 0:
             if not os.path.exists(json_output) or os.path.getsize(json_output) == 0:
@@ -60,7 +271,7 @@ def run(target, output_dir):
             
             success(f"HTTPX JSON results saved to: {os.path.basename(json_output)}")
             
-            if extract_urls_from_json(json_output, txt_output):
+            if extract_hostnames(os.path.join(output_dir, "Logs")):
                 info("Clean hostnames for other tools are available in alive.txt.")
                 return True
             else:
@@ -0,0 +1,51 @@
+# KESTREL/Modules/merge_subs.py
+# Description: Merges the subdomain tool outputs into Logs/merged_subs.txt for live probing.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Engine.logger import info, success, warning, error
+from Engine.subdomains import merge_name_streams, is_domain_target, normalise_name
+from config import SUBDOMAIN_SOURCES
+
+def run(target, output_dir):
+    """Stream every subdomain source once, normalise, scope-filter and dedupe it."""
+    logs_dir = os.path.join(output_dir, "Logs")
+    merged_file = os.path.join(logs_dir, "merged_subs.txt")
+    os.makedirs(logs_dir, exist_ok=True)
+
+    sources = [os.path.join(logs_dir, name) for name in SUBDOMAIN_SOURCES]
+    sources = [path for path in sources if os.path.exists(path)]
+    if sources:
+        info(f"Merging subdomains from: {', '.join(os.path.basename(p) for p in sources)}")
+    else:
+        warning("No subdomain source files found. Probing the target itself.")
+
+    # The target itself is always probed, like the old bare-target HTTPX run.
+    # IPs and CIDR ranges are passed through untouched and not used as a scope.
+    apex = normalise_name(target) if is_domain_target(target) else None
+    streams = [[apex]] if apex else []
+    handles = []
+    try:
+        for path in sources:
+            handle = open(path, 'r', encoding='utf-8', errors='ignore')
+            handles.append(handle)
+            streams.append(handle)
+        stats = merge_name_streams(streams, merged_file, apex=apex)
+    except Exception as e:
+        error(f"Subdomain merge failed: {e}")
+        return False
+    finally:
+        for handle in handles:
+            handle.close()
+    if not apex:
+        with open(merged_file, 'a') as f:
+            f.write(target + "\n")
+        stats['written'] += 1
+
+    success(f"Merged {stats['written']} unique names into {os.path.basename(merged_file)} "
+            f"({stats['read']} read, {stats['duplicates']} duplicates, "
+            f"{stats['out_of_scope']} out of scope, {stats['invalid']} invalid).")
+    return True
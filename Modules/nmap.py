@@ -2,15 +2,37 @@
 # Nmap module execution with integrated submenu and auto mode support
 
 import subprocess
+import json
 import os
 import sys
+import time
 
 # Add the parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from Engine.logger import info, error, success
+from Engine.logger import info, error, success, warning
 from Engine.input_utils import get_input, clear_input_buffer
 from Engine.report import generate_report
+from Engine.nmap_shards import (run_nmap, run_sharded, run_shards, read_hosts, split_hosts, write_empty,
+                                merge_xml, merge_normal)
+from Engine.portscan import sweep, top_ports
+from Engine.scan_plan import plan_scan, scan_addresses, SCAN_PLAN_FILE, SCAN_TARGETS_FILE
+from Engine.host_cache import CACHE_TOOL, cached_hosts, store_hosts, add_cached_hosts
+from Engine.cache import get_cache
+from Engine.supervisor import cancelled
+from config import NMAP_SHARDS, PORT_DISCOVERY, DISCOVERY_MAX_OPEN_PORTS, NMAP_DEDUPE_IPS, CDN_PORTS
+
+DISCOVERY_FILE = "nmap_discovery.json"
+# Scan of the downgraded CDN addresses, merged into the main output and removed
+EDGE_SCAN_FILES = ("cdn_scan.txt", "cdn_scan.xml")
+
+# Scan types that run in two phases when PORT_DISCOVERY is on:
+# (ports swept by the built-in scanner: top N or None for 1-65535, nmap options for the open ports)
+DISCOVERY_PROFILES = {
+    'quick': (1000, ["-sS", "-sV", "-O"]),
+    'full': (None, ["-sS", "-sV", "-O"]),
+    'fast': (1000, ["-A"]),
+}
 
 def nmap_submenu(input_func=None):
     """
@@ -68,7 +90,122 @@ def _ensure_logs_dir(output_dir):
     os.makedirs(logs_dir, exist_ok=True)
     return logs_dir
 
-def run(target, output_dir, runtime_control=None, is_auto_mode=False):
+def _maybe_report(target, output_dir, nmap_report_enabled):
+    """Generates the HTML report when the user asked for one."""
+    if nmap_report_enabled:
+        info("Generating HTML report...")
+        # We pass "5" because that's the module choice for Nmap from the main menu
+        if generate_report(target, output_dir, "5"):
+            success("HTML report generation successful.")
+        else:
+            error("Failed to generate HTML report.")
+    else:
+        info("Nmap scan completed without report generation.")
+
+def _discovery_ports(scan_type):
+    """
+    The ports phase 1 sweeps for scan_type, or None when the scan runs in
+    one phase (PORT_DISCOVERY off, UDP, or no nmap-services to rank ports).
+    """
+    if not PORT_DISCOVERY or scan_type not in DISCOVERY_PROFILES:
+        return None
+    count = DISCOVERY_PROFILES[scan_type][0]
+    ports = list(range(1, 65536)) if count is None else top_ports(count)
+    if not ports:
+        warning("nmap-services not found (see NMAP_SERVICES_FILE); running the one-phase scan.")
+        return None
+    return ports
+
+def _port_ranges(ports):
+    """Sorted ports as nmap's -p list with consecutive runs collapsed: [1, 2, 3, 3306] -> '1-3,3306'."""
+    ranges = []
+    for port in sorted(set(ports)):
+        if ranges and port == ranges[-1][1] + 1:
+            ranges[-1][1] = port
+        else:
+            ranges.append([port, port])
+    return ",".join(str(low) if low == high else f"{low}-{high}" for low, high in ranges)
+
+def _two_phase_scan(scan_type, ports, hosts, logs_dir, out_n, out_x):
+    """
+    Phase 1 sweeps 'ports' with the built-in connect scanner; phase 2 runs
+    nmap with the profile's detection options on exactly the ports found
+    open, one nmap run per group of hosts with the same open ports. Hosts
+    with more than DISCOVERY_MAX_OPEN_PORTS open are scanned on the
+    profile's normal port range instead.
+    Returns the swept hosts that have no open port, or None when every
+    nmap run of phase 2 failed.
+    """
+    options = DISCOVERY_PROFILES[scan_type][1]
+    started = time.time()
+    info(f"Phase 1: sweeping {len(ports)} TCP ports on {len(hosts)} host(s)...")
+    open_ports, addresses = sweep(hosts, ports)
+    found = sum(len(p) for p in open_ports.values())
+    with open(os.path.join(logs_dir, DISCOVERY_FILE), 'w') as f:
+        json.dump({'scan_type': scan_type, 'ports_swept': len(ports), 'unresolved': [h for h in hosts if h not in addresses],
+                   'hosts': {h: {'address': addresses[h], 'open_ports': open_ports[h]} for h in open_ports}}, f, indent=4)
+    info(f"Phase 1 found {found} open ports on {sum(1 for p in open_ports.values() if p)} host(s) "
+         f"in {time.time() - started:.1f}s ({len(hosts) - len(addresses)} unresolved).")
+    if cancelled():
+        return []
+
+    groups, suspect = {}, []
+    for host, host_ports in open_ports.items():
+        if len(host_ports) > DISCOVERY_MAX_OPEN_PORTS:
+            suspect.append(host)
+        elif host_ports:
+            groups.setdefault(tuple(host_ports), []).append(host)
+    base = ["nmap", "-T4", "-Pn", *options]
+    if not groups and not suspect:
+        write_empty(out_n, out_x, " ".join(base + ["-oN", out_n, "-oX", out_x]) + " (no open ports)", started)
+        return list(open_ports)
+
+    shards = []
+    for group_ports, group in groups.items():
+        command = base + ["-p", _port_ranges(group_ports)]
+        shards.extend((command, part) for part in split_hosts(group, NMAP_SHARDS))
+    if suspect:
+        count = DISCOVERY_PROFILES[scan_type][0]
+        warning(f"{len(suspect)} host(s) answered on more than {DISCOVERY_MAX_OPEN_PORTS} ports (likely a firewall "
+                f"accepting every connection); scanning them on the profile's normal port range.")
+        command = base + (["-p-"] if count is None else ["--top-ports", str(count)])
+        shards.extend((command, part) for part in split_hosts(suspect, NMAP_SHARDS))
+    info(f"Phase 2: nmap {' '.join(options)} on the open ports only ({len(shards)} nmap run(s))...")
+    done, failed = run_shards(shards, out_n, out_x,
+                              summary=f"{sum(len(g) for g in groups.values()) + len(suspect)} hosts, {found} open ports")
+    if not done:
+        error("Every Nmap run of phase 2 failed.")
+        return None
+    if failed:
+        error(f"{failed} Nmap run(s) of phase 2 failed; results cover the other {done}.")
+    return [host for host, host_ports in open_ports.items() if not host_ports]
+
+def _scan_edge(addresses, logs_dir, out_n, out_x):
+    """
+    Scans CDN / cloud edge addresses on CDN_PORTS only (version detection,
+    no OS probes) and merges the result into out_n / out_x.
+    """
+    command = ["nmap", "-T4", "-Pn", "-sV", "-p", ",".join(str(p) for p in CDN_PORTS)]
+    edge_n, edge_x = (os.path.join(logs_dir, name) for name in EDGE_SCAN_FILES)
+    info(f"Scanning {len(addresses)} CDN IP(s) on ports {','.join(str(p) for p in CDN_PORTS)} only...")
+    done, failed = run_shards([(command, part) for part in split_hosts(addresses, NMAP_SHARDS)], edge_n, edge_x,
+                              summary=f"{len(addresses)} CDN hosts")
+    if failed:
+        error(f"{failed} Nmap run(s) over CDN IPs failed.")
+    if done:
+        stats = merge_xml([out_x, edge_x], out_x)
+        merge_normal([out_n, edge_n], out_n, stats)
+    for path in (edge_n, edge_x):
+        if os.path.exists(path):
+            os.remove(path)
+
+def _finish(scan_type, how, target, output_dir, out_n, nmap_report_enabled):
+    info(f"Nmap {scan_type} scan completed{how}.")
+    info(f"Output: {out_n}")
+    _maybe_report(target, output_dir, nmap_report_enabled)
+    success("Module Nmap completed successfully.")
+
+def run(target, output_dir, runtime_control=None, is_auto_mode=False, scan_type=None, report_enabled=False):
     """Run the nmap tool on the target.
     
     Args:
@@ -76,6 +213,8 @@ def run(target, output_dir, runtime_control=None, is_auto_mode=False):
         output_dir: Directory to save results  
         runtime_control: Runtime control object (optional)
         is_auto_mode: If True, use default settings without prompting (for 'Run All')
+        scan_type: Preset scan type (batch runs ask once for every target)
+        report_enabled: Report preference that goes with a preset scan_type
     """
     info("--- Starting module: Nmap ---")
 
@@ -83,6 +222,8 @@ def run(target, output_dir, runtime_control=None, is_auto_mode=False):
         info("Auto mode: Using default Quick Scan (Option 1)")
         scan_type = 'quick'
         nmap_report_enabled = False
+    elif scan_type:
+        nmap_report_enabled = report_enabled
     else:
         scan_type, nmap_report_enabled = nmap_submenu()
 
@@ -104,7 +245,7 @@ def run(target, output_dir, runtime_control=None, is_auto_mode=False):
 
     if scan_type not in commands:
         error(f"Invalid scan type: {scan_type}")
-        return
+        return False
     
     command = commands.get(scan_type)
     out_n, out_x = out_paths.get(scan_type)
@@ -114,15 +255,112 @@ def run(target, output_dir, runtime_control=None, is_auto_mode=False):
     
     # We create a new list for the command to avoid modifying the template in the dict
     final_command = list(command) 
-    
-    if os.path.exists(alive_file) and os.path.getsize(alive_file) > 0:
-        info(f"Found alive.txt. Scanning multiple targets from list...")
+    hosts = read_hosts(alive_file) if os.path.exists(alive_file) else []
+    hosts_file = alive_file
+
+    plan = None
+    if NMAP_DEDUPE_IPS:
+        # Virtual hosts share addresses: scan every IP once, final.json maps the results back to the names
+        try:
+            plan = plan_scan(hosts or [target], logs_dir)
+        except Exception as e:
+            warning(f"Scan planning failed ({e}); scanning the hosts by name.")
+            plan = None
+        if plan and plan['addresses']:
+            unresolved = f", {len(plan['unresolved'])} without an IPv4 address" if plan['unresolved'] else ""
+            info(f"Scan plan: {plan['hosts']} host name(s) -> {len(plan['addresses'])} unique IP(s)"
+                 f"{unresolved}. See {SCAN_PLAN_FILE}.")
+            hosts = scan_addresses(plan)
+            hosts_file = os.path.join(logs_dir, SCAN_TARGETS_FILE)
+            edge = plan['skipped'] + plan['downgraded']
+            if edge:
+                providers = ", ".join(sorted({plan['providers'][address] for address in edge}))
+                action = "skipped" if plan['skipped'] else f"scanned on ports {','.join(map(str, CDN_PORTS))} only"
+                info(f"{len(edge)} IP(s) belong to a CDN / cloud edge ({providers}) and will be {action}.")
+    planned = bool(plan and plan['addresses'])
+    edge_hosts = plan['downgraded'] if planned else []
+
+    ports = _discovery_ports(scan_type)
+    started = time.time()
+
+    # Other targets (of this batch or an earlier one) may already have scanned some of these IPs
+    profile = hits = None
+    if planned and hosts and get_cache().cacheable(CACHE_TOOL):
+        profile = {'scan_type': scan_type, 'two_phase': ports is not None, 'options': command[2:]}
+        hits, hosts = cached_hosts(hosts, profile)
+        if hits:
+            info(f"Reusing cached Nmap results for {len(hits)} of {len(plan['addresses'])} IP(s); "
+                 f"scanning {len(hosts)}.")
+            with open(hosts_file, 'w') as f:
+                f.writelines(f"{address}\n" for address in hosts)
+
+    def _epilogue(empty=()):
+        """Caches what this run scanned, then adds the CDN scan and the cached hosts to its output."""
+        if cancelled():
+            return
+        # A failed run leaves the previous scan's output behind: neither cache nor extend that
+        fresh = os.path.exists(out_x) and os.path.getmtime(out_x) >= started
+        if planned and not hosts:
+            write_empty(out_n, out_x, " ".join(final_command[:1] + final_command[2:]) + " (no full scan needed)",
+                        started)
+            fresh = True
+        try:
+            if profile is not None and hosts:
+                store_hosts(out_x if fresh else None, profile, hosts, empty)
+            if hits and fresh:
+                add_cached_hosts(out_n, out_x, hits)
+        except Exception as e:
+            warning(f"Nmap result cache: {e}")
+        if edge_hosts and fresh:
+            try:
+                _scan_edge(edge_hosts, logs_dir, out_n, out_x)
+            except Exception as e:
+                error(f"Nmap scan of the CDN IPs failed: {e}")
+
+    if planned and not hosts:
+        _epilogue()
+        _finish(scan_type, " (all IPs cached)" if hits else " (no IP needed a full scan)",
+                target, output_dir, out_n, nmap_report_enabled)
+        return True
+
+    if ports is not None:
+        try:
+            empty = _two_phase_scan(scan_type, ports, hosts or [target], logs_dir, out_n, out_x)
+        except Exception as e:
+            error(f"An error occurred while executing nmap: {e}")
+            return False
+        if empty is None:
+            return False
+        _epilogue(empty)
+        _finish(scan_type, " (two-phase)", target, output_dir, out_n, nmap_report_enabled)
+        return True
+
+    if len(hosts) > 1 and NMAP_SHARDS > 1:
+        # Several nmap processes over slices of the list, merged back into out_n / out_x
+        final_command.remove(target)
+        info(f"Scanning {len(hosts)} hosts in up to {NMAP_SHARDS} parallel shards...")
+        try:
+            done, failed = run_sharded(final_command, hosts, out_n, out_x, NMAP_SHARDS)
+        except Exception as e:
+            error(f"An error occurred while executing nmap: {e}")
+            return False
+        if not done:
+            error("Every Nmap shard failed.")
+            return False
+        if failed:
+            error(f"{failed} Nmap shard(s) failed; results cover the other {done}.")
+        _epilogue()
+        _finish(scan_type, f" ({done} shards merged)", target, output_dir, out_n, nmap_report_enabled)
+        return True
+
+    if hosts:
+        info(f"Scanning {len(hosts)} host(s) from {os.path.basename(hosts_file)}...")
         # Replace the single 'target' argument with input list argument
         # The template is ["nmap", target, ...]. We need to remove 'target' and add '-iL', 'file'
         if target in final_command:
             final_command.remove(target)
         
-        final_command.extend(["-iL", alive_file])
+        final_command.extend(["-iL", hosts_file])
     else:
         info(f"Scanning single target: {target}")
 
@@ -131,29 +369,26 @@ def run(target, output_dir, runtime_control=None, is_auto_mode=False):
     try:
         info(f"Running: {' '.join(final_command)}")
         
-        result = subprocess.run(final_command, capture_output=True, text=True)
+        result = run_nmap(final_command)
 
         if result.returncode == 0:
+            _epilogue()
             info(f"Nmap {scan_type} scan completed.")
             info(f"Output: {out_n}")
-
-            if nmap_report_enabled:
-                info("Generating HTML report...")
-                # We pass "5" because that's the module choice for Nmap from the main menu
-                if generate_report(target, output_dir, "5"):
-                    success("HTML report generation successful.")
-                else:
-                    error("Failed to generate HTML report.")
-            else:
-                info("Nmap scan completed without report generation.")
+            _maybe_report(target, output_dir, nmap_report_enabled)
         else:
             error(f"Nmap failed with return code {result.returncode}: {result.stderr.strip()}")
+            return False
 
     except FileNotFoundError:
         error("Nmap command not found. Please ensure Nmap is installed and in your system's PATH.")
+        return False
     except subprocess.CalledProcessError as e:
         error(f"Nmap failed: {e.stderr.strip()}")
+        return False
     except Exception as e:
         error(f"An error occurred while executing nmap: {e}")
+        return False
 
     success("Module Nmap completed successfully.")
+    return True
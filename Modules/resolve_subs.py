@@ -0,0 +1,72 @@
+# KESTREL/Modules/resolve_subs.py
+# Description: Resolves every merged subdomain and drops dead names before live probing.
+
+import ipaddress
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Engine.logger import info, success, warning, error
+from Engine.resolution import resolve_to_files, RESOLVED_FILE, RESOLVED_NAMES_FILE
+from Engine.subdomains import normalise_name, is_domain_target
+from Engine.wildcard import make_detector, WILDCARD_FILE
+from config import RESOLVE_WORKERS
+
+def _literal_record(entry):
+    """IPs and CIDR ranges need no resolution; returns a mapping record or None."""
+    try:
+        network = ipaddress.ip_network(entry, strict=False)
+    except ValueError:
+        return None
+    record = {'host': entry, 'a': [], 'aaaa': [], 'cname': []}
+    if network.num_addresses == 1:
+        record['a' if network.version == 4 else 'aaaa'].append(str(network.network_address))
+    return record
+
+def run(target, output_dir):
+    """Resolve A/AAAA/CNAME for Logs/merged_subs.txt and write the host->IP mapping."""
+    logs_dir = os.path.join(output_dir, "Logs")
+    merged_file = os.path.join(logs_dir, "merged_subs.txt")
+    if not os.path.exists(merged_file):
+        warning("merged_subs.txt not found. Nothing to resolve.")
+        return True
+
+    literals = []
+    def names():
+        with open(merged_file, 'r') as f:
+            for line in f:
+                entry = line.strip()
+                if not entry:
+                    continue
+                record = _literal_record(entry)
+                if record:
+                    literals.append(record)
+                else:
+                    yield entry
+
+    info(f"Resolving every name in merged_subs.txt ({RESOLVE_WORKERS} workers)...")
+    try:
+        apex = normalise_name(target) if is_domain_target(target) else None
+        detector = make_detector(apex)
+        stats = resolve_to_files(names(), logs_dir, workers=RESOLVE_WORKERS, detector=detector)
+        if literals:
+            with open(os.path.join(logs_dir, RESOLVED_FILE), 'a') as mapping, \
+                 open(os.path.join(logs_dir, RESOLVED_NAMES_FILE), 'a') as alive_names:
+                for record in literals:
+                    mapping.write(json.dumps(record, separators=(',', ':')) + "\n")
+                    alive_names.write(record['host'] + "\n")
+    except Exception as e:
+        error(f"Mass resolution failed: {e}")
+        return False
+
+    if stats['pruned']:
+        zones = ", ".join(sorted(detector.wildcard_zones()))
+        warning(f"Pruned {stats['pruned']} names that only hit wildcard DNS ({zones}). See {WILDCARD_FILE}.")
+    if stats['errors']:
+        warning(f"{stats['errors']} DNS queries failed after retries; {stats['unresolved']} names without an answer "
+                f"are kept in {RESOLVED_NAMES_FILE} for probing.")
+    success(f"{stats['resolved']} of {stats['total']} names resolve; dropped {stats['dropped']} dead names. "
+            f"Mapping saved to {RESOLVED_FILE}.")
+    return True
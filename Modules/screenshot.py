@@ -1,7 +1,6 @@
 # Modules/screenshot.py
 
 # Screenshot (Eyewitness) module execution
-import subprocess
 import os
 import sys
 
@@ -9,9 +8,17 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from Engine.logger import info, error
+from Engine.clusters import load_clusters, SCREENSHOT_TARGETS
+from Engine.screenshot_batches import run_batches
+from Engine.supervisor import cancelled
 
 def run(target, output_dir, report_enabled=False):
-    """Run the eyewitness tool on the target."""
+    """Run the eyewitness tool on the target.
+
+    After HTTPX the target is Logs/screenshot_targets.txt: one representative
+    URL per response cluster, so identical pages are captured once. URLs are
+    captured in memory-sized batches (see Engine/screenshot_batches.py).
+    """
     try:
         # Handle file input (@filename.txt)
         if target.startswith('@'):
@@ -20,7 +27,12 @@ def run(target, output_dir, report_enabled=False):
                 error(f"File not found: {file_path}")
                 return False
             
-            command = f"eyewitness --web --timeout 30 --threads 500 --prepend-https -f {file_path} -d {output_dir}/Screenshots/ --no-prompt"
+            with open(file_path, 'r', errors='replace') as f:
+                urls = [line.strip() for line in f if line.strip()]
+            clusters = load_clusters(os.path.dirname(file_path))
+            if os.path.basename(file_path) == SCREENSHOT_TARGETS and clusters:
+                info(f"Screenshotting {len(clusters)} cluster representatives "
+                     f"for {sum(c['size'] for c in clusters)} live URLs.")
         
         else:
             if not target.startswith(('http://', 'https://')):
@@ -28,16 +40,17 @@ def run(target, output_dir, report_enabled=False):
             else:
                 target_url = target
             
-            command = f"eyewitness --web --timeout 30 --threads 500 --prepend-https --single {target_url} -d {output_dir}/Screenshots/ --no-prompt"
+            urls = [target_url]
         
-        info(f"Running: {command}")
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
+        screenshots_dir = os.path.join(output_dir, "Screenshots")
+        captured, failed = run_batches(urls, screenshots_dir, os.path.join(output_dir, "Logs"))
         
-        if result.returncode == 0:
-            info(f"Screenshots saved to: {output_dir}/Screenshots/")
+        if captured or not urls:
+            info(f"Screenshots saved to: {screenshots_dir}/")
             return True
         else:
-            error(f"Eyewitness failed: {result.stderr}")
+            if not cancelled():
+                error("Eyewitness captured no screenshots.")
             return False
     except Exception as e:
         error(f"Error executing eyewitness: {e}")
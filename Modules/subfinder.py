@@ -1,15 +1,22 @@
 # Subfinder module execution
-import subprocess
 from Engine.logger import info, error
+from Engine.stream import run_and_publish
+from Engine.supervisor import run_tool
 
-def run(target, output_dir):
-    """Run the subfinder tool on the target."""
+def run(target, output_dir, bus=None):
+    """Run the subfinder tool on the target.
+
+    With a streaming bus, every subdomain is published as subfinder prints it.
+    """
     try:
         log_file = f"{output_dir}/Logs/subfinder.txt"
-        command = f"subfinder -d {target} -silent -o {log_file}"
+        command = ["subfinder", "-d", target, "-silent", "-o", log_file]
         
-        info(f"Running: {command}")
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
+        info(f"Running: {' '.join(command)}")
+        if bus is not None:
+            result = run_and_publish(command, bus)
+        else:
+            result = run_tool(command)
         
         if result.returncode == 0:
             info(f"Subfinder results saved to: {log_file}")
@@ -1,29 +1,54 @@
 # Whois module execution
-import subprocess
 import os
 import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from Engine.logger import info, error
+from Engine.logger import info, success, error
+from Engine.whois_client import get_client, WhoisError, WhoisCancelled
+from Engine.supervisor import run_tool
+from config import WHOIS_ENGINE
 
-def run(target, output_dir):
+def query_native(target, log_file):
+    """Look the target up with the built-in client (memoized per registrable domain)."""
+    client = get_client()
+    try:
+        key, answer = client.lookup(target)
+    except WhoisCancelled:
+        return False
+    except WhoisError as e:
+        error(str(e))
+        return False
+    if key != target.strip().lower().rstrip('.'):
+        info(f"Whois answer for {target} is the one for its registrable domain {key}.")
+    with open(log_file, 'w') as f:
+        f.write(answer)
+    success(f"Whois results saved to: {log_file}")
+    return True
+
+def query_cli(target, log_file):
     """Run the whois tool on the target."""
+    # Construct the command
+    command = ["whois", target]
+
+    info(f"Running: {' '.join(command)} > {log_file}")
+    # Execute the command
+    result = run_tool(command, stdout=log_file)
+
+    if result.returncode == 0:
+        info(f"Whois results saved to: {log_file}")
+        return True
+    else:
+        error(f"Whois failed: {result.stderr}")
+        return False
+
+def run(target, output_dir):
+    """Run a whois lookup on the target (built-in client, or the whois tool when WHOIS_ENGINE = 'whois')."""
     try:
-        # Construct the command
         log_file = f"{output_dir}/Logs/whois.txt"
-        command = f"whois {target} > {log_file}"
-        
-        info(f"Running: {command}")
-        # Execute the command
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            info(f"Whois results saved to: {log_file}")
-            return True
-        else:
-            error(f"Whois failed: {result.stderr}")
-            return False
+        if WHOIS_ENGINE == 'native':
+            return query_native(target, log_file)
+        return query_cli(target, log_file)
     except Exception as e:
         error(f"Error executing whois: {e}")
         return False
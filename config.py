@@ -24,6 +24,125 @@ API_KEYS = {
 # --- Default Parameters ---
 DEFAULT_NMAP_SCAN = 'quick'  # 'quick', 'full', 'fast', 'udp'
 
+# --- Execution ---
+MAX_PARALLEL_MODULES = 4  # Modules that don't depend on each other run side by side
+MAX_PARALLEL_TARGETS = 8  # Targets of an @file batch processed at once
+
+# Per-tool caps shared by every target of a batch (tools not listed are uncapped)
+TOOL_CONCURRENCY = {
+    'nmap': 2,
+    'amass': 4,
+    'subfinder': 8,
+    'httpx_toolkit': 4,
+    'screenshot': 1,
+}
+
+# Skip/quit send SIGTERM to a tool's whole process group, then SIGKILL after this many seconds
+KILL_GRACE_PERIOD = 5.0
+# Process groups of the running tools, recorded so the next start can reap strays of a crashed run
+TOOL_REGISTRY_DIR = os.path.expanduser('~/.cache/kestrel/tools')
+
+# --- Tool Output ---
+# Tool output is streamed line by line to <target>/Logs/tools/<module>.log, rotated past this size
+TOOL_LOG_MAX_BYTES = 10 * 1024 * 1024
+TOOL_LOG_BACKUPS = 3
+TOOL_OUTPUT_TAIL = 100        # last lines of stdout/stderr kept in memory for error messages
+TOOL_PROGRESS_INTERVAL = 5.0  # at most one progress line per tool run every N seconds
+# Output lines echoed to the console as progress (by tool executable)
+TOOL_PROGRESS_PATTERNS = {
+    'nmap': r'^(Discovered open port|Nmap scan report for)',   # stats: see NMAP_STATS_EVERY
+    'amass': r'\S',
+    'subfinder': r'\S',
+    'eyewitness': r'^Attempting to (screenshot|render)',
+}
+
+# --- Nmap ---
+NMAP_SHARDS = 4           # Host lists (alive.txt) are split into this many nmap processes (1 = one process)
+NMAP_MAX_PARALLEL = 4     # nmap processes running at once across all shards and targets
+NMAP_SHARD_RETRIES = 1    # Extra attempts for a shard whose nmap failed
+NMAP_STATS_EVERY = 15     # Seconds between nmap progress reports (percent, hosts, ETA); 0 = off
+NMAP_DEDUPE_IPS = True    # Scan each unique IP once; results are mapped back to every hostname
+# IPs in CDN / cloud edge ranges (Resources/cdn_ranges.json, refreshed by --update-cdn-ranges) only
+# front the real servers; with NMAP_DEDUPE_IPS on they are 'skip'ped, 'downgrade'd to CDN_PORTS or 'scan'ned
+CDN_POLICY = 'downgrade'
+CDN_PORTS = [80, 443, 8080, 8443]
+# Two-phase TCP scans (quick/full/fast): a built-in connect sweep finds the open ports, then
+# nmap runs its version/OS detection on just those ports
+PORT_DISCOVERY = True
+DISCOVERY_CONCURRENCY = 1000  # Connection attempts in flight
+DISCOVERY_RATE = 5000         # Connection attempts per second (0 = unlimited)
+DISCOVERY_TIMEOUT = 1.5       # Seconds before an unanswered port counts as filtered
+DISCOVERY_MAX_OPEN_PORTS = 100  # More open ports than this (a firewall answering everything) -> the one-phase profile
+NMAP_SERVICES_FILE = None     # nmap-services used to rank the top ports (None = look in nmap's usual places)
+
+# --- DNS ---
+DNS_ENGINE = 'native'      # 'native' (built-in async resolver) or 'dig'
+DNS_RESOLVERS = []         # e.g. ['1.1.1.1', '8.8.8.8', '127.0.0.1:5353']; empty = /etc/resolv.conf
+DNS_TIMEOUT = 2.0          # Seconds per attempt
+DNS_RETRIES = 2            # Extra attempts, each on the next resolver
+DNS_RATE_LIMIT = 100       # Queries per second per resolver (0 = unlimited)
+DNS_MAX_IN_FLIGHT = 500    # Outstanding queries across the pool
+RESOLVE_WORKERS = 200      # Names resolved concurrently by the mass resolution stage
+WILDCARD_FILTER = True     # Drop names that only resolve to a wildcard zone's catch-all answer
+WILDCARD_PROBES = 3        # Random labels resolved per parent zone to learn its wildcard answers
+
+# --- Whois ---
+WHOIS_ENGINE = 'native'        # 'native' (built-in client, one lookup per registrable domain) or 'whois'
+WHOIS_SERVER = 'whois.iana.org'  # First server of every referral chain (host or host:port)
+WHOIS_TIMEOUT = 10.0           # Seconds per connection
+WHOIS_MAX_PER_SERVER = 2       # Concurrent connections to one whois server
+WHOIS_MAX_REFERRALS = 2        # Registry -> registrar hops followed after the first answer
+
+# --- HTTP Probing ---
+HTTP_ENGINE = 'httpx'          # 'httpx' (httpx-toolkit) or 'native' (built-in asyncio prober, same alive.json)
+HTTP_CONCURRENCY = 100         # Inputs probed at once by the built-in prober
+HTTP_MAX_PER_HOST = 4          # Open connections per address:port (idle ones are kept alive and reused)
+HTTP_TIMEOUT = 10.0            # Seconds to connect, and for each response
+HTTP_MAX_BODY = 512 * 1024     # Bytes of each response body read (enough for the <title>)
+HTTP_USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) KESTREL'
+# httpx-toolkit host lists run as chunks; finished chunks are kept (Logs/httpx_chunks.json) across a resume
+HTTPX_CHUNK_SIZE = 2000        # Hosts per httpx-toolkit process
+HTTPX_WORKERS = 4              # httpx-toolkit processes running at once per target
+HTTPX_CHUNK_TIMEOUT = 600      # Seconds before a chunk's process is killed (and the chunk retried)
+HTTPX_CHUNK_RETRIES = 1        # Extra attempts for a chunk that failed or timed out
+HTTPX_EXTRA_FLAGS = ['-hash', 'md5']  # Body hashes for response clustering (add '-favicon' for favicon hashes)
+# Live URLs are grouped by response fingerprint (status, title, body and favicon hash) into Logs/clusters.json;
+# the Screenshot module then captures one representative URL per cluster
+SCREENSHOT_CLUSTERS = True
+
+# --- Screenshots ---
+# EyeWitness runs in batches; the threads of each batch are sized from free memory and cores
+SCREENSHOT_BATCH_SIZE = 100     # URLs per EyeWitness run
+SCREENSHOT_MAX_THREADS = 50     # Upper bound on EyeWitness --threads
+SCREENSHOT_THREADS_PER_CORE = 4
+SCREENSHOT_MB_PER_THREAD = 150  # Memory of one headless browser (raised when batches measure more)
+SCREENSHOT_RESERVE_MB = 512     # Memory left free; a batch is stopped and retried with half the threads below it
+SCREENSHOT_TIMEOUT = 30         # Seconds per page (EyeWitness --timeout)
+SCREENSHOT_RETRIES = 1          # Extra attempts for URLs a batch did not capture
+
+# --- Subdomain Pipeline ---
+# Files in Logs/ merged into Logs/merged_subs.txt before live probing (add new sources here)
+SUBDOMAIN_SOURCES = ['subfinder.txt', 'amass.txt']
+
+# Probe subdomains while Subfinder/Amass are still running instead of after them
+STREAMING_PIPELINE = True
+STREAM_BATCH_SIZE = 200    # Names per HTTPX micro-batch
+STREAM_BATCH_WAIT = 10.0   # Seconds before a partial batch is probed anyway
+
+# --- Result Cache ---
+# Passive module results are reused across runs until their TTL expires
+CACHE_ENABLED = True
+CACHE_DIR = os.path.expanduser('~/.cache/kestrel')
+CACHE_MAX_BYTES = 512 * 1024 * 1024   # Least recently used entries are evicted above this
+CACHE_TTL = {                         # Seconds per tool; tools not listed are never cached
+    'whois': 7 * 24 * 3600,
+    'dig': 6 * 3600,
+    'subfinder': 12 * 3600,
+    'amass': 12 * 3600,
+    'nmap_host': 24 * 3600,           # nmap results per IP and scan profile, shared by every target
+    'nmap_host_empty': 1800,          # IPs the port sweep found nothing open on (may just have been down)
+}
+
 # --- Output & Report Preferences ---
 REPORT_FORMAT = 'html'  # 'html', 'pdf'
 VERBOSE_LOGGING = False
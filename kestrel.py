@@ -3,6 +3,7 @@
 import sys
 import os
 import time
+import argparse
 import readline
 import glob
 # Get the absolute path to the current directory
@@ -45,6 +46,11 @@ try:
     from Engine.menu import main_menu, show_help
     from Engine.file_ops import create_target_dirs
     from Engine.runtime import execute_modules
+    from Engine.batch import BatchExecutor
+    from Engine.cache import configure_cache
+    from Engine.journal import RunJournal, list_runs
+    from Engine.supervisor import reap_strays
+    from Engine.cdn import update_ranges
     from Engine.dependencies import check_dependencies, install_dependencies
     from Engine.input_utils import get_input, clear_input_buffer # ADDED
 except ImportError as e:
@@ -93,29 +99,108 @@ def get_target():
         except KeyboardInterrupt:
             info("\nOperation cancelled by user.")
             sys.exit(0)
-def process_targets(targets, module_choices, report_enabled, is_file_input=False, file_name=None):
-    """Process multiple targets with the same module selection and report preference."""
-    for target in targets:
-        # Create target-specific directory structure
-        clean_target = "".join(c for c in target if c.isalnum() or c in ['.', '-', '_'])
-        target_dir = create_target_dirs(Config.RESULTS_BASE_DIR, clean_target, is_file_input, file_name)
-        if not target_dir:
-            error(f"Failed to create output directories for {target}. Skipping.")
+def process_targets(targets, module_choices, report_enabled, is_file_input=False, file_name=None,
+                    module_options=None, journal=None):
+    """Process multiple targets with the same module selection and report preference.
+
+    Every run is journaled under Results/.runs so it can be continued with --resume;
+    pass the loaded journal (and its module_options) to resume a run.
+    """
+    module_options = dict(module_options or {})
+    if is_file_input and len(targets) > 1 and journal is None:
+        # Several targets in flight: Nmap can't prompt per target, so ask once up front
+        if '6' in module_choices.split() and '0' not in module_choices:
+            from Modules.nmap import nmap_submenu
+            scan_type, nmap_report_enabled = nmap_submenu()
+            module_options['6'] = {'scan_type': scan_type, 'report_enabled': nmap_report_enabled}
+    if journal is None:
+        journal = RunJournal.create(Config.RESULTS_BASE_DIR, file_name or targets[0], targets, module_choices,
+                                    report_enabled, is_file_input, file_name, module_options)
+    info(f"Run journal: {journal.run_id} (continue an interrupted run with --resume {journal.run_id})")
+    if is_file_input and len(targets) > 1:
+        batch = BatchExecutor(targets, module_choices, report_enabled, Config.RESULTS_BASE_DIR,
+                              file_name=file_name, module_options=module_options, journal=journal)
+        return batch.run()
+    for index, target in enumerate(targets, 1):
+        if journal.target_done(index):
+            info(f"{target} already finished in this run: {journal.target_dir(index)}")
             continue
+        # Create target-specific directory structure (or reuse it when resuming)
+        target_dir = journal.target_dir(index)
+        if not target_dir:
+            clean_target = "".join(c for c in target if c.isalnum() or c in ['.', '-', '_'])
+            target_dir = create_target_dirs(Config.RESULTS_BASE_DIR, clean_target, is_file_input, file_name)
+            if not target_dir:
+                error(f"Failed to create output directories for {target}. Skipping.")
+                continue
+            journal.set_target_dir(index, target, target_dir)
         # Use yellow color for target information
         target_info(f"Target set to: {target}")
         info(f"Output directory: {target_dir}")
         if is_file_input:
-            info(f"Processing target {targets.index(target) + 1}/{len(targets)} from file")
+            info(f"Processing target {index}/{len(targets)} from file")
         # Execute the selected modules for this target
-        execute_modules(module_choices, target, target_dir, report_enabled)
-        if is_file_input and targets.index(target) < len(targets) - 1:
+        completed = execute_modules(module_choices, target, target_dir, report_enabled,
+                                    module_options=module_options, journal=journal.for_target(index, target))
+        journal.finish_target(index, target, 'done' if completed else 'cancelled')
+        if not completed:
+            break
+        if is_file_input and index < len(targets):
             info("Moving to next target...")
+def resume_run(run):
+    """Continues an interrupted run from its journal."""
+    try:
+        journal = RunJournal.open(Config.RESULTS_BASE_DIR, run)
+    except (OSError, ValueError) as e:
+        error(str(e))
+        runs = list_runs(Config.RESULTS_BASE_DIR)
+        if runs:
+            info("Recorded runs: " + ", ".join(runs[:10]))
+        return False
+    details = journal.run
+    target_info(f"Resuming run {journal.run_id}: {len(details['targets'])} target(s), modules '{details['module_choices']}'")
+    return process_targets(details['targets'], details['module_choices'], details['report_enabled'],
+                           details['is_file_input'], details['file_name'],
+                           module_options=details['module_options'], journal=journal)
+def update_cdn_ranges():
+    """Downloads the published CDN ranges into Resources/cdn_ranges.json."""
+    info("Updating CDN / cloud edge IP ranges...")
+    try:
+        results = update_ranges()
+    except (OSError, ValueError) as e:
+        error(f"Could not update the CDN ranges: {e}")
+        return
+    for provider, result in results.items():
+        if isinstance(result, int):
+            success(f"{provider}: {result} ranges")
+        else:
+            warning(f"{provider}: kept the bundled ranges ({result})")
+def parse_args():
+    """Command line overrides (everything else is chosen interactively)."""
+    parser = argparse.ArgumentParser(description="KESTREL - Multi-layered Reconnaissance Tool")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument('--no-cache', action='store_true',
+                             help="Neither use nor save cached results of passive modules")
+    cache_group.add_argument('--refresh', action='store_true',
+                             help="Ignore cached results, run every module and refresh the cache")
+    parser.add_argument('--resume', metavar='RUN',
+                        help="Continue an interrupted run (run id from Results/.runs, or a journal path)")
+    parser.add_argument('--update-cdn-ranges', action='store_true',
+                        help="Refresh Resources/cdn_ranges.json from the providers' published IP lists and exit")
+    return parser.parse_args()
 def main():
     """Main orchestration function for KESTREL."""
+    args = parse_args()
+    configure_cache(enabled=not args.no_cache, refresh=args.refresh)
+    if args.update_cdn_ranges:
+        update_cdn_ranges()
+        return
     try:
         # Display the banner
         display_banner()
+        # Tools a crashed run left behind would compete with this one
+        for argv, count in reap_strays():
+            warning(f"Killed {count} leftover process(es) of a previous run: {' '.join(argv)}")
         # Check for module availability
         info("Checking system dependencies...")
         missing_tools = check_dependencies(silent=False)
@@ -131,6 +216,10 @@ def main():
             sys.exit(1)
         else:
             success("All dependencies are now satisfied!")
+
+        if args.resume:
+            resume_run(args.resume)
+            return
             
         # Main program loop
         while True:
@@ -0,0 +1,149 @@
+# KESTREL/tests/test_http_probe.py
+# Description: Engine/http_probe.py against local stand-in HTTP/HTTPS servers (content-length, chunked, close-delimited, TLS).
+
+import asyncio
+import hashlib
+import os
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Engine.http_probe import ConnectionPool, HttpProber, _tls_version
+
+PAGE = b"<html><head><title>Stand-in  page</title></head><body>" + b"x" * 3000 + b"</body></html>\n"
+
+
+async def _read_head(reader):
+    while (await reader.readline()).strip():
+        pass
+
+
+def _content_length(keep_open=True):
+    async def handle(reader, writer):
+        try:
+            # Serves requests on one connection until the client hangs up
+            while True:
+                await _read_head(reader)
+                if reader.at_eof():
+                    break
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\nServer: stand-in\r\n"
+                             b"Content-Length: %d\r\n\r\n" % len(PAGE) + PAGE)
+                await writer.drain()
+                if not keep_open:
+                    break
+        finally:
+            writer.close()
+    return handle
+
+
+async def _chunked(reader, writer):
+    await _read_head(reader)
+    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nTransfer-Encoding: chunked\r\n\r\n")
+    # Chunk boundaries cut through the <title> element
+    for start in range(0, len(PAGE), 20):
+        piece = PAGE[start:start + 20]
+        writer.write(b"%x;ext=1\r\n" % len(piece) + piece + b"\r\n")
+        await writer.drain()
+    writer.write(b"0\r\nX-Trailer: 1\r\n\r\n")
+    await writer.drain()
+    writer.close()
+
+
+async def _close_delimited(reader, writer):
+    await _read_head(reader)
+    writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: text/html\r\n\r\n")
+    await writer.drain()
+    # The title only arrives after the first segments: it must still be found
+    body = b"<!-- padding -->\n" * 200 + PAGE
+    for start in range(0, len(body), 500):
+        writer.write(body[start:start + 500])
+        await writer.drain()
+        await asyncio.sleep(0.01)
+    writer.close()
+
+
+class LocalServers(unittest.TestCase):
+    def _fetch(self, handler, url_path="/", ssl_context=None, max_body=512 * 1024, twice=False):
+        async def run():
+            server = await asyncio.start_server(handler, "127.0.0.1", 0, ssl=ssl_context)
+            port = server.sockets[0].getsockname()[1]
+            scheme = "https" if ssl_context else "http"
+            prober = HttpProber(ConnectionPool(timeout=5), timeout=5, max_body=max_body)
+            try:
+                records = [await prober.fetch(f"{scheme}://127.0.0.1:{port}{url_path}")]
+                if twice:
+                    records.append(await prober.fetch(f"{scheme}://127.0.0.1:{port}{url_path}"))
+                return records, prober.pool
+            finally:
+                prober.pool.close()
+                server.close()
+                await server.wait_closed()
+        return asyncio.run(run())
+
+    def test_content_length(self):
+        (first, second), _pool = self._fetch(_content_length(), twice=True)
+        for record in (first, second):
+            self.assertEqual(record['status_code'], 200)
+            self.assertEqual(record['title'], "Stand-in page")
+            self.assertEqual(record['content_length'], len(PAGE))
+            self.assertEqual(record['hash']['body_md5'], hashlib.md5(PAGE).hexdigest())
+            self.assertEqual(record['webserver'], "stand-in")
+
+    def test_content_length_server_closes(self):
+        # The pooled connection is dead on the second request: it is retried on a new one
+        (first, second), _pool = self._fetch(_content_length(keep_open=False), twice=True)
+        self.assertEqual(first['hash'], second['hash'])
+
+    def test_chunked(self):
+        (record,), _pool = self._fetch(_chunked)
+        self.assertEqual(record['title'], "Stand-in page")
+        self.assertEqual(record['hash']['body_md5'], hashlib.md5(PAGE).hexdigest())
+
+    def test_close_delimited_reads_to_eof(self):
+        body = b"<!-- padding -->\n" * 200 + PAGE
+        (record,), _pool = self._fetch(_close_delimited)
+        self.assertEqual(record['title'], "Stand-in page")
+        self.assertEqual(record['content_length'], len(body))
+        self.assertEqual(record['hash']['body_md5'], hashlib.md5(body).hexdigest())
+
+    def test_close_delimited_stops_at_max_body(self):
+        (record,), _pool = self._fetch(_close_delimited, max_body=1000)
+        self.assertEqual(record['content_length'], 1000)
+        self.assertNotIn('title', record)
+
+    @unittest.skipUnless(shutil.which("openssl"), "openssl is needed to make a test certificate")
+    def test_tls(self):
+        directory = tempfile.mkdtemp()
+        try:
+            cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+            subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                            "-keyout", key, "-out", cert, "-subj", "/CN=stand-in.test/O=KESTREL",
+                            "-addext", "subjectAltName=DNS:stand-in.test,DNS:www.stand-in.test"],
+                           check=True, capture_output=True)
+            context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            context.load_cert_chain(cert, key)
+            (record,), _pool = self._fetch(_content_length(), ssl_context=context)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        self.assertEqual(record['scheme'], "https")
+        self.assertEqual(record['title'], "Stand-in page")
+        tls = record['tls']
+        self.assertIn(tls['tls_version'], ("tls12", "tls13"))
+        self.assertEqual(tls['subject_cn'], "stand-in.test")
+        self.assertEqual(tls['subject_org'], "KESTREL")
+        self.assertEqual(sorted(tls['subject_an']), ["stand-in.test", "www.stand-in.test"])
+
+
+class TlsVersion(unittest.TestCase):
+    def test_httpx_spelling(self):
+        self.assertEqual([_tls_version(v) for v in ("TLSv1.3", "TLSv1.2", "TLSv1", "SSLv3")],
+                         ["tls13", "tls12", "tls10", "ssl30"])
+
+
+if __name__ == "__main__":
+    unittest.main()